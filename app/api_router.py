@@ -10,6 +10,7 @@ from app.modules.billing.routes import router as billing_router
 from app.modules.chat.routes import router as chat_router
 from app.modules.notifications.routes import router as notifications_router
 from app.modules.admin.routes import router as admin_router
+from app.modules.realtime.routes import router as realtime_router
 
 api_router = APIRouter()
 
@@ -23,6 +24,7 @@ api_router.include_router(billing_router, prefix="/billing", tags=["Billing"])
 api_router.include_router(chat_router, prefix="/chat", tags=["Chat"])
 api_router.include_router(notifications_router, prefix="/notifications", tags=["Notifications"])
 api_router.include_router(admin_router, prefix="/admin", tags=["Admin"])
+api_router.include_router(realtime_router, prefix="/realtime", tags=["Realtime"])
 
 
 @api_router.get("/health", tags=["Meta"])
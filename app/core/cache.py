@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections.abc import Hashable
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from app.core.pubsub import get_broker, publish_after_commit
+
+logger = logging.getLogger("app.cache")
+
+# Tag invalidations of named caches, fanned out to every worker over the pub/sub broker.
+INVALIDATION_CHANNEL = "cache.invalidate"
+
+_named: dict[str, "TTLCache"] = {}
+_ORIGIN = uuid.uuid4().hex
+
+
+class TTLCache:
+    """Thread-safe in-process cache with per-entry expiry, tag invalidation and hit counters.
+
+    Every tag has a version that `invalidate_tag` bumps. Callers read the version
+    before computing a value and pass it to `set`, so a value computed from data
+    that was invalidated mid-flight is never stored. Tags are compared by `str()`.
+
+    A cache created with a `name` is kept coherent across workers: `invalidate_tag`
+    also publishes the tag on `INVALIDATION_CHANNEL`, and `listen_for_invalidations`
+    applies it in every worker. A missed message (e.g. a broker reconnect) leaves
+    an entry stale for at most its TTL.
+    """
+
+    def __init__(self, maxsize: int = 10_000, name: str | None = None):
+        self.maxsize = maxsize
+        self.name = name
+        self._entries: dict[Hashable, tuple[float, Any, Hashable | None]] = {}
+        self._tag_keys: dict[Hashable, set[Hashable]] = {}
+        self._tag_versions: dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if name is not None:
+            _named[name] = self
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def tag_version(self, tag: Hashable) -> int:
+        with self._lock:
+            return self._tag_versions.get(str(tag), 0)
+
+    def set(self, key: Hashable, value: Any, ttl: float, tag: Hashable | None = None, version: int | None = None) -> bool:
+        if ttl <= 0:
+            return False
+        tag = str(tag) if tag is not None else None
+        with self._lock:
+            if tag is not None and version is not None and self._tag_versions.get(tag, 0) != version:
+                return False
+            if key not in self._entries and len(self._entries) >= self.maxsize:
+                # evict the oldest insertion
+                self._drop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + ttl, value, tag)
+            if tag is not None:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            return True
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """Drop `tag`'s entries here now and, for a named cache, in every other worker."""
+        self._invalidate_local(tag)
+        if self.name is not None:
+            # Tagged with this process so its own listener skips the echo.
+            get_broker().publish(INVALIDATION_CHANNEL, {"cache": self.name, "tag": str(tag), "origin": _ORIGIN})
+
+    def invalidate_tag_after_commit(self, db: Session, tag: Hashable) -> None:
+        """Invalidate `tag` in every worker, this one included, once `db`'s transaction commits."""
+        if self.name is None:
+            raise ValueError("Only a named cache can be invalidated through the broker")
+        publish_after_commit(db, INVALIDATION_CHANNEL, {"cache": self.name, "tag": str(tag)})
+
+    def _invalidate_local(self, tag: Hashable) -> None:
+        tag = str(tag)
+        with self._lock:
+            self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+            for key in self._tag_keys.pop(tag, ()):
+                self._entries.pop(key, None)
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[2] is not None:
+            keys = self._tag_keys.get(entry[2])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    self._tag_keys.pop(entry[2], None)
+
+
+async def listen_for_invalidations():
+    """Apply tag invalidations published by any worker to this worker's named caches; runs until cancelled."""
+    while True:
+        try:
+            # Unbounded: invalidations are tiny and must never be evicted as a slow consumer.
+            async with get_broker().subscribe(INVALIDATION_CHANNEL, maxsize=0) as sub:
+                while True:
+                    message = await sub.get()
+                    cache = _named.get(message.get("cache"))
+                    if cache is not None and message.get("origin") != _ORIGIN:
+                        cache._invalidate_local(message["tag"])
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Cache invalidation listener failed; resubscribing")
+            await asyncio.sleep(1.0)
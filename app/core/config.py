@@ -7,6 +7,14 @@ class Settings(BaseSettings):
     DEBUG: bool = True
 
     DATABASE_URL: str
+    # Connection pool; async code runs DB work on at most DB_POOL_SIZE + DB_MAX_OVERFLOW threads
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Threads for sync route handlers and dependencies
+    THREADPOOL_SIZE: int = 40
+    # Log the loop's stack whenever a callback blocks the event loop longer than this
+    LOOP_LAG_MONITOR_ENABLED: bool = True
+    LOOP_LAG_THRESHOLD_SECONDS: float = 0.2
 
     JWT_SECRET_KEY: str
     JWT_REFRESH_SECRET: str
@@ -14,8 +22,61 @@ class Settings(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
 
-    # later: CORS origins, Redis URL, etc.
-    # REDIS_URL: str | None = None
+    # Materialized per-doctor free-slot store (see doctors.service.refresh_free_slot_store)
+    SLOT_STORE_ENABLED: bool = False
+    SLOT_STORE_HORIZON_DAYS: int = 60
+
+    # Denormalized Doctor.next_available_at / free_slots_7d
+    NEXT_AVAILABLE_LOOKAHEAD_DAYS: int = 30
+    NEXT_AVAILABLE_SLOT_MINUTES: int = 30
+
+    # Per-worker cache of /doctors/{id}/availability/slots responses (0 disables)
+    SLOT_CACHE_TTL_SECONDS: int = 30
+    SLOT_CACHE_MAX_ENTRIES: int = 10_000
+    # Cache-Control max-age sent with slot responses
+    SLOT_HTTP_MAX_AGE_SECONDS: int = 15
+
+    # Shared store for slot holds; holds stay in process memory when unset
+    REDIS_URL: str | None = None
+    SLOT_HOLD_MINUTES: int = 10
+
+    # Realtime fan-out between workers: "memory", "redis" or "postgres" (LISTEN/NOTIFY).
+    # Unset means redis when REDIS_URL is set, otherwise memory (single worker only).
+    PUBSUB_BACKEND: str | None = None
+    # Per-connection realtime send queue; a socket that falls this far behind, or
+    # whose single send takes longer than the timeout, is disconnected
+    REALTIME_SEND_QUEUE_SIZE: int = 256
+    REALTIME_SEND_TIMEOUT_SECONDS: float = 10.0
+    # Chat threads one multiplexed /realtime/ws connection may subscribe to
+    REALTIME_MAX_THREAD_SUBSCRIPTIONS: int = 100
+
+    # Websocket chat messages of all threads are buffered per worker and written with
+    # one multi-row INSERT per batch, flushed when full or after the flush interval
+    CHAT_WRITE_BATCH_SIZE: int = 200
+    CHAT_WRITE_FLUSH_SECONDS: float = 0.005
+    # Per-worker cache of chat thread status, checked on every websocket message
+    CHAT_THREAD_STATUS_CACHE_SECONDS: int = 30
+
+    # Outbox dispatcher (domain events -> notifications)
+    OUTBOX_DISPATCHER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 200
+    OUTBOX_POLL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 5
+    OUTBOX_RETENTION_DAYS: int = 7
+
+    # Server-Sent Events notification stream
+    NOTIFICATION_STREAM_HEARTBEAT_SECONDS: float = 15.0
+
+    # Notification retention in days per type (other types use the default) and
+    # monthly partitions of the notifications table kept ahead of time
+    NOTIFICATION_RETENTION_DAYS: dict[str, int] = {"CHAT_READ": 7, "CHAT": 90, "APPOINTMENT": 365}
+    NOTIFICATION_DEFAULT_RETENTION_DAYS: int = 365
+    NOTIFICATION_PARTITION_MONTHS_AHEAD: int = 3
+    NOTIFICATION_PURGE_BATCH_SIZE: int = 5000
+    # Collapse repeated chat notifications per thread into one unread row
+    NOTIFICATION_COALESCE_CHAT: bool = True
+
+    # later: CORS origins, etc.
 
     model_config = SettingsConfigDict(
         env_file=".env",
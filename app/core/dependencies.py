@@ -26,7 +26,8 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
-async def get_current_user(
+# Sync on purpose: FastAPI runs these in the threadpool, keeping DB lookups off the event loop.
+def get_current_user(
     db: Session = Depends(get_db),
     token: HTTPAuthorizationCredentials = Depends(reusable_oauth2),
 ) -> User:
@@ -61,7 +62,7 @@ async def get_current_user(
     return user
 
 
-async def get_current_active_user(
+def get_current_active_user(
     current_user: Annotated[User, Depends(get_current_user)]
 ) -> User:
     if not current_user.is_active:
@@ -72,7 +73,7 @@ async def get_current_active_user(
 def require_roles(*allowed_roles: str):
     allowed = {role.upper() for role in allowed_roles}
 
-    async def role_checker(current_user: Annotated[User, Depends(get_current_active_user)]) -> User:
+    def role_checker(current_user: Annotated[User, Depends(get_current_active_user)]) -> User:
         role_name = getattr(current_user, "role_name", None)
         if current_user.is_superuser:
             return current_user
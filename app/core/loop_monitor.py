@@ -0,0 +1,70 @@
+"""Event-loop lag watchdog.
+
+A heartbeat task stamps the time every `interval`. A watchdog thread notices when
+the stamp goes stale for longer than `threshold`, which means a callback is
+blocking the loop (typically sync I/O inside an `async def`), and logs the loop
+thread's stack at that moment. When the loop recovers, the heartbeat logs how
+long the stall lasted.
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+
+logger = logging.getLogger("app.loop_monitor")
+
+
+class LoopLagMonitor:
+    def __init__(self, threshold: float, interval: float | None = None):
+        self.threshold = threshold
+        self.interval = interval or max(threshold / 2, 0.01)
+        self.stalls = 0
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._reported_beat = None
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def start(self):
+        """Call from the event loop being watched."""
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = now - expected
+            if lag > self.threshold:
+                self.stalls += 1
+                self.max_lag = max(self.max_lag, lag)
+                logger.warning("Event loop was blocked for %.0f ms", lag * 1000)
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            lag = time.monotonic() - beat - self.interval
+            if lag <= self.threshold or beat == self._reported_beat:
+                continue
+            self._reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<unavailable>"
+            logger.warning("Event loop blocked for over %.0f ms; loop thread is at:\n%s", lag * 1000, stack)
@@ -0,0 +1,444 @@
+"""Publish/subscribe fan-out for realtime pushes (notifications, chat).
+
+`publish` is thread-safe and may be called from sync route handlers running in
+the threadpool; subscribers are asyncio consumers on the event loop. The
+in-process broker only reaches sockets of the current worker. The Redis
+(pub/sub) and Postgres (LISTEN/NOTIFY) brokers carry messages between workers
+and nodes; each worker subscribes only to channels it has local subscribers for.
+`PUBSUB_BACKEND` picks the broker (default: redis when `REDIS_URL` is set,
+otherwise in-process).
+"""
+import asyncio
+import json
+import logging
+import os
+import queue
+import select
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.pubsub")
+
+
+class SlowConsumer(Exception):
+    """The subscriber fell too far behind and was evicted."""
+
+
+_EVICTED = object()
+
+
+class Subscription:
+    """
+    One consumer's bounded queue of (channel, message, frame) items, where `frame`
+    is the message's JSON text, encoded once per publish and shared by every
+    subscriber. Several subscriptions of one connection may share a queue.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        loop: asyncio.AbstractEventLoop,
+        maxsize: int = 0,
+        on_evict: Optional[Callable] = None,
+        queue: Optional[asyncio.Queue] = None,
+    ):
+        self.channel = channel
+        self.loop = loop
+        self.queue: asyncio.Queue = queue if queue is not None else asyncio.Queue(maxsize)
+        self.evicted = False
+        self._on_evict = on_evict
+
+    def deliver(self, message: Any, frame: str):
+        self.loop.call_soon_threadsafe(self._put, (self.channel, message, frame))
+
+    def _put(self, item):
+        if self.evicted:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.evict()
+
+    def evict(self):
+        """Drop everything queued and make the next `next()` raise SlowConsumer."""
+        if self.evicted:
+            return
+        self.evicted = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(_EVICTED)
+        logger.warning("Evicted slow subscriber on %s", self.channel)
+        if self._on_evict:
+            self._on_evict(self)
+
+    async def next_item(self) -> tuple[str, Any, str]:
+        item = await self.queue.get()
+        if item is _EVICTED:
+            raise SlowConsumer(self.channel)
+        return item
+
+    async def next(self) -> tuple[Any, str]:
+        return (await self.next_item())[1:]
+
+    async def get(self) -> Any:
+        return (await self.next_item())[1]
+
+
+async def pump(sub: Subscription, send: Callable[..., Awaitable[Any]], timeout: Optional[float] = None, with_channel: bool = False):
+    """
+    Writer loop of one connection: hand each (message, frame) to `send`, prefixed
+    with the channel when `with_channel`. Raises SlowConsumer when the queue
+    overflowed or a single send took over `timeout`.
+    """
+    timeout = settings.REALTIME_SEND_TIMEOUT_SECONDS if timeout is None else timeout
+    while True:
+        channel, message, frame = await sub.next_item()
+        try:
+            await asyncio.wait_for(send(channel, message, frame) if with_channel else send(message, frame), timeout)
+        except asyncio.TimeoutError:
+            sub.evict()
+            raise SlowConsumer(sub.channel)
+
+
+class InProcessBroker:
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.evicted = 0
+
+    def publish(self, channel: str, message: Any):
+        self._deliver_local(channel, message)
+
+    def _deliver_local(self, channel: str, message: Any, frame: Optional[str] = None):
+        # Snapshot under the lock; subscribers may come and go while we deliver.
+        with self._lock:
+            self.published += 1
+            subs = list(self._subs.get(channel, ()))
+            self.delivered += len(subs)
+        if not subs:
+            return
+        if frame is None:
+            frame = json.dumps(message, default=str)
+        for sub in subs:
+            try:
+                sub.deliver(message, frame)
+            except RuntimeError:
+                # The subscriber's event loop is closed; it is about to unsubscribe.
+                pass
+
+    def _count_eviction(self, sub: Subscription):
+        with self._lock:
+            self.evicted += 1
+
+    def _new_subscription(self, channel: str, maxsize: Optional[int], queue: Optional[asyncio.Queue] = None) -> Subscription:
+        maxsize = settings.REALTIME_SEND_QUEUE_SIZE if maxsize is None else maxsize
+        return Subscription(channel, asyncio.get_running_loop(), maxsize, self._count_eviction, queue)
+
+    def _add(self, sub: Subscription) -> bool:
+        """Register `sub`; True when it is the first local subscriber of its channel."""
+        with self._lock:
+            subs = self._subs.setdefault(sub.channel, set())
+            subs.add(sub)
+            return len(subs) == 1
+
+    def _remove(self, sub: Subscription) -> bool:
+        """Unregister `sub`; True when its channel has no local subscribers left."""
+        with self._lock:
+            subs = self._subs.get(sub.channel)
+            if subs is None:
+                return False
+            subs.discard(sub)
+            if subs:
+                return False
+            del self._subs[sub.channel]
+            return True
+
+    def local_channels(self) -> int:
+        with self._lock:
+            return len(self._subs)
+
+    def stats(self) -> dict:
+        with self._lock:
+            subscriptions = [sub for subs in self._subs.values() for sub in subs]
+            # Connections that multiplex channels share one queue; count it once.
+            depths = [q.qsize() for q in {id(sub.queue): sub.queue for sub in subscriptions}.values()]
+            return {
+                "backend": type(self).__name__,
+                "channels": len(self._subs),
+                "subscriptions": len(subscriptions),
+                "queued_total": sum(depths),
+                "queued_max": max(depths, default=0),
+                "published": self.published,
+                "delivered": self.delivered,
+                "evicted_slow_consumers": self.evicted,
+            }
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, maxsize: Optional[int] = None, queue: Optional[asyncio.Queue] = None) -> AsyncIterator[Subscription]:
+        sub = self._new_subscription(channel, maxsize, queue)
+        self._add(sub)
+        try:
+            yield sub
+        finally:
+            self._remove(sub)
+
+
+class RedisBroker(InProcessBroker):
+    """Cross-worker fan-out over Redis pub/sub; messages are JSON encoded.
+
+    redis-py PubSub objects are not thread-safe, so only the listener thread touches
+    `_pubsub`; SUBSCRIBE/UNSUBSCRIBE are queued for it like PostgresBroker's LISTEN.
+    """
+
+    # How long the listener blocks reading messages before it runs queued commands.
+    POLL_SECONDS = 0.05
+
+    def __init__(self, url: str, prefix: str = "app"):
+        super().__init__()
+        import redis
+
+        self._prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        self._commands: queue.Queue = queue.Queue()
+        self._wake = threading.Event()
+        self._listener = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+        self._listener.start()
+
+    def _key(self, channel: str) -> str:
+        return f"{self._prefix}:{channel}"
+
+    def publish(self, channel: str, message: Any):
+        try:
+            self._redis.publish(self._key(channel), json.dumps(message, default=str))
+        except Exception:
+            # Fall back to local delivery so this worker's sockets still get it.
+            logger.exception("Redis publish to %s failed", channel)
+            self._deliver_local(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, maxsize: Optional[int] = None, queue: Optional[asyncio.Queue] = None) -> AsyncIterator[Subscription]:
+        sub = self._new_subscription(channel, maxsize, queue)
+        if self._add(sub):
+            await asyncio.to_thread(self._command, "subscribe", channel)
+        try:
+            yield sub
+        finally:
+            if self._remove(sub):
+                await asyncio.to_thread(self._command, "unsubscribe", channel)
+
+    def _command(self, method: str, channel: str):
+        done = threading.Event()
+        self._commands.put((method, channel, done))
+        self._wake.set()
+        done.wait(5.0)
+
+    def _run_commands(self):
+        while not self._commands.empty():
+            method, channel, done = self._commands.get_nowait()
+            try:
+                getattr(self._pubsub, method)(self._key(channel))
+            finally:
+                done.set()
+
+    def _listen(self):
+        skip = len(self._prefix) + 1
+        while True:
+            try:
+                self._wake.clear()
+                self._run_commands()
+                if not self._pubsub.subscribed:
+                    self._wake.wait(1.0)
+                    continue
+                message = self._pubsub.get_message(timeout=self.POLL_SECONDS)
+            except Exception:
+                logger.exception("Redis pub/sub listener error")
+                threading.Event().wait(1.0)
+                continue
+            if message and message.get("type") == "message":
+                frame = message["data"].decode()
+                self._deliver_local(message["channel"].decode()[skip:], json.loads(frame), frame)
+
+
+# NOTIFY payloads must be shorter than this many bytes.
+NOTIFY_PAYLOAD_LIMIT = 8000
+# A NOTIFY payload starting with this is a pubsub_payloads id; JSON text never does.
+SPILLED_PREFIX = "@"
+SPILL_SQL = """
+WITH spilled AS (INSERT INTO pubsub_payloads (payload) VALUES (%s) RETURNING id)
+SELECT pg_notify(%s, %s || id) FROM spilled
+"""
+PURGE_SPILLED_SQL = "DELETE FROM pubsub_payloads WHERE created_at < now() - interval '5 minutes'"
+
+
+class PostgresBroker(InProcessBroker):
+    """
+    Cross-worker fan-out over Postgres LISTEN/NOTIFY on dedicated connections, for
+    deployments without Redis. NOTIFY payloads are limited to 8000 bytes; larger
+    messages are stored in `pubsub_payloads` and only their id is notified, which
+    listeners read back. Stored payloads are purged after a few minutes.
+    """
+
+    def __init__(self, dsn: str, prefix: str = "app"):
+        super().__init__()
+        self._dsn = dsn
+        self._prefix = prefix
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        # LISTEN/UNLISTEN run on the listener thread, which owns its connection.
+        self._commands: queue.Queue = queue.Queue()
+        self._wake_r, self._wake_w = os.pipe()
+        self._listener = threading.Thread(target=self._listen, name="pubsub-listener", daemon=True)
+        self._listener.start()
+
+    def _key(self, channel: str) -> str:
+        return f"{self._prefix}:{channel}"
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self._dsn)
+        conn.autocommit = True
+        return conn
+
+    def publish(self, channel: str, message: Any):
+        payload = json.dumps(message, default=str)
+        try:
+            with self._publish_lock:
+                if self._publish_conn is None or self._publish_conn.closed:
+                    self._publish_conn = self._connect()
+                with self._publish_conn.cursor() as cur:
+                    if len(payload.encode()) < NOTIFY_PAYLOAD_LIMIT:
+                        cur.execute("SELECT pg_notify(%s, %s)", (self._key(channel), payload))
+                    else:
+                        cur.execute(SPILL_SQL, (payload, self._key(channel), SPILLED_PREFIX))
+                        cur.execute(PURGE_SPILLED_SQL)
+        except Exception:
+            logger.exception("Postgres NOTIFY on %s failed", channel)
+            self._deliver_local(channel, message)
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str, maxsize: Optional[int] = None, queue: Optional[asyncio.Queue] = None) -> AsyncIterator[Subscription]:
+        sub = self._new_subscription(channel, maxsize, queue)
+        if self._add(sub):
+            await asyncio.to_thread(self._command, "LISTEN", channel)
+        try:
+            yield sub
+        finally:
+            if self._remove(sub):
+                await asyncio.to_thread(self._command, "UNLISTEN", channel)
+
+    def _command(self, verb: str, channel: str):
+        done = threading.Event()
+        self._commands.put((verb, channel, done))
+        os.write(self._wake_w, b"x")
+        done.wait(5.0)
+
+    def _execute(self, conn, verb: str, channel: str):
+        from psycopg2 import sql
+
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL(verb + " {}").format(sql.Identifier(self._key(channel))))
+
+    def _read_spilled(self, conn, payload_id: int) -> Optional[str]:
+        with conn.cursor() as cur:
+            cur.execute("SELECT payload FROM pubsub_payloads WHERE id = %s", (payload_id,))
+            row = cur.fetchone()
+        return row[0] if row else None
+
+    def _listen(self):
+        skip = len(self._prefix) + 1
+        conn = None
+        while True:
+            try:
+                if conn is None:
+                    conn = self._connect()
+                    with self._lock:
+                        channels = list(self._subs)
+                    for channel in channels:
+                        self._execute(conn, "LISTEN", channel)
+                ready, _, _ = select.select([conn, self._wake_r], [], [], 5.0)
+                if self._wake_r in ready:
+                    os.read(self._wake_r, 4096)
+                while not self._commands.empty():
+                    verb, channel, done = self._commands.get_nowait()
+                    try:
+                        self._execute(conn, verb, channel)
+                    finally:
+                        done.set()
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    payload = notify.payload
+                    if payload.startswith(SPILLED_PREFIX):
+                        payload = self._read_spilled(conn, int(payload[len(SPILLED_PREFIX):]))
+                        if payload is None:
+                            logger.warning("Spilled payload %s on %s is gone", notify.payload, notify.channel)
+                            continue
+                    self._deliver_local(notify.channel[skip:], json.loads(payload), payload)
+            except Exception:
+                logger.exception("Postgres LISTEN connection error")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                threading.Event().wait(1.0)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def _create_broker() -> InProcessBroker:
+    backend = (settings.PUBSUB_BACKEND or ("redis" if settings.REDIS_URL else "memory")).lower()
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise RuntimeError("PUBSUB_BACKEND=redis requires REDIS_URL")
+        return RedisBroker(settings.REDIS_URL)
+    if backend == "postgres":
+        from sqlalchemy.engine import make_url
+
+        dsn = make_url(settings.DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroker(dsn)
+    if backend == "memory":
+        return InProcessBroker()
+    raise RuntimeError(f"Unknown PUBSUB_BACKEND: {settings.PUBSUB_BACKEND}")
+
+
+def get_broker() -> InProcessBroker:
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = _create_broker()
+    return _broker
+
+
+def publish_after_commit(db: Session, channel: str, message: Any):
+    """Queue `message` on the session; it is published only if the transaction commits."""
+    db.info.setdefault("pubsub_pending", []).append((channel, message))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session: Session):
+    pending = session.info.pop("pubsub_pending", None)
+    if pending:
+        broker = get_broker()
+        for channel, message in pending:
+            broker.publish(channel, message)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session: Session, previous_transaction):
+    if previous_transaction.parent is None:
+        session.info.pop("pubsub_pending", None)
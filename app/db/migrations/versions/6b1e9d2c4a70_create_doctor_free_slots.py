@@ -0,0 +1,34 @@
+"""create doctor_free_slots materialized store
+
+Revision ID: 6b1e9d2c4a70
+Revises: 1234abcd5678
+Create Date: 2025-12-10 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b1e9d2c4a70'
+down_revision: Union[str, Sequence[str], None] = '1234abcd5678'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'doctor_free_slots',
+        sa.Column('doctor_id', sa.UUID(), sa.ForeignKey('doctors.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('windows', postgresql.ARRAY(sa.BigInteger()), nullable=False),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('doctor_id', 'day', name='pk_doctor_free_slots'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('doctor_free_slots')
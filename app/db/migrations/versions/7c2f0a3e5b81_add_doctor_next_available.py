@@ -0,0 +1,31 @@
+"""add doctor next_available_at and free_slots_7d
+
+Revision ID: 7c2f0a3e5b81
+Revises: 6b1e9d2c4a70
+Create Date: 2025-12-10 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2f0a3e5b81'
+down_revision: Union[str, Sequence[str], None] = '6b1e9d2c4a70'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Values are filled by `python maintenance.py refresh-next-available`.
+    op.add_column('doctors', sa.Column('next_available_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('doctors', sa.Column('free_slots_7d', sa.Integer(), nullable=False, server_default='0'))
+    op.create_index(op.f('ix_doctors_next_available_at'), 'doctors', ['next_available_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_doctors_next_available_at'), table_name='doctors')
+    op.drop_column('doctors', 'free_slots_7d')
+    op.drop_column('doctors', 'next_available_at')
@@ -0,0 +1,35 @@
+"""add appointments_no_overlap exclusion constraint
+
+Revision ID: 8d4b1f6e2c93
+Revises: 7c2f0a3e5b81
+Create Date: 2025-12-12 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d4b1f6e2c93'
+down_revision: Union[str, Sequence[str], None] = '7c2f0a3e5b81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fails if overlapping SCHEDULED appointments already exist; find them with
+    #   SELECT a.id, b.id FROM appointments a JOIN appointments b
+    #     ON a.doctor_id = b.doctor_id AND a.id < b.id
+    #    AND a.start_time < b.end_time AND b.start_time < a.end_time
+    #  WHERE a.status = 'SCHEDULED' AND b.status = 'SCHEDULED';
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    op.execute(
+        "ALTER TABLE appointments ADD CONSTRAINT appointments_no_overlap "
+        "EXCLUDE USING gist (doctor_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&) "
+        "WHERE (status = 'SCHEDULED')"
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('appointments_no_overlap', 'appointments', type_='exclude')
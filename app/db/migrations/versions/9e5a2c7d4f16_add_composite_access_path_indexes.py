@@ -0,0 +1,53 @@
+"""add composite indexes for appointment, message and notification access paths
+
+Revision ID: 9e5a2c7d4f16
+Revises: 8d4b1f6e2c93
+Create Date: 2025-12-12 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e5a2c7d4f16'
+down_revision: Union[str, Sequence[str], None] = '8d4b1f6e2c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction. If a build fails it leaves an
+    # INVALID index behind; drop it and re-run the migration.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_appointments_doctor_id_status_start_time', 'appointments', ['doctor_id', 'status', 'start_time'],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_appointments_patient_id_start_time', 'appointments', ['patient_id', sa.text('start_time DESC')],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_chat_messages_thread_id_sent_at', 'chat_messages', ['thread_id', sa.text('sent_at DESC')],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_notifications_user_id_created_at', 'notifications', ['user_id', sa.text('created_at DESC')],
+            unique=False, postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_notifications_user_id_unread', 'notifications', ['user_id'],
+            unique=False, postgresql_where=sa.text('NOT is_read'), postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_user_id_unread', table_name='notifications', postgresql_concurrently=True)
+        op.drop_index('ix_notifications_user_id_created_at', table_name='notifications', postgresql_concurrently=True)
+        op.drop_index('ix_chat_messages_thread_id_sent_at', table_name='chat_messages', postgresql_concurrently=True)
+        op.drop_index('ix_appointments_patient_id_start_time', table_name='appointments', postgresql_concurrently=True)
+        op.drop_index('ix_appointments_doctor_id_status_start_time', table_name='appointments', postgresql_concurrently=True)
@@ -0,0 +1,64 @@
+"""create chat_thread_summaries
+
+Revision ID: a8c2e5b0d6f1
+Revises: f7b1d4a9c5e0
+Create Date: 2025-12-23 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c2e5b0d6f1'
+down_revision: Union[str, Sequence[str], None] = 'f7b1d4a9c5e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'chat_thread_summaries',
+        sa.Column('thread_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('chat_threads.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('patient_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('doctor_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('last_message_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('last_sent_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('preview', sa.String(length=140), nullable=True),
+        sa.Column('patient_unread', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('doctor_unread', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index(
+        'ix_chat_thread_summaries_patient_id_last_sent_at', 'chat_thread_summaries',
+        ['patient_id', sa.text('last_sent_at DESC NULLS LAST')], unique=False,
+    )
+    op.create_index(
+        'ix_chat_thread_summaries_doctor_id_last_sent_at', 'chat_thread_summaries',
+        ['doctor_id', sa.text('last_sent_at DESC NULLS LAST')], unique=False,
+    )
+    # Same values as chat.repository.rebuild_thread_summaries
+    op.execute(
+        """
+        INSERT INTO chat_thread_summaries
+               (thread_id, patient_id, doctor_id, last_message_id, last_sent_at, preview, patient_unread, doctor_unread)
+        SELECT t.id, t.patient_id, t.doctor_id, last.id, last.sent_at,
+               CASE WHEN last.content IS NOT NULL AND last.content <> '' THEN left(last.content, 140)
+                    WHEN last.file_url IS NOT NULL THEN 'Sent an attachment' END,
+               (SELECT count(*) FROM chat_messages m
+                 WHERE m.thread_id = t.id AND m.read_at IS NULL AND m.sender_role = 'DOCTOR'),
+               (SELECT count(*) FROM chat_messages m
+                 WHERE m.thread_id = t.id AND m.read_at IS NULL AND m.sender_role = 'PATIENT')
+          FROM chat_threads t
+          LEFT JOIN LATERAL (SELECT id, sent_at, content, file_url FROM chat_messages m
+                              WHERE m.thread_id = t.id ORDER BY m.seq DESC LIMIT 1) last ON true
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_thread_summaries_doctor_id_last_sent_at', table_name='chat_thread_summaries')
+    op.drop_index('ix_chat_thread_summaries_patient_id_last_sent_at', table_name='chat_thread_summaries')
+    op.drop_table('chat_thread_summaries')
@@ -0,0 +1,30 @@
+"""add notifications (user_id, created_at, id) index for stream resume
+
+Revision ID: b7d2e4a9c1f3
+Revises: a3c6e1f8b052
+Create Date: 2025-12-16 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d2e4a9c1f3'
+down_revision: Union[str, Sequence[str], None] = 'a3c6e1f8b052'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_notifications_user_id_created_at_id', 'notifications', ['user_id', 'created_at', 'id'],
+            unique=False, postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_notifications_user_id_created_at_id', table_name='notifications', postgresql_concurrently=True)
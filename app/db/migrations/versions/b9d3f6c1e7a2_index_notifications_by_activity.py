@@ -0,0 +1,34 @@
+"""index notifications by last activity for lists and stream resume
+
+Revision ID: b9d3f6c1e7a2
+Revises: a8c2e5b0d6f1
+Create Date: 2025-12-24 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d3f6c1e7a2'
+down_revision: Union[str, Sequence[str], None] = 'a8c2e5b0d6f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# CONCURRENTLY is not supported on a partitioned parent; these build per partition under a short lock.
+def upgrade() -> None:
+    op.create_index(
+        'ix_notifications_user_id_activity_at_id', 'notifications',
+        ['user_id', sa.text('coalesce(last_at, created_at)'), 'id'], unique=False,
+    )
+    op.drop_index('ix_notifications_user_id_created_at_id', table_name='notifications')
+    op.drop_index('ix_notifications_user_id_created_at', table_name='notifications')
+
+
+def downgrade() -> None:
+    op.create_index('ix_notifications_user_id_created_at', 'notifications', ['user_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_notifications_user_id_created_at_id', 'notifications', ['user_id', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_notifications_user_id_activity_at_id', table_name='notifications')
@@ -0,0 +1,34 @@
+"""add pubsub_payloads for NOTIFY messages over the payload limit
+
+Revision ID: c0e4a7d2f8b3
+Revises: b9d3f6c1e7a2
+Create Date: 2025-12-26 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0e4a7d2f8b3'
+down_revision: Union[str, Sequence[str], None] = 'b9d3f6c1e7a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'pubsub_payloads',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_pubsub_payloads_created_at', 'pubsub_payloads', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pubsub_payloads_created_at', table_name='pubsub_payloads')
+    op.drop_table('pubsub_payloads')
@@ -0,0 +1,38 @@
+"""create notification_unread_counters table
+
+Revision ID: c4e8a1d6f2b7
+Revises: b7d2e4a9c1f3
+Create Date: 2025-12-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1d6f2b7'
+down_revision: Union[str, Sequence[str], None] = 'b7d2e4a9c1f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'notification_unread_counters',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('type', sa.String(length=50), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.execute(
+        """
+        INSERT INTO notification_unread_counters (user_id, type, count)
+        SELECT user_id, type, count(*) FROM notifications WHERE NOT is_read GROUP BY user_id, type
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_unread_counters')
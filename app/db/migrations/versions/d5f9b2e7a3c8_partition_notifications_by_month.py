@@ -0,0 +1,104 @@
+"""partition notifications by created_at month
+
+Revision ID: d5f9b2e7a3c8
+Revises: c4e8a1d6f2b7
+Create Date: 2025-12-18 09:00:00.000000
+
+Rebuilds `notifications` as a RANGE-partitioned table (one partition per UTC
+month plus a default partition) and copies the existing rows over. The primary
+key becomes (id, created_at) because Postgres requires the partition key in
+every unique constraint. Takes an exclusive lock on notifications while copying.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f9b2e7a3c8'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1d6f2b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = 'id, user_id, type, title, body, is_read, created_at'
+INDEXES = ('ix_notifications_user_id', 'ix_notifications_user_id_created_at', 'ix_notifications_user_id_unread', 'ix_notifications_user_id_created_at_id')
+
+# Monthly partitions from the oldest row's month until three months ahead.
+CREATE_MONTH_PARTITIONS = """
+DO $$
+DECLARE m date;
+BEGIN
+    FOR m IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE((SELECT min(created_at) FROM notifications_old), now()) AT TIME ZONE 'UTC'),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months',
+            interval '1 month'
+        )::date
+    LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF notifications FOR VALUES FROM (%L) TO (%L)',
+            'notifications_p' || to_char(m, 'YYYYMM'),
+            to_char(m, 'YYYY-MM-DD') || ' 00:00:00+00',
+            to_char(m + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+        );
+    END LOOP;
+END $$;
+"""
+
+
+def _create_indexes() -> None:
+    op.create_index('ix_notifications_user_id', 'notifications', ['user_id'], unique=False)
+    op.create_index('ix_notifications_user_id_created_at', 'notifications', ['user_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_notifications_user_id_unread', 'notifications', ['user_id'], unique=False, postgresql_where=sa.text('NOT is_read'))
+    op.create_index('ix_notifications_user_id_created_at_id', 'notifications', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def _rename_old_table() -> None:
+    op.rename_table('notifications', 'notifications_old')
+    op.execute('ALTER TABLE notifications_old RENAME CONSTRAINT notifications_pkey TO notifications_old_pkey')
+    for name in INDEXES:
+        op.drop_index(name, table_name='notifications_old')
+
+
+def upgrade() -> None:
+    _rename_old_table()
+    op.create_table(
+        'notifications',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.String(length=1000), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('id', 'created_at', name='notifications_pkey'),
+        postgresql_partition_by='RANGE (created_at)',
+    )
+    op.execute('CREATE TABLE notifications_default PARTITION OF notifications DEFAULT')
+    op.execute(CREATE_MONTH_PARTITIONS)
+    op.execute(
+        f'INSERT INTO notifications ({COLUMNS}) '
+        'SELECT id, user_id, type, title, body, is_read, COALESCE(created_at, now()) FROM notifications_old'
+    )
+    op.drop_table('notifications_old')
+    _create_indexes()
+
+
+def downgrade() -> None:
+    _rename_old_table()
+    op.create_table(
+        'notifications',
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True, nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.String(length=1000), nullable=True),
+        sa.Column('is_read', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    )
+    op.execute(f'INSERT INTO notifications ({COLUMNS}) SELECT {COLUMNS} FROM notifications_old')
+    # Dropping the partitioned parent drops all of its partitions.
+    op.drop_table('notifications_old')
+    _create_indexes()
@@ -0,0 +1,40 @@
+"""add notification coalescing columns and heads table
+
+Revision ID: e6a0c3f8b4d9
+Revises: d5f9b2e7a3c8
+Create Date: 2025-12-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6a0c3f8b4d9'
+down_revision: Union[str, Sequence[str], None] = 'd5f9b2e7a3c8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('notifications', sa.Column('group_key', sa.String(length=100), nullable=True))
+    op.add_column('notifications', sa.Column('count', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('notifications', sa.Column('last_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_table(
+        'notification_coalesce_heads',
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('type', sa.String(length=50), primary_key=True),
+        sa.Column('group_key', sa.String(length=100), primary_key=True),
+        sa.Column('notification_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('notification_coalesce_heads')
+    op.drop_column('notifications', 'last_at')
+    op.drop_column('notifications', 'count')
+    op.drop_column('notifications', 'group_key')
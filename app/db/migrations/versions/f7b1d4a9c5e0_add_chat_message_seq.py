@@ -0,0 +1,47 @@
+"""add per-thread chat message sequence numbers
+
+Revision ID: f7b1d4a9c5e0
+Revises: e6a0c3f8b4d9
+Create Date: 2025-12-22 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7b1d4a9c5e0'
+down_revision: Union[str, Sequence[str], None] = 'e6a0c3f8b4d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_threads', sa.Column('last_seq', sa.BigInteger(), nullable=False, server_default='0'))
+    op.add_column('chat_messages', sa.Column('seq', sa.BigInteger(), nullable=True))
+    # Number existing messages in the order clients have been shown them.
+    op.execute(
+        """
+        UPDATE chat_messages m SET seq = numbered.seq
+          FROM (SELECT id, row_number() OVER (PARTITION BY thread_id ORDER BY sent_at, id) AS seq
+                  FROM chat_messages) numbered
+         WHERE m.id = numbered.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE chat_threads t SET last_seq = counted.last_seq
+          FROM (SELECT thread_id, max(seq) AS last_seq FROM chat_messages GROUP BY thread_id) counted
+         WHERE t.id = counted.thread_id
+        """
+    )
+    op.alter_column('chat_messages', 'seq', nullable=False)
+    op.create_index('ix_chat_messages_thread_id_seq', 'chat_messages', ['thread_id', 'seq'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_chat_messages_thread_id_seq', table_name='chat_messages')
+    op.drop_column('chat_messages', 'seq')
+    op.drop_column('chat_threads', 'last_seq')
@@ -1,13 +1,20 @@
+from typing import Callable, TypeVar
+
+import anyio
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
+T = TypeVar("T")
+
 # Sync engine – matches your DATABASE_URL (postgresql://... using psycopg2)
 engine = create_engine(
     settings.DATABASE_URL,
     future=True,
     pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
 )
 
 SessionLocal = sessionmaker(
@@ -15,4 +22,30 @@ SessionLocal = sessionmaker(
     autoflush=False,
     bind=engine,
     future=True,
-)
\ No newline at end of file
+)
+
+_db_limiter = None
+
+
+def _limiter() -> anyio.CapacityLimiter:
+    # One thread per pooled connection, so DB threads never queue inside the pool.
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW)
+    return _db_limiter
+
+
+async def run_with_session(fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run sync `fn(db, *args, **kwargs)` from async code (websockets, streams) on the
+    bounded DB threadpool, with a session that lives only for that call.
+    """
+
+    def call():
+        db = SessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    return await anyio.to_thread.run_sync(call, limiter=_limiter())
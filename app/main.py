@@ -1,11 +1,39 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import anyio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from app.core.cache import listen_for_invalidations
 from app.core.config import settings
 from app.core.logging import setup_logging
+from app.core.loop_monitor import LoopLagMonitor
 from app.core.exceptions import register_exception_handlers
 from app.api_router import api_router
 from app.core.envelope import ResponseEnvelopeMiddleware
+from app.modules.chat.writer import get_message_writer
+from app.modules.outbox import service as outbox_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+    monitor = LoopLagMonitor(settings.LOOP_LAG_THRESHOLD_SECONDS) if settings.LOOP_LAG_MONITOR_ENABLED else None
+    if monitor:
+        monitor.start()
+    stop = asyncio.Event()
+    tasks = []
+    if settings.OUTBOX_DISPATCHER_ENABLED:
+        tasks.append(asyncio.create_task(outbox_service.run_dispatcher(stop)))
+    invalidations = asyncio.create_task(listen_for_invalidations())
+    yield
+    invalidations.cancel()
+    stop.set()
+    await asyncio.gather(*tasks)
+    await get_message_writer().close()
+    if monitor:
+        await monitor.stop()
 
 
 def create_app() -> FastAPI:
@@ -14,6 +42,7 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title=settings.APP_NAME,
         debug=settings.DEBUG,
+        lifespan=lifespan,
     )
 
     # Standard response envelope
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
 
 from app.core.dependencies import get_db, require_roles
 from app.modules.admin import service, schemas
+from app.modules.notifications import schemas as notification_schemas
 from app.modules.users.models import User
 
 router = APIRouter()
@@ -17,3 +18,39 @@ def get_summary_report(
     High-level dashboard summary for admins.
     """
     return service.summary(db)
+
+
+@router.get("/reports/slot-cache", response_model=schemas.CacheStats)
+def get_slot_cache_stats(
+    admin_user: User = Depends(require_roles("ADMIN")),
+):
+    """
+    Hit/miss counters of this worker's availability slot cache.
+    """
+    return service.slot_cache_stats()
+
+
+@router.get("/reports/realtime", response_model=schemas.RealtimeStats)
+def get_realtime_stats(
+    admin_user: User = Depends(require_roles("ADMIN")),
+):
+    """
+    This worker's pub/sub fan-out: subscriptions, send queue depth and evicted slow consumers.
+    """
+    return service.realtime_stats()
+
+
+@router.post(
+    "/notifications/broadcast",
+    response_model=notification_schemas.BroadcastResult,
+    status_code=status.HTTP_201_CREATED,
+)
+def broadcast_notification(
+    payload: notification_schemas.NotificationBroadcast,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_roles("ADMIN")),
+):
+    """
+    Send one notification to many users with a single INSERT ... SELECT.
+    """
+    return {"notified": service.broadcast_notification(db, payload)}
@@ -28,3 +28,22 @@ class Summary(BaseModel):
     profiles: ProfilesSummary
     appointments: AppointmentsSummary
     billing: BillingSummary
+
+
+class CacheStats(BaseModel):
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    invalidations: int
+
+
+class RealtimeStats(BaseModel):
+    backend: str
+    channels: int
+    subscriptions: int
+    queued_total: int
+    queued_max: int
+    published: int
+    delivered: int
+    evicted_slow_consumers: int
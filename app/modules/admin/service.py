@@ -1,11 +1,14 @@
 from sqlalchemy import func, case
 from sqlalchemy.orm import Session
 
+from app.core.pubsub import get_broker
 from app.modules.users import models as user_models
 from app.modules.patients import models as patient_models
 from app.modules.doctors import models as doctor_models
 from app.modules.appointments import models as appt_models
 from app.modules.billing import models as billing_models
+from app.modules.doctors import service as doctors_service
+from app.modules.notifications import service as notifications_service, schemas as notification_schemas
 
 
 def summary(db: Session) -> dict:
@@ -63,3 +66,15 @@ def summary(db: Session) -> dict:
             "pending_total": float(billing_pending or 0),
         },
     }
+
+
+def slot_cache_stats() -> dict:
+    return doctors_service.slot_cache.stats()
+
+
+def realtime_stats() -> dict:
+    return get_broker().stats()
+
+
+def broadcast_notification(db: Session, payload: notification_schemas.NotificationBroadcast) -> int:
+    return notifications_service.broadcast(db, payload)
@@ -0,0 +1,74 @@
+"""Appointment domain events and the notifications each one fans out to.
+
+Services stage events with `outbox.repository.add_event` so they commit with
+the appointment change; the outbox dispatcher later turns them into
+notifications with `NOTIFICATION_HANDLERS`.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List
+
+BOOKED = "appointment.booked"
+SERIES_BOOKED = "appointment.series_booked"
+CANCELLED = "appointment.cancelled"
+STATUS_CHANGED = "appointment.status_changed"
+RESCHEDULED = "appointment.rescheduled"
+
+
+def payload(appointment_id, doctor, patient, start_time: datetime, **extra) -> dict:
+    """JSON-safe event payload carrying everything the notification handlers need."""
+    return {
+        "appointment_id": str(appointment_id),
+        "doctor_user_id": str(doctor.user_id) if doctor and doctor.user_id else None,
+        "patient_user_id": str(patient.user_id) if patient and patient.user_id else None,
+        "doctor_name": (doctor.last_name or doctor.first_name) if doctor else None,
+        "start_time": start_time.isoformat(),
+        **extra,
+    }
+
+
+def _notification(user_id, title: str, body: str) -> List[dict]:
+    if not user_id:
+        return []
+    return [{"user_id": user_id, "type": "APPOINTMENT", "title": title, "body": body}]
+
+
+def _booked(p: dict) -> List[dict]:
+    return _notification(p["doctor_user_id"], "New appointment booked", f"Patient booked for {p['start_time']}") + _notification(
+        p["patient_user_id"], "Appointment confirmed", f"With Dr. {p['doctor_name']} at {p['start_time']}"
+    )
+
+
+def _series_booked(p: dict) -> List[dict]:
+    body = f"{p['occurrences']} appointments starting {p['start_time']}"
+    return _notification(p["doctor_user_id"], "New appointment series booked", body) + _notification(
+        p["patient_user_id"], "Appointment series confirmed", f"With Dr. {p['doctor_name']}: {body}"
+    )
+
+
+def _cancelled(p: dict) -> List[dict]:
+    return _notification(
+        p["patient_user_id"], "Appointment cancelled", p.get("cancellation_reason") or "Your appointment was cancelled"
+    ) + _notification(p["doctor_user_id"], "Appointment cancelled", "Patient cancelled an appointment.")
+
+
+def _status_changed(p: dict) -> List[dict]:
+    title = f"Appointment {p['status'].title()}"
+    return _notification(p["patient_user_id"], title, "Status changed.") + _notification(
+        p["doctor_user_id"], title, "Status changed."
+    )
+
+
+def _rescheduled(p: dict) -> List[dict]:
+    body = f"New time: {p['start_time']}"
+    return _notification(p["patient_user_id"], "Appointment rescheduled", body) + _notification(
+        p["doctor_user_id"], "Appointment rescheduled", body
+    )
+
+
+NOTIFICATION_HANDLERS: Dict[str, Callable[[dict], List[dict]]] = {
+    BOOKED: _booked,
+    SERIES_BOOKED: _series_booked,
+    CANCELLED: _cancelled,
+    STATUS_CHANGED: _status_changed,
+    RESCHEDULED: _rescheduled,
+}
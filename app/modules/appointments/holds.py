@@ -0,0 +1,206 @@
+"""Short-lived slot holds taken while a patient completes booking checkout.
+
+Holds live outside Postgres: in Redis when `REDIS_URL` is set (shared by all
+workers), otherwise in process memory (single-worker and development setups).
+Each store rejects a hold that overlaps another unexpired hold of the same
+doctor atomically, so two checkouts can never hold the same slot.
+"""
+import json
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Hold:
+    id: str
+    doctor_id: str
+    patient_id: str
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+    @classmethod
+    def new(cls, doctor_id, patient_id, start_time: datetime, end_time: datetime, ttl_seconds: int) -> "Hold":
+        expires_at = datetime.fromtimestamp(time.time() + ttl_seconds, tz=timezone.utc)
+        return cls(str(uuid.uuid4()), str(doctor_id), str(patient_id), start_time, end_time, expires_at)
+
+    def to_json(self) -> str:
+        data = asdict(self)
+        for field in ("start_time", "end_time", "expires_at"):
+            data[field] = data[field].isoformat()
+        return json.dumps(data)
+
+    @classmethod
+    def from_json(cls, raw) -> "Hold":
+        data = json.loads(raw)
+        for field in ("start_time", "end_time", "expires_at"):
+            data[field] = datetime.fromisoformat(data[field])
+        return cls(**data)
+
+
+def _ms(dt: datetime) -> int:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+
+class InMemoryHoldStore:
+    def __init__(self):
+        self._holds: Dict[str, Hold] = {}
+        self._by_doctor: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def _purge(self, doctor_id: str, now: datetime):
+        ids = self._by_doctor.get(doctor_id, set())
+        for hold_id in [h for h in ids if self._holds[h].expires_at <= now]:
+            ids.discard(hold_id)
+            del self._holds[hold_id]
+
+    def acquire(self, hold: Hold) -> bool:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            self._purge(hold.doctor_id, now)
+            for other_id in self._by_doctor.get(hold.doctor_id, ()):
+                other = self._holds[other_id]
+                if other.start_time < hold.end_time and other.end_time > hold.start_time:
+                    return False
+            self._holds[hold.id] = hold
+            self._by_doctor.setdefault(hold.doctor_id, set()).add(hold.id)
+            return True
+
+    def get(self, hold_id: str) -> Optional[Hold]:
+        with self._lock:
+            hold = self._holds.get(hold_id)
+        if hold is None or hold.expires_at <= datetime.now(timezone.utc):
+            return None
+        return hold
+
+    def release(self, hold_id: str) -> Optional[Hold]:
+        with self._lock:
+            hold = self._holds.pop(hold_id, None)
+            if hold is not None:
+                self._by_doctor.get(hold.doctor_id, set()).discard(hold_id)
+        return hold
+
+    def list_for_doctors(self, doctor_ids: Iterable, start: datetime, end: datetime) -> Dict[str, List[Hold]]:
+        now = datetime.now(timezone.utc)
+        out: Dict[str, List[Hold]] = {}
+        with self._lock:
+            for doctor_id in map(str, doctor_ids):
+                self._purge(doctor_id, now)
+                found = [
+                    self._holds[h]
+                    for h in self._by_doctor.get(doctor_id, ())
+                    if self._holds[h].start_time < end and self._holds[h].end_time > start
+                ]
+                if found:
+                    out[doctor_id] = found
+        return out
+
+
+# KEYS: doctor index, hold key. ARGV: now_ms, start_ms, end_ms, expires_ms, member, payload, ttl_ms
+_ACQUIRE_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local s, e = string.match(member, '^(%d+):(%d+):')
+    if tonumber(s) < tonumber(ARGV[3]) and tonumber(e) > tonumber(ARGV[2]) then
+        return 0
+    end
+end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[5])
+redis.call('PEXPIRE', KEYS[1], ARGV[7])
+redis.call('SET', KEYS[2], ARGV[6], 'PX', ARGV[7])
+return 1
+"""
+
+
+class RedisHoldStore:
+    """Holds as expiring keys, plus a per-doctor sorted set scored by expiry for overlap checks."""
+
+    def __init__(self, url: str, prefix: str = "slot_holds"):
+        import redis
+
+        self._redis = redis.Redis.from_url(url)
+        self._prefix = prefix
+        self._acquire = self._redis.register_script(_ACQUIRE_LUA)
+
+    def _hold_key(self, hold_id: str) -> str:
+        return f"{self._prefix}:hold:{hold_id}"
+
+    def _doctor_key(self, doctor_id: str) -> str:
+        return f"{self._prefix}:doctor:{doctor_id}"
+
+    @staticmethod
+    def _member(hold: Hold) -> str:
+        return f"{_ms(hold.start_time)}:{_ms(hold.end_time)}:{hold.patient_id}:{hold.id}"
+
+    def acquire(self, hold: Hold) -> bool:
+        now_ms = int(time.time() * 1000)
+        ttl_ms = max(_ms(hold.expires_at) - now_ms, 1)
+        acquired = self._acquire(
+            keys=[self._doctor_key(hold.doctor_id), self._hold_key(hold.id)],
+            args=[now_ms, _ms(hold.start_time), _ms(hold.end_time), _ms(hold.expires_at), self._member(hold), hold.to_json(), ttl_ms],
+        )
+        return bool(acquired)
+
+    def get(self, hold_id: str) -> Optional[Hold]:
+        raw = self._redis.get(self._hold_key(hold_id))
+        return Hold.from_json(raw) if raw else None
+
+    def release(self, hold_id: str) -> Optional[Hold]:
+        hold = self.get(hold_id)
+        if hold is None:
+            return None
+        pipe = self._redis.pipeline()
+        pipe.delete(self._hold_key(hold_id))
+        pipe.zrem(self._doctor_key(hold.doctor_id), self._member(hold))
+        pipe.execute()
+        return hold
+
+    def list_for_doctors(self, doctor_ids: Iterable, start: datetime, end: datetime) -> Dict[str, List[Hold]]:
+        doctor_ids = [str(d) for d in doctor_ids]
+        if not doctor_ids:
+            return {}
+        now_ms = int(time.time() * 1000)
+        pipe = self._redis.pipeline(transaction=False)
+        for doctor_id in doctor_ids:
+            pipe.zrangebyscore(self._doctor_key(doctor_id), now_ms, "+inf", withscores=True)
+        start_ms, end_ms = _ms(start), _ms(end)
+        out = {}
+        for doctor_id, members in zip(doctor_ids, pipe.execute()):
+            found = []
+            for member, expires_ms in members:
+                s, e, patient_id, hold_id = member.decode().split(":", 3)
+                if int(s) < end_ms and int(e) > start_ms:
+                    found.append(
+                        Hold(
+                            hold_id,
+                            doctor_id,
+                            patient_id,
+                            datetime.fromtimestamp(int(s) / 1000, tz=timezone.utc),
+                            datetime.fromtimestamp(int(e) / 1000, tz=timezone.utc),
+                            datetime.fromtimestamp(expires_ms / 1000, tz=timezone.utc),
+                        )
+                    )
+            if found:
+                out[doctor_id] = found
+        return out
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_hold_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = RedisHoldStore(settings.REDIS_URL) if settings.REDIS_URL else InMemoryHoldStore()
+    return _store
@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, ForeignKey, Index, text
+from sqlalchemy.dialects.postgresql import UUID, ExcludeConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -20,5 +20,18 @@ class Appointment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
+    __table_args__ = (
+        # Two scheduled appointments of one doctor may never overlap (needs btree_gist).
+        ExcludeConstraint(
+            (doctor_id, "="),
+            (func.tstzrange(start_time, end_time, text("'[)'")), "&&"),
+            name="appointments_no_overlap",
+            using="gist",
+            where=text("status = 'SCHEDULED'"),
+        ),
+        Index("ix_appointments_doctor_id_status_start_time", doctor_id, status, start_time),
+        Index("ix_appointments_patient_id_start_time", patient_id, start_time.desc()),
+    )
+
     patient = relationship("Patient")
     doctor = relationship("Doctor")
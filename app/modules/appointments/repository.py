@@ -1,9 +1,18 @@
+import uuid
 from datetime import datetime
+from typing import Callable, List, Optional
+from uuid import UUID
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
 
 from app.modules.appointments import models
 
+NO_OVERLAP_CONSTRAINT = "appointments_no_overlap"
+EXCLUSION_VIOLATION = "23P01"
+SLOT_TAKEN = "Doctor is not available at the requested time"
+
 
 def list_appointments_for_patient(db: Session, patient_id, skip: int = 0, limit: int = 100):
     return (
@@ -32,16 +41,14 @@ def get_by_id(db: Session, appointment_id):
 
 
 def has_conflict(db: Session, doctor_id, start_time: datetime, end_time: datetime) -> bool:
+    """Advisory check only; bookings rely on the `appointments_no_overlap` constraint."""
     conflict = (
-        db.query(models.Appointment)
+        db.query(models.Appointment.id)
         .filter(
             models.Appointment.doctor_id == doctor_id,
             models.Appointment.status == "SCHEDULED",
-            or_(
-                and_(models.Appointment.start_time <= start_time, models.Appointment.end_time > start_time),
-                and_(models.Appointment.start_time < end_time, models.Appointment.end_time >= end_time),
-                and_(models.Appointment.start_time >= start_time, models.Appointment.end_time <= end_time),
-            ),
+            models.Appointment.start_time < end_time,
+            models.Appointment.end_time > start_time,
         )
         .first()
     )
@@ -61,19 +68,86 @@ def list_scheduled_for_doctor_between(db: Session, doctor_id, start_time: dateti
     )
 
 
+def list_scheduled_windows_for_doctors_between(db: Session, doctor_ids, start_time: datetime, end_time: datetime):
+    """(doctor_id, start_time, end_time) rows of scheduled appointments for many doctors at once."""
+    if not doctor_ids:
+        return []
+    return (
+        db.query(models.Appointment.doctor_id, models.Appointment.start_time, models.Appointment.end_time)
+        .filter(
+            models.Appointment.doctor_id.in_(doctor_ids),
+            models.Appointment.status == "SCHEDULED",
+            models.Appointment.start_time < end_time,
+            models.Appointment.end_time > start_time,
+        )
+        .all()
+    )
+
+
+def _is_overlap_violation(exc: IntegrityError) -> bool:
+    orig = exc.orig
+    diag = getattr(orig, "diag", None)
+    return getattr(orig, "pgcode", None) == EXCLUSION_VIOLATION and getattr(diag, "constraint_name", None) == NO_OVERLAP_CONSTRAINT
+
+
+def _commit_booking(db: Session):
+    try:
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        if _is_overlap_violation(exc):
+            raise ValueError(SLOT_TAKEN) from exc
+        raise
+
+
 def create_appointment(db: Session, payload: dict):
+    """Insert a booking; a clash with another scheduled appointment raises ValueError."""
     appt = models.Appointment(**payload)
     db.add(appt)
-    db.commit()
+    _commit_booking(db)
     db.refresh(appt)
     return appt
 
 
+def create_appointments(
+    db: Session,
+    payloads: List[dict],
+    *,
+    skip_conflicts: bool = False,
+    before_commit: Callable[[List[Optional[UUID]]], None] | None = None,
+) -> List[Optional[UUID]]:
+    """Insert many bookings in one transaction and return their ids.
+
+    By default any clash rolls back the whole batch (ValueError). With
+    `skip_conflicts` all rows go in one INSERT ... ON CONFLICT DO NOTHING, which
+    Postgres applies to the exclusion constraint; clashing rows come back as None.
+    `before_commit` receives the ids and may stage more rows in the same transaction.
+    """
+    if not skip_conflicts:
+        appts = [models.Appointment(id=uuid.uuid4(), **p) for p in payloads]
+        db.add_all(appts)
+        ids = [a.id for a in appts]
+        if before_commit:
+            before_commit(ids)
+        _commit_booking(db)
+        return ids
+    rows = [{"id": uuid.uuid4(), **p} for p in payloads]
+    inserted = set()
+    if rows:
+        stmt = insert(models.Appointment).values(rows).on_conflict_do_nothing().returning(models.Appointment.id)
+        inserted = set(db.execute(stmt).scalars())
+    ids: List[Optional[UUID]] = [row["id"] if row["id"] in inserted else None for row in rows]
+    if before_commit:
+        before_commit(ids)
+    db.commit()
+    return ids
+
+
 def update_appointment(db: Session, appointment: models.Appointment, updates: dict):
     for field, value in updates.items():
         if value is not None:
             setattr(appointment, field, value)
     db.add(appointment)
-    db.commit()
+    _commit_booking(db)
     db.refresh(appointment)
     return appointment
@@ -44,6 +44,76 @@ def book_appointment(
     return appt
 
 
+@router.post("/recurring", response_model=schemas.RecurringBookingResult, status_code=status.HTTP_201_CREATED)
+def book_recurring(
+    payload: schemas.RecurringAppointmentCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles("PATIENT", "ADMIN")),
+):
+    patient_id = payload.patient_id
+    if not patient_id:
+        patient = patients_repository.get_by_user_id(db, user_id=current_user.id)
+        if not patient:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient profile not found")
+        patient_id = patient.id
+    try:
+        return service.book_recurring(db, patient_id=patient_id, payload=payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def _patient_scope(db: Session, current_user: User):
+    """Patient id holds are restricted to; None for admins."""
+    if current_user.is_superuser or getattr(current_user, "role_name", "").upper() != "PATIENT":
+        return None
+    patient = patients_repository.get_by_user_id(db, user_id=current_user.id)
+    if not patient:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Patient profile not found")
+    return patient.id
+
+
+@router.post("/holds", response_model=schemas.HoldRead, status_code=status.HTTP_201_CREATED)
+def create_hold(
+    payload: schemas.HoldCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles("PATIENT", "ADMIN")),
+):
+    patient_id = _patient_scope(db, current_user)
+    try:
+        return service.create_hold(db, patient_id=patient_id, payload=payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.delete("/holds/{hold_id}", status_code=status.HTTP_204_NO_CONTENT)
+def release_hold(
+    hold_id: UUID,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles("PATIENT", "ADMIN")),
+):
+    try:
+        service.release_hold(hold_id, patient_id=_patient_scope(db, current_user))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return None
+
+
+@router.post("/holds/{hold_id}/confirm", response_model=schemas.AppointmentRead, status_code=status.HTTP_201_CREATED)
+def confirm_hold(
+    hold_id: UUID,
+    payload: schemas.HoldConfirm,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_roles("PATIENT", "ADMIN")),
+):
+    patient_id = _patient_scope(db, current_user)
+    try:
+        return service.confirm_hold(db, hold_id=hold_id, patient_id=patient_id, payload=payload)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.post("/{appointment_id}/cancel", response_model=schemas.AppointmentRead)
 def cancel_appointment(
     appointment_id: UUID,
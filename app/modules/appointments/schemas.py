@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from pydantic import BaseModel, Field
@@ -34,3 +34,55 @@ class AppointmentRead(AppointmentBase):
     updated_at: datetime
 
     model_config = {"from_attributes": True}
+
+
+class HoldCreate(BaseModel):
+    doctor_id: UUID
+    start_time: datetime
+    end_time: datetime
+    patient_id: Optional[UUID] = None
+
+
+class HoldRead(BaseModel):
+    id: UUID
+    doctor_id: UUID
+    patient_id: UUID
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class HoldConfirm(BaseModel):
+    reason: Optional[str] = None
+
+
+class RecurrenceRule(BaseModel):
+    """Subset of RFC 5545 RRULE: FREQ, INTERVAL and COUNT or UNTIL."""
+
+    freq: Literal["DAILY", "WEEKLY", "MONTHLY"]
+    interval: int = Field(default=1, ge=1)
+    count: Optional[int] = Field(default=None, ge=1)
+    until: Optional[datetime] = None
+
+
+class RecurringAppointmentCreate(AppointmentBase):
+    """`start_time`/`end_time` describe the first occurrence."""
+
+    rule: RecurrenceRule
+    mode: Literal["all_or_nothing", "partial"] = "all_or_nothing"
+
+
+class OccurrenceResult(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    status: Literal["booked", "available", "unavailable", "conflict"]
+    appointment_id: Optional[UUID] = None
+
+
+class RecurringBookingResult(BaseModel):
+    committed: bool
+    booked: int
+    rejected: int
+    occurrences: List[OccurrenceResult]
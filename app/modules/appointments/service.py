@@ -1,15 +1,21 @@
-from datetime import datetime
+import bisect
+import calendar
+import uuid
+from datetime import datetime, timedelta, timezone
 from uuid import UUID
 from sqlalchemy.orm import Session
 
-from app.modules.appointments import repository, schemas
+from app.core.config import settings
+from app.modules.appointments import events, holds, repository, schemas
 from app.modules.patients import repository as patients_repository
 from app.modules.doctors import repository as doctors_repository
 from app.modules.doctors import models as doctor_models
-from app.modules.notifications import service as notifications_service, schemas as notif_schemas
+from app.modules.doctors import service as doctors_service, slots as doctor_slots
+from app.modules.outbox import repository as outbox_repository
 
 
 VALID_STATUSES = {"SCHEDULED", "COMPLETED", "CANCELLED"}
+MAX_OCCURRENCES = 104
 
 
 def _validate_times(start_time: datetime, end_time: datetime):
@@ -37,6 +43,14 @@ def _check_doctor_availability(db: Session, doctor_id: UUID, start_time: datetim
             raise ValueError("Requested time is outside doctor's availability")
 
 
+def _check_holds(doctor_id: UUID, patient_id: UUID, start_time: datetime, end_time: datetime):
+    """Reject a window overlapping a live checkout hold of another patient; the patient's own holds do not block them."""
+    start_time, end_time = _as_utc(start_time), _as_utc(end_time)
+    doctor_holds = holds.get_hold_store().list_for_doctors([doctor_id], start_time, end_time).get(str(doctor_id), [])
+    if any(h.patient_id != str(patient_id) for h in doctor_holds):
+        raise ValueError("Slot is already held by another booking")
+
+
 def list_patient_appointments(db: Session, patient_id: UUID, skip: int = 0, limit: int = 100):
     return repository.list_appointments_for_patient(db, patient_id=patient_id, skip=skip, limit=limit)
 
@@ -58,35 +72,202 @@ def create_appointment(db: Session, patient_id: UUID | None, payload: schemas.Ap
 
     _validate_times(payload.start_time, payload.end_time)
     _check_doctor_availability(db, doctor_id=doctor.id, start_time=payload.start_time, end_time=payload.end_time)
+    _check_holds(doctor.id, patient.id, payload.start_time, payload.end_time)
 
-    if repository.has_conflict(db, doctor_id=doctor.id, start_time=payload.start_time, end_time=payload.end_time):
-        raise ValueError("Doctor is not available at the requested time")
-
+    # The id is generated here so the outbox event commits in the same transaction.
+    appointment_id = uuid.uuid4()
+    outbox_repository.add_event(db, events.BOOKED, events.payload(appointment_id, doctor, patient, payload.start_time))
+    doctors_service.on_schedule_changed(db, doctor.id, days=doctor_slots.days_spanned(payload.start_time, payload.end_time))
+    # Overlaps are rejected by the database, atomically with the insert.
     return repository.create_appointment(
         db,
         {
             **payload.model_dump(exclude_unset=True),
+            "id": appointment_id,
             "patient_id": patient.id,
             "status": "SCHEDULED",
         },
     )
-    notifications_service.notify(
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def create_hold(db: Session, patient_id: UUID | None, payload: schemas.HoldCreate) -> holds.Hold:
+    """Reserve a slot for `SLOT_HOLD_MINUTES` while the patient completes checkout."""
+    pid = patient_id or payload.patient_id
+    if not pid:
+        raise ValueError("patient_id is required")
+    patient = patients_repository.get_by_id(db, pid)
+    if not patient:
+        raise ValueError("Patient not found")
+    doctor = doctors_repository.get_doctor(db, doctor_id=payload.doctor_id)
+    if not doctor:
+        raise ValueError("Doctor not found")
+
+    start_time, end_time = _as_utc(payload.start_time), _as_utc(payload.end_time)
+    _validate_times(start_time, end_time)
+    _check_doctor_availability(db, doctor_id=doctor.id, start_time=start_time, end_time=end_time)
+    if repository.has_conflict(db, doctor_id=doctor.id, start_time=start_time, end_time=end_time):
+        raise ValueError("Doctor is not available at the requested time")
+
+    hold = holds.Hold.new(doctor.id, patient.id, start_time, end_time, ttl_seconds=settings.SLOT_HOLD_MINUTES * 60)
+    if not holds.get_hold_store().acquire(hold):
+        raise ValueError("Slot is already held by another booking")
+    doctors_service.slot_cache.invalidate_tag(doctor.id)
+    return hold
+
+
+def _get_own_hold(hold_id: UUID, patient_id: UUID | None) -> holds.Hold:
+    hold = holds.get_hold_store().get(str(hold_id))
+    if hold is None or (patient_id is not None and hold.patient_id != str(patient_id)):
+        raise ValueError("Hold not found or expired")
+    return hold
+
+
+def release_hold(hold_id: UUID, patient_id: UUID | None = None):
+    hold = _get_own_hold(hold_id, patient_id)
+    holds.get_hold_store().release(hold.id)
+    doctors_service.slot_cache.invalidate_tag(UUID(hold.doctor_id))
+
+
+def confirm_hold(db: Session, hold_id: UUID, patient_id: UUID | None, payload: schemas.HoldConfirm):
+    """Turn a live hold into an appointment; the hold already passed availability validation.
+
+    The hold is released whether or not the booking succeeds, so a failed confirm does not
+    block the slot until the hold expires. A doctor or patient deleted meanwhile raises LookupError.
+    """
+    hold = _get_own_hold(hold_id, patient_id)
+    try:
+        doctor = doctors_repository.get_doctor(db, doctor_id=UUID(hold.doctor_id))
+        if not doctor:
+            raise LookupError("Doctor not found")
+        patient = patients_repository.get_by_id(db, UUID(hold.patient_id))
+        if not patient:
+            raise LookupError("Patient not found")
+        appointment_id = uuid.uuid4()
+        outbox_repository.add_event(db, events.BOOKED, events.payload(appointment_id, doctor, patient, hold.start_time))
+        doctors_service.on_schedule_changed(db, doctor.id, days=doctor_slots.days_spanned(hold.start_time, hold.end_time))
+        appt = repository.create_appointment(
+            db,
+            {
+                "id": appointment_id,
+                "doctor_id": doctor.id,
+                "patient_id": patient.id,
+                "start_time": hold.start_time,
+                "end_time": hold.end_time,
+                "reason": payload.reason,
+                "status": "SCHEDULED",
+            },
+        )
+    finally:
+        holds.get_hold_store().release(hold.id)
+        doctors_service.slot_cache.invalidate_tag(UUID(hold.doctor_id))
+    return appt
+
+
+def _add_months(dt: datetime, months: int) -> datetime | None:
+    month0 = dt.month - 1 + months
+    year, month = dt.year + month0 // 12, month0 % 12 + 1
+    if dt.day > calendar.monthrange(year, month)[1]:
+        return None  # RFC 5545: occurrences on nonexistent dates are skipped
+    return dt.replace(year=year, month=month)
+
+
+def expand_occurrences(start_time: datetime, end_time: datetime, rule: schemas.RecurrenceRule):
+    """(start, end) pairs for every occurrence of `rule`, starting with the given one."""
+    if rule.count is None and rule.until is None:
+        raise ValueError("rule needs count or until")
+    until = _as_utc(rule.until) if rule.until else None
+    duration = end_time - start_time
+    occurrences = []
+    step = 0
+    while rule.count is None or len(occurrences) < rule.count:
+        if rule.freq == "MONTHLY":
+            start = _add_months(start_time, step * rule.interval)
+        else:
+            start = start_time + timedelta(days=step * rule.interval * (7 if rule.freq == "WEEKLY" else 1))
+        step += 1
+        if start is None:
+            continue
+        if until is not None and start > until:
+            break
+        if len(occurrences) == MAX_OCCURRENCES:
+            raise ValueError(f"A series may have at most {MAX_OCCURRENCES} occurrences")
+        occurrences.append((start, start + duration))
+    if not occurrences:
+        raise ValueError("rule yields no occurrences")
+    if len(occurrences) > 1 and occurrences[1][0] < occurrences[0][1]:
+        raise ValueError("Occurrences overlap; increase the interval or shorten the appointment")
+    return occurrences
+
+
+def book_recurring(db: Session, patient_id: UUID | None, payload: schemas.RecurringAppointmentCreate):
+    """Validate every occurrence with two queries and insert the bookable ones in one batch."""
+    pid = patient_id or payload.patient_id
+    if not pid:
+        raise ValueError("patient_id is required")
+    patient = patients_repository.get_by_id(db, pid)
+    if not patient:
+        raise ValueError("Patient not found")
+    doctor = doctors_repository.get_doctor(db, doctor_id=payload.doctor_id)
+    if not doctor:
+        raise ValueError("Doctor not found")
+    start_time, end_time = _as_utc(payload.start_time), _as_utc(payload.end_time)
+    _validate_times(start_time, end_time)
+    occurrences = expand_occurrences(start_time, end_time, payload.rule)
+
+    # Same rule as _check_doctor_availability: weekdays without active windows are unrestricted.
+    windows = doctor_slots.windows_by_weekday(doctors_repository.list_availability(db, doctor_id=doctor.id))
+    series_start, series_end = occurrences[0][0], occurrences[-1][1]
+    busy_windows = [
+        (s, e) for _, s, e in repository.list_scheduled_windows_for_doctors_between(db, [doctor.id], series_start, series_end)
+    ]
+    doctor_holds = holds.get_hold_store().list_for_doctors([doctor.id], series_start, series_end).get(str(doctor.id), [])
+    busy_windows += [(h.start_time, h.end_time) for h in doctor_holds if h.patient_id != str(patient.id)]
+    busy = doctor_slots.merge_busy(busy_windows)
+
+    results = []
+    for start, end in occurrences:
+        day_windows = windows.get(start.strftime("%a"))
+        if day_windows and not any(w_start <= start.time() and w_end >= end.time() for w_start, w_end in day_windows):
+            status = "unavailable"
+        else:
+            i = bisect.bisect_right(busy.ends, doctor_slots.to_epoch(start))
+            status = "conflict" if i < len(busy) and busy.starts[i] < doctor_slots.to_epoch(end) else "available"
+        results.append(schemas.OccurrenceResult(start_time=start, end_time=end, status=status))
+
+    bookable = [r for r in results if r.status == "available"]
+    all_or_nothing = payload.mode == "all_or_nothing"
+    if not bookable or (all_or_nothing and len(bookable) != len(results)):
+        return schemas.RecurringBookingResult(committed=False, booked=0, rejected=len(results) - len(bookable), occurrences=results)
+
+    base = {**payload.model_dump(include={"doctor_id", "reason"}), "patient_id": patient.id, "status": "SCHEDULED"}
+
+    def stage_event(ids):
+        inserted = [(r, appointment_id) for r, appointment_id in zip(bookable, ids) if appointment_id]
+        if inserted:
+            first, first_id = inserted[0]
+            event = events.payload(first_id, doctor, patient, first.start_time, occurrences=len(inserted))
+            outbox_repository.add_event(db, events.SERIES_BOOKED, event)
+            days = {d for r, _ in inserted for d in doctor_slots.days_spanned(r.start_time, r.end_time)}
+            doctors_service.on_schedule_changed(db, doctor.id, days=days)
+
+    ids = repository.create_appointments(
         db,
-        notif_schemas.NotificationCreate(
-            user_id=doctor.user_id,
-            type="APPOINTMENT",
-            title="New appointment booked",
-            body=f"Patient booked for {payload.start_time.isoformat()}",
-        ),
+        [{**base, "start_time": r.start_time, "end_time": r.end_time} for r in bookable],
+        skip_conflicts=not all_or_nothing,
+        before_commit=stage_event,
     )
-    notifications_service.notify(
-        db,
-        notif_schemas.NotificationCreate(
-            user_id=patient.user_id,
-            type="APPOINTMENT",
-            title="Appointment confirmed",
-            body=f"With Dr. {doctor.last_name or doctor.first_name} at {payload.start_time.isoformat()}",
-        ),
+    for result, appointment_id in zip(bookable, ids):
+        # A booking that raced us between validation and insert shows up as None.
+        result.status = "booked" if appointment_id else "conflict"
+        result.appointment_id = appointment_id
+
+    booked = [r for r in results if r.status == "booked"]
+    return schemas.RecurringBookingResult(
+        committed=bool(booked), booked=len(booked), rejected=len(results) - len(booked), occurrences=results
     )
 
 
@@ -96,31 +277,14 @@ def cancel_appointment(db: Session, appointment_id: UUID, cancellation_reason: s
         raise ValueError("Appointment not found")
     if appt.status == "CANCELLED":
         return appt
+    outbox_repository.add_event(
+        db,
+        events.CANCELLED,
+        events.payload(appt.id, appt.doctor, appt.patient, appt.start_time, cancellation_reason=cancellation_reason),
+    )
+    doctors_service.on_schedule_changed(db, appt.doctor_id, days=doctor_slots.days_spanned(appt.start_time, appt.end_time))
     updates = {"status": "CANCELLED", "cancellation_reason": cancellation_reason}
-    updated = repository.update_appointment(db, appointment=appt, updates=updates)
-    patient = appt.patient
-    doctor = appt.doctor
-    if patient and getattr(patient, "user_id", None):
-        notifications_service.notify(
-            db,
-            notif_schemas.NotificationCreate(
-                user_id=patient.user_id,
-                type="APPOINTMENT",
-                title="Appointment cancelled",
-                body=cancellation_reason or "Your appointment was cancelled",
-            ),
-        )
-    if doctor and getattr(doctor, "user_id", None):
-        notifications_service.notify(
-            db,
-            notif_schemas.NotificationCreate(
-                user_id=doctor.user_id,
-                type="APPOINTMENT",
-                title="Appointment cancelled",
-                body="Patient cancelled an appointment.",
-            ),
-        )
-    return updated
+    return repository.update_appointment(db, appointment=appt, updates=updates)
 
 
 def update_status(db: Session, appointment_id: UUID, status: str):
@@ -129,30 +293,13 @@ def update_status(db: Session, appointment_id: UUID, status: str):
     appt = repository.get_by_id(db, appointment_id=appointment_id)
     if not appt:
         raise ValueError("Appointment not found")
-    updated = repository.update_appointment(db, appointment=appt, updates={"status": status})
-    patient = appt.patient
-    doctor = appt.doctor
-    if patient and getattr(patient, "user_id", None):
-        notifications_service.notify(
-            db,
-            notif_schemas.NotificationCreate(
-                user_id=patient.user_id,
-                type="APPOINTMENT",
-                title=f"Appointment {status.title()}",
-                body="Status changed.",
-            ),
-        )
-    if doctor and getattr(doctor, "user_id", None):
-        notifications_service.notify(
-            db,
-            notif_schemas.NotificationCreate(
-                user_id=doctor.user_id,
-                type="APPOINTMENT",
-                title=f"Appointment {status.title()}",
-                body="Status changed.",
-            ),
-        )
-    return updated
+    previous_status = appt.status
+    outbox_repository.add_event(
+        db, events.STATUS_CHANGED, events.payload(appt.id, appt.doctor, appt.patient, appt.start_time, status=status)
+    )
+    if "SCHEDULED" in {previous_status, status} and previous_status != status:
+        doctors_service.on_schedule_changed(db, appt.doctor_id, days=doctor_slots.days_spanned(appt.start_time, appt.end_time))
+    return repository.update_appointment(db, appointment=appt, updates={"status": status})
 
 
 def reschedule_appointment(db: Session, appointment_id: UUID, start_time: datetime, end_time: datetime):
@@ -161,33 +308,12 @@ def reschedule_appointment(db: Session, appointment_id: UUID, start_time: dateti
         raise ValueError("Appointment not found")
     _validate_times(start_time, end_time)
     _check_doctor_availability(db, doctor_id=appt.doctor_id, start_time=start_time, end_time=end_time)
-    if repository.has_conflict(db, doctor_id=appt.doctor_id, start_time=start_time, end_time=end_time):
-        raise ValueError("Doctor is not available at the requested time")
-    updated = repository.update_appointment(
+    _check_holds(appt.doctor_id, appt.patient_id, start_time, end_time)
+    affected_days = doctor_slots.days_spanned(appt.start_time, appt.end_time) + doctor_slots.days_spanned(start_time, end_time)
+    outbox_repository.add_event(db, events.RESCHEDULED, events.payload(appt.id, appt.doctor, appt.patient, start_time))
+    doctors_service.on_schedule_changed(db, appt.doctor_id, days=affected_days)
+    return repository.update_appointment(
         db,
         appointment=appt,
         updates={"start_time": start_time, "end_time": end_time, "status": "SCHEDULED"},
     )
-    patient = appt.patient
-    doctor = appt.doctor
-    if patient and getattr(patient, "user_id", None):
-        notifications_service.notify(
-            db,
-            notif_schemas.NotificationCreate(
-                user_id=patient.user_id,
-                type="APPOINTMENT",
-                title="Appointment rescheduled",
-                body=f"New time: {start_time.isoformat()}",
-            ),
-        )
-    if doctor and getattr(doctor, "user_id", None):
-        notifications_service.notify(
-            db,
-            notif_schemas.NotificationCreate(
-                user_id=doctor.user_id,
-                type="APPOINTMENT",
-                title="Appointment rescheduled",
-                body=f"New time: {start_time.isoformat()}",
-            ),
-        )
-    return updated
@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import BigInteger, Column, String, DateTime, ForeignKey, Boolean, Index, Integer
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -14,6 +14,8 @@ class ChatThread(Base):
     patient_id = Column(UUID(as_uuid=True), ForeignKey("patients.id", ondelete="CASCADE"), nullable=False, index=True)
     doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id", ondelete="CASCADE"), nullable=False, index=True)
     status = Column(String(20), nullable=False, default="open")  # open | closed
+    # seq of the thread's newest message; bumped under the row lock on every insert
+    last_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -21,6 +23,7 @@ class ChatThread(Base):
     patient = relationship("Patient")
     doctor = relationship("Doctor")
     preferences = relationship("ChatThreadPreference", cascade="all, delete-orphan", back_populates="thread")
+    summary = relationship("ChatThreadSummary", uselist=False, cascade="all, delete-orphan", back_populates="thread")
 
 
 class ChatMessage(Base):
@@ -36,6 +39,13 @@ class ChatMessage(Base):
     sent_at = Column(DateTime(timezone=True), server_default=func.now())
     read_at = Column(DateTime(timezone=True), nullable=True)
     is_system_message = Column(Boolean, default=False, nullable=False)
+    # 1, 2, 3, ... per thread without gaps, in commit order
+    seq = Column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_chat_messages_thread_id_sent_at", thread_id, sent_at.desc()),
+        Index("ix_chat_messages_thread_id_seq", thread_id, seq, unique=True),
+    )
 
     thread = relationship("ChatThread", back_populates="messages")
 
@@ -51,3 +61,30 @@ class ChatThreadPreference(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     thread = relationship("ChatThread", back_populates="preferences")
+
+
+class ChatThreadSummary(Base):
+    """
+    One row per thread with its newest message and unread counts per side, kept in
+    step by the repository message writes so thread lists never read chat_messages.
+    Participants are copied from the thread so listings filter on this table alone.
+    """
+
+    __tablename__ = "chat_thread_summaries"
+
+    thread_id = Column(UUID(as_uuid=True), ForeignKey("chat_threads.id", ondelete="CASCADE"), primary_key=True)
+    patient_id = Column(UUID(as_uuid=True), nullable=False)
+    doctor_id = Column(UUID(as_uuid=True), nullable=False)
+    last_message_id = Column(UUID(as_uuid=True), nullable=True)
+    last_sent_at = Column(DateTime(timezone=True), nullable=True)
+    preview = Column(String(140), nullable=True)
+    # unread messages from the other side, per participant
+    patient_unread = Column(Integer, nullable=False, default=0, server_default="0")
+    doctor_unread = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_chat_thread_summaries_patient_id_last_sent_at", patient_id, last_sent_at.desc().nulls_last()),
+        Index("ix_chat_thread_summaries_doctor_id_last_sent_at", doctor_id, last_sent_at.desc().nulls_last()),
+    )
+
+    thread = relationship("ChatThread", back_populates="summary")
@@ -1,10 +1,19 @@
-from typing import List, Optional
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
 from uuid import UUID
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import column, exists, func, insert, or_, select, text, update, values
 
 from app.modules.chat import models
 
+PREVIEW_LENGTH = 140
+ATTACHMENT_PREVIEW = "Sent an attachment"
+# summary column counting a message as unread, by the sender's role
+RECIPIENT_UNREAD = {"PATIENT": "doctor_unread", "DOCTOR": "patient_unread"}
+
 
 def get_thread(db: Session, thread_id: UUID) -> Optional[models.ChatThread]:
     return db.query(models.ChatThread).filter(models.ChatThread.id == thread_id).first()
@@ -35,12 +44,13 @@ def search_threads(
     sort_recent: bool = False,
     status: str | None = None,
     include_archived: bool = True,
-) -> List[models.ChatThread]:
-    query = db.query(models.ChatThread)
+) -> List[Tuple[models.ChatThread, models.ChatThreadSummary]]:
+    summary = models.ChatThreadSummary
+    query = db.query(models.ChatThread, summary).join(summary, summary.thread_id == models.ChatThread.id)
     if user_role == "PATIENT":
-        query = query.filter(models.ChatThread.patient_id == user_profile_id)
+        query = query.filter(summary.patient_id == user_profile_id)
     else:
-        query = query.filter(models.ChatThread.doctor_id == user_profile_id)
+        query = query.filter(summary.doctor_id == user_profile_id)
 
     if status and status != "archived":
         query = query.filter(models.ChatThread.status == status)
@@ -52,18 +62,20 @@ def search_threads(
         ).filter(or_(models.ChatThreadPreference.id.is_(None), models.ChatThreadPreference.is_archived.is_(False)))
     if search:
         like = f"%{search.lower()}%"
-        query = query.join(models.ChatMessage, models.ChatMessage.thread_id == models.ChatThread.id, isouter=True).filter(
-            or_(
+        query = query.filter(
+            exists().where(
+                models.ChatMessage.thread_id == models.ChatThread.id,
                 func.lower(models.ChatMessage.content).like(like),
             )
         )
     if sort_recent:
-        query = query.order_by(models.ChatThread.updated_at.desc())
-    return query.distinct().all()
+        query = query.order_by(summary.last_sent_at.desc().nulls_last())
+    return query.all()
 
 
 def create_thread(db: Session, *, patient_id: UUID, doctor_id: UUID) -> models.ChatThread:
     thread = models.ChatThread(patient_id=patient_id, doctor_id=doctor_id)
+    thread.summary = models.ChatThreadSummary(patient_id=patient_id, doctor_id=doctor_id, patient_unread=0, doctor_unread=0)
     db.add(thread)
     db.commit()
     db.refresh(thread)
@@ -89,6 +101,17 @@ def list_messages(db: Session, thread_id: UUID, skip: int = 0, limit: int = 50)
     )
 
 
+def list_messages_after_seq(db: Session, thread_id: UUID, after_seq: int, limit: int = 50) -> List[models.ChatMessage]:
+    """Messages newer than `after_seq`, oldest first, for gap-free resume."""
+    return (
+        db.query(models.ChatMessage)
+        .filter(models.ChatMessage.thread_id == thread_id, models.ChatMessage.seq > after_seq)
+        .order_by(models.ChatMessage.seq)
+        .limit(limit)
+        .all()
+    )
+
+
 def search_messages(db: Session, thread_id: UUID, query: str, skip: int = 0, limit: int = 50) -> List[models.ChatMessage]:
     like = f"%{query.lower()}%"
     return (
@@ -104,6 +127,65 @@ def search_messages(db: Session, thread_id: UUID, query: str, skip: int = 0, lim
     )
 
 
+def _preview(msg) -> str | None:
+    if msg.content:
+        return msg.content[:PREVIEW_LENGTH]
+    return ATTACHMENT_PREVIEW if msg.file_url else None
+
+
+def _apply_to_summaries(db: Session, messages: Iterable):
+    """Fold newly inserted messages into their threads' summary rows; runs inside the caller's transaction."""
+    latest = {}
+    unread: Counter = Counter()
+    for msg in messages:
+        if msg.thread_id not in latest or msg.seq > latest[msg.thread_id].seq:
+            latest[msg.thread_id] = msg
+        side = RECIPIENT_UNREAD.get(msg.sender_role)
+        if side:
+            unread[(msg.thread_id, side)] += 1
+    if not latest:
+        return
+    summary = models.ChatThreadSummary.__table__
+    cols = ["last_message_id", "last_sent_at", "preview", "patient_unread", "doctor_unread"]
+    incoming = values(
+        column("thread_id", summary.c.thread_id.type), *(column(name, summary.c[name].type) for name in cols), name="incoming"
+    ).data(
+        [
+            (thread_id, msg.id, msg.sent_at, _preview(msg), unread[(thread_id, "patient_unread")], unread[(thread_id, "doctor_unread")])
+            # Sorted so concurrent writers lock summary rows in the same order.
+            for thread_id, msg in sorted(latest.items(), key=lambda kv: str(kv[0]))
+        ]
+    )
+    stmt = pg_insert(summary).from_select(
+        ["thread_id", "patient_id", "doctor_id"] + cols,
+        select(incoming.c.thread_id, models.ChatThread.patient_id, models.ChatThread.doctor_id, *(incoming.c[name] for name in cols))
+        .select_from(incoming)
+        .join(models.ChatThread, models.ChatThread.id == incoming.c.thread_id),
+    )
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[summary.c.thread_id],
+            set_={
+                "last_message_id": stmt.excluded.last_message_id,
+                "last_sent_at": stmt.excluded.last_sent_at,
+                "preview": stmt.excluded.preview,
+                "patient_unread": summary.c.patient_unread + stmt.excluded.patient_unread,
+                "doctor_unread": summary.c.doctor_unread + stmt.excluded.doctor_unread,
+            },
+        )
+    )
+
+
+def _next_seq(db: Session, thread_id: UUID) -> int:
+    """Reserve the thread's next message seq; the row lock holds until commit, so seqs never skip or repeat."""
+    return db.execute(
+        update(models.ChatThread)
+        .where(models.ChatThread.id == thread_id)
+        .values(last_seq=models.ChatThread.last_seq + 1)
+        .returning(models.ChatThread.last_seq)
+    ).scalar_one()
+
+
 def add_message(
     db: Session,
     *,
@@ -121,39 +203,124 @@ def add_message(
         content=content,
         file_url=file_url,
         file_type=file_type,
+        seq=_next_seq(db, thread_id),
     )
     db.add(msg)
+    db.flush()
+    _apply_to_summaries(db, [msg])
     db.commit()
     db.refresh(msg)
     return msg
 
 
+def add_messages_batch(db: Session, rows: List[dict]) -> List[Row]:
+    """
+    Insert many messages with one multi-row INSERT and commit. Each thread's seq is
+    bumped once for all of its rows, which keep their order. Rows whose thread is
+    closed or gone are skipped; returns the stored rows.
+    """
+    counts = {}
+    for row in rows:
+        counts[row["thread_id"]] = counts.get(row["thread_id"], 0) + 1
+    # Lock threads in id order so concurrent batches from other workers cannot deadlock.
+    open_ids = db.execute(
+        select(models.ChatThread.id)
+        .where(models.ChatThread.id.in_(counts), func.lower(models.ChatThread.status) != "closed")
+        .order_by(models.ChatThread.id)
+        .with_for_update()
+    ).scalars().all()
+    if not open_ids:
+        db.rollback()
+        return []
+    bumps = values(
+        column("thread_id", models.ChatThread.id.type), column("n", models.ChatThread.last_seq.type), name="bumps"
+    ).data([(thread_id, counts[thread_id]) for thread_id in open_ids])
+    last_seqs = dict(
+        db.execute(
+            update(models.ChatThread)
+            .where(models.ChatThread.id == bumps.c.thread_id)
+            .values(last_seq=models.ChatThread.last_seq + bumps.c.n)
+            .returning(models.ChatThread.id, models.ChatThread.last_seq)
+            .execution_options(synchronize_session=False)
+        ).all()
+    )
+    next_seq = {thread_id: last_seqs[thread_id] - counts[thread_id] + 1 for thread_id in last_seqs}
+    to_insert = []
+    for row in rows:
+        if row["thread_id"] in next_seq:
+            to_insert.append({**row, "seq": next_seq[row["thread_id"]], "is_system_message": False})
+            next_seq[row["thread_id"]] += 1
+    stored = db.execute(insert(models.ChatMessage.__table__).returning(*models.ChatMessage.__table__.c), to_insert).all()
+    _apply_to_summaries(db, stored)
+    db.commit()
+    return stored
+
+
 def get_message(db: Session, message_id: UUID) -> Optional[models.ChatMessage]:
     return db.query(models.ChatMessage).filter(models.ChatMessage.id == message_id).first()
 
 
 def mark_message_read(db: Session, message: models.ChatMessage) -> models.ChatMessage:
-    from datetime import datetime, timezone
-
-    if not message.read_at:
-        message.read_at = datetime.now(timezone.utc)
-        db.add(message)
-        db.commit()
-        db.refresh(message)
+    # Conditional so concurrent reads decrement the unread count only once.
+    marked = db.execute(
+        update(models.ChatMessage)
+        .where(models.ChatMessage.id == message.id, models.ChatMessage.read_at.is_(None))
+        .values(read_at=datetime.now(timezone.utc))
+        .returning(models.ChatMessage.id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+    side = RECIPIENT_UNREAD.get(message.sender_role)
+    if marked is not None and side:
+        summary = models.ChatThreadSummary.__table__
+        db.execute(
+            update(summary)
+            .where(summary.c.thread_id == message.thread_id)
+            .values({side: func.greatest(summary.c[side] - 1, 0)})
+        )
+    db.commit()
+    db.refresh(message)
     return message
 
 
-def unread_count_for_user(db: Session, *, user_role: str, user_profile_id: UUID, user_id: UUID) -> int:
-    # Count messages in threads where the user is a participant and sender_id != user_id and read_at is null
-    query = db.query(func.count(models.ChatMessage.id)).join(models.ChatThread, models.ChatThread.id == models.ChatMessage.thread_id)
+def unread_count_for_user(db: Session, *, user_role: str, user_profile_id: UUID) -> int:
+    """Unread messages from the other side across the user's threads, summed from the thread summaries."""
+    summary = models.ChatThreadSummary
     if user_role == "PATIENT":
-        query = query.filter(models.ChatThread.patient_id == user_profile_id)
+        query = db.query(func.sum(summary.patient_unread)).filter(summary.patient_id == user_profile_id)
     else:
-        query = query.filter(models.ChatThread.doctor_id == user_profile_id)
-    query = query.filter(models.ChatMessage.sender_id != user_id, models.ChatMessage.read_at.is_(None))
+        query = db.query(func.sum(summary.doctor_unread)).filter(summary.doctor_id == user_profile_id)
     return query.scalar() or 0
 
 
+# Recomputes every thread's summary from chat_messages (same values as the migration backfill).
+REBUILD_SUMMARIES_SQL = f"""
+INSERT INTO chat_thread_summaries
+       (thread_id, patient_id, doctor_id, last_message_id, last_sent_at, preview, patient_unread, doctor_unread)
+SELECT t.id, t.patient_id, t.doctor_id, last.id, last.sent_at,
+       CASE WHEN last.content IS NOT NULL AND last.content <> '' THEN left(last.content, {PREVIEW_LENGTH})
+            WHEN last.file_url IS NOT NULL THEN '{ATTACHMENT_PREVIEW}' END,
+       (SELECT count(*) FROM chat_messages m
+         WHERE m.thread_id = t.id AND m.read_at IS NULL AND m.sender_role = 'DOCTOR'),
+       (SELECT count(*) FROM chat_messages m
+         WHERE m.thread_id = t.id AND m.read_at IS NULL AND m.sender_role = 'PATIENT')
+  FROM chat_threads t
+  LEFT JOIN LATERAL (SELECT id, sent_at, content, file_url FROM chat_messages m
+                      WHERE m.thread_id = t.id ORDER BY m.seq DESC LIMIT 1) last ON true
+ON CONFLICT (thread_id) DO UPDATE
+   SET last_message_id = EXCLUDED.last_message_id, last_sent_at = EXCLUDED.last_sent_at,
+       preview = EXCLUDED.preview, patient_unread = EXCLUDED.patient_unread, doctor_unread = EXCLUDED.doctor_unread
+ WHERE (chat_thread_summaries.last_message_id, chat_thread_summaries.patient_unread, chat_thread_summaries.doctor_unread)
+       IS DISTINCT FROM (EXCLUDED.last_message_id, EXCLUDED.patient_unread, EXCLUDED.doctor_unread)
+"""
+
+
+def rebuild_thread_summaries(db: Session) -> int:
+    """Rewrite summaries that drifted from chat_messages (or are missing); returns rows fixed."""
+    fixed = db.execute(text(REBUILD_SUMMARIES_SQL)).rowcount
+    db.commit()
+    return fixed
+
+
 def get_or_create_pref(db: Session, user_id: UUID, thread_id: UUID) -> models.ChatThreadPreference:
     pref = (
         db.query(models.ChatThreadPreference)
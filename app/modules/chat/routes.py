@@ -1,4 +1,6 @@
-from typing import List, Dict
+import asyncio
+import json
+from typing import List
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
@@ -7,19 +9,17 @@ from sqlalchemy.orm import Session
 
 from app.core.dependencies import get_db, get_current_active_user, require_roles
 from app.core import security
-from app.modules.chat import service, schemas, models as chat_models
-from app.modules.chat.repository import get_thread, add_message
+from app.core.pubsub import SlowConsumer, get_broker, pump
+from app.db.session import run_with_session
+from app.modules.chat import service, schemas
+from app.modules.chat.writer import content_error, write_socket_message
 from app.modules.users.models import User
-from app.modules.users import repository as users_repository
-from app.modules.patients import repository as patients_repository
-from app.modules.doctors import repository as doctors_repository
-from app.modules.chat import repository as chat_repository
 
 
 router = APIRouter()
 
 
-@router.get("/threads", response_model=List[schemas.ChatThreadRead])
+@router.get("/threads", response_model=List[schemas.ChatThreadListItem])
 def list_threads(
     search: str | None = None,
     sort: str | None = None,
@@ -58,11 +58,13 @@ def list_messages(
     thread_id: UUID,
     skip: int = 0,
     limit: int = 50,
+    after_seq: int | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_active_user),
 ):
+    """Latest messages first; with `after_seq`, the messages after that seq in order (delta sync)."""
     try:
-        return service.list_messages(db, current_user, thread_id=thread_id, skip=skip, limit=limit)
+        return service.list_messages(db, current_user, thread_id=thread_id, skip=skip, limit=limit, after_seq=after_seq)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -75,49 +77,22 @@ def post_message(
     current_user: User = Depends(get_current_active_user),
 ):
     try:
-        return service.post_message(db, current_user, thread_id=thread_id, msg_in=payload)
+        msg = service.post_message(db, current_user, thread_id=thread_id, msg_in=payload)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    service.publish_message(msg)
+    return msg
 
 
-# Simple in-memory connection manager (per-process)
-class ConnectionManager:
-    """Tracks active websocket connections per thread."""
-
-    def __init__(self):
-        self.active: Dict[UUID, List[WebSocket]] = {}
-
-    async def connect(self, thread_id: UUID, websocket: WebSocket):
-        await websocket.accept()
-        self.active.setdefault(thread_id, []).append(websocket)
-
-    def disconnect(self, thread_id: UUID, websocket: WebSocket):
-        conns = self.active.get(thread_id)
-        if not conns:
-            return
-        self.active[thread_id] = [ws for ws in conns if ws is not websocket]
-        if not self.active[thread_id]:
-            self.active.pop(thread_id, None)
-
-    async def broadcast(self, thread_id: UUID, message: dict):
-        for ws in self.active.get(thread_id, []):
-            await ws.send_json(message)
-
-
-manager = ConnectionManager()
-
-
-def _serialize_message(msg: chat_models.ChatMessage) -> dict:
-    return {
-        "id": str(msg.id),
-        "thread_id": str(msg.thread_id),
-        "sender_id": str(msg.sender_id),
-        "sender_role": msg.sender_role,
-        "content": msg.content,
-        "sent_at": msg.sent_at.isoformat() if msg.sent_at else None,
-        "read_at": msg.read_at.isoformat() if msg.read_at else None,
-        "is_system_message": msg.is_system_message,
-    }
+async def _forward(sub, websocket: WebSocket):
+    """Per-socket writer: a slow client only backs up its own bounded queue, then gets dropped."""
+    try:
+        await pump(sub, lambda _message, frame: websocket.send_text(frame))
+    except SlowConsumer:
+        try:
+            await asyncio.wait_for(websocket.close(code=status.WS_1013_TRY_AGAIN_LATER), 1.0)
+        except Exception:
+            pass
 
 
 def _extract_token(websocket: WebSocket) -> str | None:
@@ -127,26 +102,8 @@ def _extract_token(websocket: WebSocket) -> str | None:
     return websocket.query_params.get("token")
 
 
-def _ensure_participant(db: Session, user_id: UUID, thread: chat_models.ChatThread) -> str:
-    user = users_repository.get_by_id(db, user_id=user_id)
-    if not user:
-        raise PermissionError("User not found")
-    role = (user.role_name or "").upper()
-    if role == "PATIENT":
-        patient = patients_repository.get_by_user_id(db, user_id=user_id)
-        if not patient or patient.id != thread.patient_id:
-            raise PermissionError("Not a participant")
-        return "PATIENT"
-    if role == "DOCTOR":
-        doctor = doctors_repository.get_doctor_by_user(db, user_id=user_id)
-        if not doctor or doctor.id != thread.doctor_id:
-            raise PermissionError("Not a participant")
-        return "DOCTOR"
-    raise PermissionError("Not allowed")
-
-
 @router.websocket("/ws/chat/{thread_id}")
-async def websocket_chat(websocket: WebSocket, thread_id: UUID, db: Session = Depends(get_db)):
+async def websocket_chat(websocket: WebSocket, thread_id: UUID):
     token = _extract_token(websocket)
     if not token:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
@@ -158,38 +115,40 @@ async def websocket_chat(websocket: WebSocket, thread_id: UUID, db: Session = De
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    thread = get_thread(db, thread_id)
-    if not thread or thread.status.lower() == "closed":
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
+    # DB work runs on the bounded DB threadpool with per-call sessions; no session
+    # is held for the lifetime of the socket and the event loop never blocks on it.
     try:
-        sender_role = _ensure_participant(db, user_id, thread)
+        sender_role = await run_with_session(service.open_socket_thread, thread_id, user_id)
     except PermissionError:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
-    await manager.connect(thread_id, websocket)
-    try:
-        while True:
-            data = await websocket.receive_json()
-            content = data.get("content")
-            if not content:
-                continue
-            # re-check status
-            thread = get_thread(db, thread_id)
-            if not thread or thread.status.lower() == "closed":
-                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-                return
-            msg = add_message(
-                db,
-                thread_id=thread.id,
-                sender_id=user_id,
-                sender_role=sender_role,
-                content=content,
-            )
-            await manager.broadcast(thread_id, _serialize_message(msg))
-    except WebSocketDisconnect:
-        manager.disconnect(thread_id, websocket)
+    await websocket.accept()
+    # Messages reach this socket only through the broker, whichever worker sent them.
+    async with get_broker().subscribe(service.thread_channel(thread_id)) as sub:
+        forward = asyncio.create_task(_forward(sub, websocket))
+        try:
+            while True:
+                data = await websocket.receive_json()
+                content = data.get("content") if isinstance(data, dict) else None
+                error = content_error(content)
+                if error:
+                    # Through the writer task's queue, so only one task ever sends.
+                    sub.deliver(None, json.dumps({"type": "error", "detail": error}))
+                    continue
+                try:
+                    stored = await write_socket_message(thread_id, user_id, sender_role, content)
+                except Exception:
+                    # Already logged by the writer; only this message is lost.
+                    sub.deliver(None, json.dumps({"type": "error", "detail": "Message not stored"}))
+                    continue
+                if not stored:
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    return
+        except WebSocketDisconnect:
+            pass
+        finally:
+            forward.cancel()
 
 
 @router.patch("/messages/{message_id}/read", response_model=schemas.ChatMessageRead)
@@ -203,7 +162,7 @@ def mark_message_read(
             db,
             current_user,
             message_id=message_id,
-            on_broadcast=lambda m: manager.broadcast(m.thread_id, _serialize_message(m)),
+            on_broadcast=service.publish_message,
         )
         return msg
     except ValueError as e:
@@ -220,9 +179,10 @@ def upload_attachment(
 ):
     try:
         msg = service.upload_attachment(db, current_user, thread_id=thread_id, file=file, caption=caption)
-        return msg
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    service.publish_message(msg)
+    return msg
 
 
 @router.get("/threads/{thread_id}/messages/search", response_model=List[schemas.ChatMessageRead])
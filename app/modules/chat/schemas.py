@@ -21,6 +21,14 @@ class ChatThreadRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class ChatThreadListItem(ChatThreadRead):
+    last_message_id: Optional[UUID] = None
+    last_sent_at: Optional[datetime] = None
+    preview: Optional[str] = None
+    # messages from the other participant the current user has not read
+    unread_count: int = 0
+
+
 class ChatMessageCreate(BaseModel):
     content: Optional[str] = Field(default=None, max_length=2000)
 
@@ -36,6 +44,7 @@ class ChatMessageRead(BaseModel):
     sent_at: datetime
     read_at: Optional[datetime] = None
     is_system_message: bool
+    seq: int
 
     model_config = {"from_attributes": True}
 
@@ -1,11 +1,15 @@
 from uuid import UUID
-from typing import List
+from typing import Any, Callable, List
 
 from sqlalchemy.orm import Session
 
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.pubsub import get_broker
 from app.modules.chat import repository, schemas
 from app.modules.patients import repository as patients_repository
 from app.modules.doctors import repository as doctors_repository
+from app.modules.users import repository as users_repository
 from app.modules.notifications import service as notifications_service, schemas as notif_schemas
 from app.modules.chat import models as chat_models
 from app.utils.storage import LocalStorage
@@ -13,6 +17,34 @@ from fastapi import UploadFile
 from typing import Optional
 
 
+# thread id -> status, read on every websocket message; update_thread_status invalidates it
+thread_status_cache = TTLCache(name="chat_thread_status")
+
+
+def thread_channel(thread_id) -> str:
+    """Pub/sub channel carrying realtime events of one chat thread."""
+    return f"chat:{thread_id}"
+
+
+def serialize_message(msg: chat_models.ChatMessage) -> dict:
+    return {
+        "id": str(msg.id),
+        "thread_id": str(msg.thread_id),
+        "sender_id": str(msg.sender_id),
+        "sender_role": msg.sender_role,
+        "content": msg.content,
+        "sent_at": msg.sent_at.isoformat() if msg.sent_at else None,
+        "read_at": msg.read_at.isoformat() if msg.read_at else None,
+        "is_system_message": msg.is_system_message,
+        "seq": msg.seq,
+    }
+
+
+def publish_message(msg: chat_models.ChatMessage):
+    """Fan a committed message out to every worker's sockets on its thread."""
+    get_broker().publish(thread_channel(msg.thread_id), serialize_message(msg))
+
+
 def _get_patient(db: Session, user_id: UUID):
     patient = patients_repository.get_by_user_id(db, user_id)
     if not patient:
@@ -68,6 +100,17 @@ def get_or_create_thread(db: Session, current_user, payload: schemas.ChatThreadC
     return thread
 
 
+def _thread_list_item(thread, summary, unread_column: str) -> schemas.ChatThreadListItem:
+    return schemas.ChatThreadListItem.model_validate(thread).model_copy(
+        update={
+            "last_message_id": summary.last_message_id,
+            "last_sent_at": summary.last_sent_at,
+            "preview": summary.preview,
+            "unread_count": getattr(summary, unread_column),
+        }
+    )
+
+
 def list_threads(
     db: Session,
     current_user,
@@ -76,34 +119,30 @@ def list_threads(
     sort_recent: bool = False,
     status: str | None = None,
     include_archived: bool = True,
-) -> List:
+) -> List[schemas.ChatThreadListItem]:
     role = getattr(current_user, "role_name", "").upper()
     if role == "PATIENT":
-        patient = _get_patient(db, current_user.id)
-        return repository.search_threads(
-            db,
-            user_role="PATIENT",
-            user_profile_id=patient.id,
-            search=search,
-            sort_recent=sort_recent,
-            status=status,
-            include_archived=include_archived,
-        )
-    if role == "DOCTOR":
-        doctor = _get_doctor(db, current_user.id)
-        return repository.search_threads(
-            db,
-            user_role="DOCTOR",
-            user_profile_id=doctor.id,
-            search=search,
-            sort_recent=sort_recent,
-            status=status,
-            include_archived=include_archived,
-        )
-    return []
+        profile_id = _get_patient(db, current_user.id).id
+    elif role == "DOCTOR":
+        profile_id = _get_doctor(db, current_user.id).id
+    else:
+        return []
+    rows = repository.search_threads(
+        db,
+        user_role=role,
+        user_profile_id=profile_id,
+        search=search,
+        sort_recent=sort_recent,
+        status=status,
+        include_archived=include_archived,
+    )
+    unread_column = "patient_unread" if role == "PATIENT" else "doctor_unread"
+    return [_thread_list_item(thread, summary, unread_column) for thread, summary in rows]
 
 
-def list_messages(db: Session, current_user, thread_id: UUID, skip: int = 0, limit: int = 50):
+def list_messages(
+    db: Session, current_user, thread_id: UUID, skip: int = 0, limit: int = 50, after_seq: Optional[int] = None
+):
     thread = repository.get_thread(db, thread_id=thread_id)
     if not thread:
         raise ValueError("Thread not found")
@@ -118,6 +157,8 @@ def list_messages(db: Session, current_user, thread_id: UUID, skip: int = 0, lim
             raise ValueError("Not a participant in this thread")
     else:
         raise ValueError("Not allowed")
+    if after_seq is not None:
+        return repository.list_messages_after_seq(db, thread_id=thread.id, after_seq=after_seq, limit=limit)
     return repository.list_messages(db, thread_id=thread.id, skip=skip, limit=limit)
 
 
@@ -173,11 +214,12 @@ def post_message(db: Session, current_user, thread_id: UUID, msg_in: schemas.Cha
             thread_id=thread.id,
             recipient_id=recipient_user_id,
             message_id=message.id,
+            preview=msg_in.content,
         )
     return message
 
 
-def mark_message_read(db: Session, current_user, message_id: UUID, on_broadcast: callable | None = None):
+def mark_message_read(db: Session, current_user, message_id: UUID, on_broadcast: Optional[Callable[[Any], Any]] = None):
     msg = repository.get_message(db, message_id=message_id)
     if not msg:
         raise ValueError("Message not found")
@@ -248,6 +290,7 @@ def update_thread_status(db: Session, current_user, thread_id: UUID, status: str
 
     # open/closed is global
     thread = repository.update_thread_status(db, thread=thread, status=status)
+    thread_status_cache.invalidate_tag(thread.id)
     return thread
 
 
@@ -255,13 +298,17 @@ def unread_count(db: Session, current_user):
     role = getattr(current_user, "role_name", "").upper()
     if role == "PATIENT":
         patient = _get_patient(db, current_user.id)
-        return repository.unread_count_for_user(db, user_role="PATIENT", user_profile_id=patient.id, user_id=current_user.id)
+        return repository.unread_count_for_user(db, user_role="PATIENT", user_profile_id=patient.id)
     if role == "DOCTOR":
         doctor = _get_doctor(db, current_user.id)
-        return repository.unread_count_for_user(db, user_role="DOCTOR", user_profile_id=doctor.id, user_id=current_user.id)
+        return repository.unread_count_for_user(db, user_role="DOCTOR", user_profile_id=doctor.id)
     return 0
 
 
+def rebuild_thread_summaries(db: Session) -> int:
+    return repository.rebuild_thread_summaries(db)
+
+
 ALLOWED_FILE_TYPES = {"image/png", "image/jpeg", "image/jpg", "application/pdf"}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 
@@ -322,6 +369,63 @@ def upload_attachment(
             thread_id=thread.id,
             recipient_id=recipient_user_id,
             message_id=msg.id,
+            preview=caption or "Sent an attachment",
         )
 
     return msg
+
+
+# Websocket helpers: each runs in its own short-lived session (see run_with_session)
+# and raises PermissionError rather than ValueError, which sockets turn into a close.
+def ensure_participant(db: Session, user_id: UUID, thread: chat_models.ChatThread) -> str:
+    user = users_repository.get_by_id(db, user_id=user_id)
+    if not user:
+        raise PermissionError("User not found")
+    role = (user.role_name or "").upper()
+    if role == "PATIENT":
+        patient = patients_repository.get_by_user_id(db, user_id=user_id)
+        if not patient or patient.id != thread.patient_id:
+            raise PermissionError("Not a participant")
+        return "PATIENT"
+    if role == "DOCTOR":
+        doctor = doctors_repository.get_doctor_by_user(db, user_id=user_id)
+        if not doctor or doctor.id != thread.doctor_id:
+            raise PermissionError("Not a participant")
+        return "DOCTOR"
+    raise PermissionError("Not allowed")
+
+
+def load_thread_status(db: Session, thread_id: UUID) -> Optional[str]:
+    """Thread status from `thread_status_cache`, read from the DB on a miss; None when the thread is gone."""
+    status = thread_status_cache.get(thread_id)
+    if status is not None:
+        return status
+    version = thread_status_cache.tag_version(thread_id)
+    thread = repository.get_thread(db, thread_id)
+    if not thread:
+        return None
+    thread_status_cache.set(thread_id, thread.status, settings.CHAT_THREAD_STATUS_CACHE_SECONDS, tag=thread_id, version=version)
+    return thread.status
+
+
+def open_socket_thread(db: Session, thread_id: UUID, user_id: UUID) -> str:
+    """Check the thread is open and the user takes part in it; returns the sender role."""
+    thread = repository.get_thread(db, thread_id)
+    if not thread or thread.status.lower() == "closed":
+        raise PermissionError("Thread closed")
+    return ensure_participant(db, user_id, thread)
+
+
+def store_socket_messages(db: Session, rows: List[dict]) -> set:
+    """
+    Persist a batch of socket messages from any threads in one INSERT, then publish
+    each one; returns the ids stored. Messages for threads closed meanwhile (possibly
+    by another worker) are dropped and their cached status is discarded.
+    """
+    stored = sorted(repository.add_messages_batch(db, rows), key=lambda m: m.sent_at)
+    for msg in stored:
+        publish_message(msg)
+    ids = {msg.id for msg in stored}
+    for thread_id in {row["thread_id"] for row in rows if row["id"] not in ids}:
+        thread_status_cache.invalidate_tag(thread_id)
+    return ids
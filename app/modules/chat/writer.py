@@ -0,0 +1,132 @@
+"""Per-worker write buffer for chat messages arriving over websockets.
+
+Socket handlers no longer insert and commit one message per frame. They queue the
+message here and wait; a single flusher task drains the queue every
+`CHAT_WRITE_FLUSH_SECONDS` (or as soon as `CHAT_WRITE_BATCH_SIZE` messages are
+waiting) and stores messages of all threads with one multi-row INSERT. Each message
+is published to its thread, which is the sender's ack, only after that commit.
+Batches are written one at a time, so messages are stored and published in the
+order they arrived.
+"""
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import List, Tuple
+from uuid import UUID
+
+from app.core.config import settings
+from app.db.session import run_with_session
+from app.modules.chat import models, service
+
+logger = logging.getLogger("app.chat")
+
+MAX_CONTENT_LENGTH = models.ChatMessage.content.type.length
+
+
+def content_error(content) -> str | None:
+    """Why a websocket message body cannot be stored, or None; REST gets the same limit from ChatMessageCreate."""
+    if not isinstance(content, str) or not content:
+        return "content must be a non-empty string"
+    if len(content) > MAX_CONTENT_LENGTH:
+        return f"content exceeds {MAX_CONTENT_LENGTH} characters"
+    return None
+
+
+class MessageWriter:
+    def __init__(self, batch_size: int, flush_seconds: float):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._wake: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._pending = []
+            self._wake = asyncio.Event()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, thread_id: UUID, sender_id: UUID, sender_role: str, content: str) -> bool:
+        """Queue one message and wait for its batch to commit; False when the thread was closed."""
+        self._ensure_started()
+        row = {
+            "id": uuid.uuid4(),
+            "thread_id": thread_id,
+            "sender_id": sender_id,
+            "sender_role": sender_role,
+            "content": content,
+            # Receipt time, so messages of one batch keep their order by sent_at
+            "sent_at": datetime.now(timezone.utc),
+        }
+        future = self._loop.create_future()
+        self._pending.append((row, future))
+        self._wake.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            if len(self._pending) < self.batch_size:
+                await asyncio.sleep(self.flush_seconds)
+            batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size :]
+            if not self._pending:
+                self._wake.clear()
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        try:
+            stored = await run_with_session(service.store_socket_messages, [row for row, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                logger.exception("Writing chat message %s failed", batch[0][0]["id"])
+                if not batch[0][1].done():
+                    batch[0][1].set_exception(exc)
+                return
+            logger.warning("Writing %s chat messages failed (%r), retrying one by one", len(batch), exc)
+            stored = None
+        if stored is None:
+            # One bad message must only fail its own sender, not the whole batch.
+            for item in batch:
+                await self._flush([item])
+            return
+        for row, future in batch:
+            if not future.done():
+                future.set_result(row["id"] in stored)
+
+    async def close(self):
+        """Stop the flusher and write whatever is still queued."""
+        if self._task is None or self._loop is not asyncio.get_running_loop():
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while self._pending:
+            batch, self._pending = self._pending[: self.batch_size], self._pending[self.batch_size :]
+            await self._flush(batch)
+
+
+_writer: MessageWriter | None = None
+
+
+def get_message_writer() -> MessageWriter:
+    global _writer
+    if _writer is None:
+        _writer = MessageWriter(settings.CHAT_WRITE_BATCH_SIZE, settings.CHAT_WRITE_FLUSH_SECONDS)
+    return _writer
+
+
+async def write_socket_message(thread_id: UUID, sender_id: UUID, sender_role: str, content: str) -> bool:
+    """Store a websocket chat message through the write buffer; False when the thread is closed."""
+    status = service.thread_status_cache.get(thread_id)
+    if status is None:
+        status = await run_with_session(service.load_thread_status, thread_id)
+    if status is None or status.lower() == "closed":
+        return False
+    return await get_message_writer().submit(thread_id, sender_id, sender_role, content)
@@ -0,0 +1,25 @@
+"""Doctor schedule events.
+
+Appointment writes and availability edits stage SCHEDULE_CHANGED with
+`doctors.service.on_schedule_changed` so it commits with the change; the outbox
+dispatcher then refreshes the free-slot store and next_available through
+`doctors.service.EVENT_HANDLERS`, outside the request and with retries.
+"""
+from datetime import date
+from typing import Iterable, List, Optional, Tuple
+from uuid import UUID
+
+SCHEDULE_CHANGED = "doctor.schedule_changed"
+
+
+def payload(doctor_ids: Iterable[UUID], days: Iterable[date] | None = None) -> dict:
+    """`days` are the affected UTC days; None means every day."""
+    return {
+        "doctor_ids": [str(d) for d in doctor_ids],
+        "days": sorted({d.isoformat() for d in days}) if days is not None else None,
+    }
+
+
+def parse(p: dict) -> Tuple[List[UUID], Optional[List[date]]]:
+    days = [date.fromisoformat(d) for d in p["days"]] if p.get("days") is not None else None
+    return [UUID(d) for d in p["doctor_ids"]], days
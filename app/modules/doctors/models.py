@@ -1,6 +1,6 @@
 import uuid
-from sqlalchemy import Column, String, Integer, Float, DateTime, ForeignKey, Time, Boolean
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Integer, Float, DateTime, Date, ForeignKey, Time, Boolean, BigInteger
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -21,6 +21,9 @@ class Doctor(Base):
     country = Column(String(100), nullable=True)
     avg_rating = Column(Float, default=0)
     rating_count = Column(Integer, default=0)
+    # Denormalized from availability + scheduled appointments; see service.refresh_next_available
+    next_available_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    free_slots_7d = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -64,6 +67,22 @@ class DoctorAvailability(Base):
     doctor = relationship("Doctor", back_populates="availability")
 
 
+class DoctorFreeSlot(Base):
+    """Materialized free time for one doctor on one day.
+
+    `windows` holds flat (anchor, free_start, free_end) triples in epoch seconds:
+    each availability window minus scheduled appointments, with the window start
+    kept as the anchor of the slot grid.
+    """
+
+    __tablename__ = "doctor_free_slots"
+
+    doctor_id = Column(UUID(as_uuid=True), ForeignKey("doctors.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    windows = Column(ARRAY(BigInteger), nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
 class FavoriteDoctor(Base):
     __tablename__ = "favorite_doctors"
 
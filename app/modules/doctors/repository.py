@@ -1,6 +1,8 @@
+from datetime import date, datetime
 from typing import List, Sequence
 from uuid import UUID
-from sqlalchemy import func
+from sqlalchemy import bindparam, delete, func, insert, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.modules.doctors import models
@@ -25,6 +27,8 @@ def search_doctors(
     specialty: str | None = None,
     city: str | None = None,
     min_rating: float | None = None,
+    available_before: datetime | None = None,
+    sort_next_available: bool = False,
     skip: int = 0,
     limit: int = 100,
 ):
@@ -41,6 +45,10 @@ def search_doctors(
         )
     if min_rating is not None:
         query = query.filter(models.Doctor.avg_rating >= min_rating)
+    if available_before is not None:
+        query = query.filter(models.Doctor.next_available_at < available_before)
+    if sort_next_available:
+        query = query.order_by(models.Doctor.next_available_at.asc().nulls_last())
 
     return query.distinct().offset(skip).limit(limit).all()
 
@@ -94,6 +102,51 @@ def list_availability(db: Session, doctor_id):
     return db.query(models.DoctorAvailability).filter(models.DoctorAvailability.doctor_id == doctor_id).all()
 
 
+def list_active_availability_matching(
+    db: Session,
+    *,
+    specialty: str | None = None,
+    city: str | None = None,
+    doctor_ids: Sequence[UUID] | None = None,
+):
+    """Active availability windows of every doctor matching the search filters, in one query."""
+    query = (
+        db.query(models.DoctorAvailability)
+        .join(models.Doctor, models.Doctor.id == models.DoctorAvailability.doctor_id)
+        .filter(models.DoctorAvailability.is_active.is_(True))
+    )
+    if doctor_ids is not None:
+        query = query.filter(models.DoctorAvailability.doctor_id.in_(doctor_ids))
+    if specialty:
+        query = query.filter(models.Doctor.specialties.any(func.lower(models.Specialty.name) == specialty.lower()))
+    if city:
+        query = query.filter(func.lower(models.Doctor.city) == city.lower())
+    return query.all()
+
+
+def list_availability_for_doctors(db: Session, doctor_ids: Sequence[UUID]):
+    if not doctor_ids:
+        return []
+    return db.query(models.DoctorAvailability).filter(models.DoctorAvailability.doctor_id.in_(doctor_ids)).all()
+
+
+def list_existing_doctor_ids(db: Session, doctor_ids: Sequence[UUID]) -> set[UUID]:
+    if not doctor_ids:
+        return set()
+    return {row[0] for row in db.query(models.Doctor.id).filter(models.Doctor.id.in_(doctor_ids)).all()}
+
+
+def apply_availability_changes(db: Session, *, inserts: List[dict], updates: List[dict], delete_ids: List[UUID]):
+    """Apply a schedule diff with one DELETE, one multi-row INSERT and one bulk UPDATE, in one transaction."""
+    if delete_ids:
+        db.execute(delete(models.DoctorAvailability).where(models.DoctorAvailability.id.in_(delete_ids)))
+    if inserts:
+        db.execute(insert(models.DoctorAvailability), inserts)
+    if updates:
+        db.execute(update(models.DoctorAvailability), updates)
+    db.commit()
+
+
 def get_availability(db: Session, availability_id):
     return db.query(models.DoctorAvailability).filter(models.DoctorAvailability.id == availability_id).first()
 
@@ -121,6 +174,76 @@ def delete_availability(db: Session, availability: models.DoctorAvailability):
     db.commit()
 
 
+def list_doctor_ids(db: Session) -> List[UUID]:
+    return [row[0] for row in db.query(models.Doctor.id).all()]
+
+
+def update_availability_summaries(db: Session, summaries: List[dict], commit: bool = True):
+    """Bulk-set next_available_at/free_slots_7d from dicts with `doctor_id`, `next_available_at`, `free_slots_7d`."""
+    if not summaries:
+        return
+    doctors = models.Doctor.__table__
+    stmt = (
+        update(doctors)
+        .where(doctors.c.id == bindparam("doctor_id"))
+        .values(
+            next_available_at=bindparam("next_available_at"),
+            free_slots_7d=bindparam("free_slots_7d"),
+            # derived data: don't bump the profile's updated_at
+            updated_at=doctors.c.updated_at,
+        )
+    )
+    db.execute(stmt, summaries)
+    if commit:
+        db.commit()
+
+
+def list_free_slot_windows(db: Session, doctor_id, start_day: date, end_day: date) -> List[List[int]]:
+    rows = (
+        db.query(models.DoctorFreeSlot.windows)
+        .filter(
+            models.DoctorFreeSlot.doctor_id == doctor_id,
+            models.DoctorFreeSlot.day >= start_day,
+            models.DoctorFreeSlot.day < end_day,
+        )
+        .order_by(models.DoctorFreeSlot.day.asc())
+        .all()
+    )
+    return [row[0] for row in rows]
+
+
+def list_free_slot_days(db: Session, doctor_id, start_day: date, end_day: date) -> set[date]:
+    rows = (
+        db.query(models.DoctorFreeSlot.day)
+        .filter(
+            models.DoctorFreeSlot.doctor_id == doctor_id,
+            models.DoctorFreeSlot.day >= start_day,
+            models.DoctorFreeSlot.day < end_day,
+        )
+        .all()
+    )
+    return {row[0] for row in rows}
+
+
+def upsert_free_slot_days(db: Session, rows: List[dict], commit: bool = True):
+    if not rows:
+        return
+    stmt = pg_insert(models.DoctorFreeSlot).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.DoctorFreeSlot.doctor_id, models.DoctorFreeSlot.day],
+        set_={"windows": stmt.excluded.windows, "refreshed_at": func.now()},
+    )
+    db.execute(stmt)
+    if commit:
+        db.commit()
+
+
+def delete_free_slot_days_before(db: Session, day: date) -> int:
+    deleted = db.query(models.DoctorFreeSlot).filter(models.DoctorFreeSlot.day < day).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
 def toggle_favorite(db: Session, *, patient_id: UUID, doctor_id: UUID, add: bool = True) -> models.FavoriteDoctor | None:
     existing = (
         db.query(models.FavoriteDoctor)
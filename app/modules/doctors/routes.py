@@ -2,11 +2,12 @@ from typing import List, Optional
 from datetime import date
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.dependencies import get_db, require_roles
-from app.modules.doctors import service, schemas
+from app.modules.doctors import service, schemas, slots as slot_engine
 from app.modules.users.models import User
 
 router = APIRouter()
@@ -70,19 +71,67 @@ def list_doctors(
     specialty: Optional[str] = None,
     city: Optional[str] = None,
     min_rating: Optional[float] = None,
+    available_within: Optional[str] = None,
+    sort: Optional[str] = None,
 ):
-    doctors = service.list_doctors(
-        db,
-        skip=skip,
-        limit=limit,
-        name=name,
-        specialty=specialty,
-        city=city,
-        min_rating=min_rating,
-    )
+    try:
+        available_within_days = None
+        if available_within:
+            # accepts "3d" or "3"
+            available_within_days = int(available_within.lower().removesuffix("d"))
+            if available_within_days < 0:
+                raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="available_within must look like '3d'")
+    try:
+        doctors = service.list_doctors(
+            db,
+            skip=skip,
+            limit=limit,
+            name=name,
+            specialty=specialty,
+            city=city,
+            min_rating=min_rating,
+            available_within_days=available_within_days,
+            sort=sort,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return doctors
 
 
+@router.get("/available", response_model=List[schemas.DoctorSlotRead])
+def find_earliest_available(
+    specialty: Optional[str] = None,
+    city: Optional[str] = None,
+    start_date: Optional[str] = None,
+    days: int = 7,
+    duration: int = 30,
+    limit: int = 20,
+    db: Session = Depends(get_db),
+):
+    try:
+        parsed_start = date.fromisoformat(start_date) if start_date else date.today()
+        if days < 1:
+            raise ValueError("days must be >= 1")
+        if duration < 5:
+            raise ValueError("duration must be >= 5")
+        if limit < 1:
+            raise ValueError("limit must be >= 1")
+        found = service.find_earliest_available(
+            db,
+            specialty=specialty,
+            city=city,
+            start_date=parsed_start,
+            days=days,
+            slot_minutes=duration,
+            limit=limit,
+        )
+        return Response(content=slot_engine.dumps_doctor_slots(found), media_type="application/json")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.get("/{doctor_id}", response_model=schemas.DoctorRead)
 def get_doctor(doctor_id: UUID, db: Session = Depends(get_db)):
     try:
@@ -190,6 +239,31 @@ def create_availability(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.put("/{doctor_id}/availability/template", response_model=schemas.AvailabilityTemplateResult)
+def replace_availability_template(
+    doctor_id: UUID,
+    payload: schemas.AvailabilityTemplate,
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_roles("ADMIN")),
+):
+    try:
+        return service.replace_availability_template(db, doctor_id=doctor_id, template=payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.put("/admin/availability/templates", response_model=List[schemas.AvailabilityTemplateResult])
+def replace_availability_templates(
+    payload: List[schemas.DoctorAvailabilityTemplate],
+    db: Session = Depends(get_db),
+    admin_user: User = Depends(require_roles("ADMIN")),
+):
+    try:
+        return service.replace_availability_templates(db, templates=payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
 @router.patch("/availability/{availability_id}", response_model=schemas.DoctorAvailabilityRead)
 def update_availability(
     availability_id: UUID,
@@ -233,14 +307,18 @@ def list_available_slots(
             raise ValueError("days must be >= 1")
         if slot_minutes < 5:
             raise ValueError("slot_minutes must be >= 5")
-        slots = service.list_available_slots(
+        body = service.available_slots_json(
             db,
             doctor_id=doctor_id,
             start_date=parsed_start,
             days=days,
             slot_minutes=slot_minutes,
         )
-        return slots
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers={"Cache-Control": f"public, max-age={settings.SLOT_HTTP_MAX_AGE_SECONDS}"},
+        )
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
@@ -53,6 +53,24 @@ class DoctorAvailabilityRead(DoctorAvailabilityBase):
     model_config = {"from_attributes": True}
 
 
+class AvailabilityTemplate(BaseModel):
+    """Complete weekly schedule; replaces every existing availability window."""
+
+    windows: List[DoctorAvailabilityCreate]
+
+
+class DoctorAvailabilityTemplate(AvailabilityTemplate):
+    doctor_id: UUID
+
+
+class AvailabilityTemplateResult(BaseModel):
+    doctor_id: UUID
+    created: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+
 class DoctorBase(BaseModel):
     first_name: Optional[str] = None
     last_name: Optional[str] = None
@@ -78,6 +96,8 @@ class DoctorRead(DoctorBase):
     user_id: UUID
     avg_rating: float
     rating_count: int
+    next_available_at: Optional[datetime] = None
+    free_slots_7d: int = 0
     created_at: datetime
     updated_at: datetime
     specialties: List[SpecialtyRead] = []
@@ -91,6 +111,10 @@ class AvailabilitySlotRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class DoctorSlotRead(AvailabilitySlotRead):
+    doctor_id: UUID
+
+
 class FavoriteRead(BaseModel):
     id: UUID
     doctor_id: UUID
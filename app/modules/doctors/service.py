@@ -1,13 +1,19 @@
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from uuid import UUID
-from typing import List
+from typing import Dict, Iterable, List
 from datetime import datetime, date, timedelta, timezone
 
-from app.modules.doctors import repository, schemas, models as doctor_models
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.modules.doctors import events as doctor_events, repository, schemas, slots, models as doctor_models
 from app.modules.users import repository as users_repository
 from app.modules.patients import repository as patients_repository
-from app.modules.appointments import repository as appointments_repository
+from app.modules.appointments import holds, repository as appointments_repository
+from app.modules.outbox import repository as outbox_repository
+
+# Serialized slot responses keyed by (doctor_id, start_date, days, slot_minutes), tagged by doctor_id.
+slot_cache = TTLCache(maxsize=settings.SLOT_CACHE_MAX_ENTRIES, name="slots")
 
 
 def list_specialties(db: Session, skip: int = 0, limit: int = 100):
@@ -65,16 +71,25 @@ def list_doctors(
     specialty: str | None = None,
     city: str | None = None,
     min_rating: float | None = None,
+    available_within_days: int | None = None,
+    sort: str | None = None,
     skip: int = 0,
     limit: int = 100,
 ):
-    if any([name, specialty, city, min_rating is not None]):
+    if sort not in (None, "next_available"):
+        raise ValueError("sort must be 'next_available'")
+    if any([name, specialty, city, min_rating is not None, available_within_days is not None, sort]):
+        available_before = None
+        if available_within_days is not None:
+            available_before = datetime.now(timezone.utc) + timedelta(days=available_within_days)
         return repository.search_doctors(
             db,
             name=name,
             specialty=specialty,
             city=city,
             min_rating=min_rating,
+            available_before=available_before,
+            sort_next_available=sort == "next_available",
             skip=skip,
             limit=limit,
         )
@@ -136,7 +151,9 @@ def create_availability(db: Session, doctor_id: UUID, availability_in: schemas.D
     doctor = get_doctor(db, doctor_id)
     payload = availability_in.model_dump(exclude_unset=True)
     payload["doctor_id"] = doctor.id
-    return repository.create_availability(db, payload)
+    on_schedule_changed(db, doctor.id)
+    availability = repository.create_availability(db, payload)
+    return availability
 
 
 def update_availability(db: Session, availability_id: UUID, availability_in: schemas.DoctorAvailabilityUpdate, doctor_id: UUID | None = None):
@@ -146,7 +163,9 @@ def update_availability(db: Session, availability_id: UUID, availability_in: sch
     if doctor_id and availability.doctor_id != doctor_id:
         raise ValueError("Cannot modify another doctor's availability")
     updates = availability_in.model_dump(exclude_unset=True)
-    return repository.update_availability(db, availability=availability, updates=updates)
+    on_schedule_changed(db, availability.doctor_id)
+    availability = repository.update_availability(db, availability=availability, updates=updates)
+    return availability
 
 
 def delete_availability(db: Session, availability_id: UUID, doctor_id: UUID | None = None):
@@ -155,18 +174,103 @@ def delete_availability(db: Session, availability_id: UUID, doctor_id: UUID | No
         raise ValueError("Availability not found")
     if doctor_id and availability.doctor_id != doctor_id:
         raise ValueError("Cannot delete another doctor's availability")
+    on_schedule_changed(db, availability.doctor_id)
     repository.delete_availability(db, availability=availability)
     return True
 
 
-def _iter_slots_for_day(day: date, start_time, end_time, slot_minutes: int):
-    dt_start = datetime.combine(day, start_time, tzinfo=timezone.utc)
-    dt_end = datetime.combine(day, end_time, tzinfo=timezone.utc)
-    current = dt_start
-    delta = timedelta(minutes=slot_minutes)
-    while current + delta <= dt_end:
-        yield current, current + delta
-        current += delta
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+
+def _validate_template(windows: List[schemas.DoctorAvailabilityCreate]):
+    for w in windows:
+        if w.weekday not in WEEKDAYS:
+            raise ValueError(f"weekday must be one of {', '.join(WEEKDAYS)}")
+        if w.end_time <= w.start_time:
+            raise ValueError("end_time must be after start_time")
+    # Sorting once makes any overlap show up between neighbours.
+    ordered = sorted(windows, key=lambda w: (WEEKDAYS.index(w.weekday), w.start_time))
+    for prev, cur in zip(ordered, ordered[1:]):
+        if prev.weekday == cur.weekday and cur.start_time < prev.end_time:
+            raise ValueError(
+                f"Overlapping availability on {cur.weekday}: "
+                f"{prev.start_time:%H:%M}-{prev.end_time:%H:%M} and {cur.start_time:%H:%M}-{cur.end_time:%H:%M}"
+            )
+
+
+def _diff_template(doctor_id: UUID, existing, windows: List[schemas.DoctorAvailabilityCreate]):
+    wanted = {(w.weekday, w.start_time, w.end_time): w.is_active for w in windows}
+    inserts, updates, delete_ids = [], [], []
+    unchanged = 0
+    for av in existing:
+        key = (av.weekday, av.start_time, av.end_time)
+        if key not in wanted:
+            delete_ids.append(av.id)
+            continue
+        is_active = wanted.pop(key)
+        if av.is_active != is_active:
+            updates.append({"id": av.id, "is_active": is_active})
+        else:
+            unchanged += 1
+    for (weekday, start_time, end_time), is_active in wanted.items():
+        inserts.append(
+            {"doctor_id": doctor_id, "weekday": weekday, "start_time": start_time, "end_time": end_time, "is_active": is_active}
+        )
+    result = {
+        "doctor_id": doctor_id,
+        "created": len(inserts),
+        "updated": len(updates),
+        "deleted": len(delete_ids),
+        "unchanged": unchanged,
+    }
+    return inserts, updates, delete_ids, result
+
+
+def replace_availability_templates(db: Session, templates: List[schemas.DoctorAvailabilityTemplate]):
+    """Replace the weekly schedules of many doctors in a single transaction."""
+    doctor_ids = [t.doctor_id for t in templates]
+    if len(set(doctor_ids)) != len(doctor_ids):
+        raise ValueError("Each doctor may appear only once")
+    for template in templates:
+        _validate_template(template.windows)
+    missing = set(doctor_ids) - repository.list_existing_doctor_ids(db, doctor_ids)
+    if missing:
+        raise ValueError(f"Doctor not found: {', '.join(sorted(str(m) for m in missing))}")
+
+    existing_by_doctor = {}
+    for av in repository.list_availability_for_doctors(db, doctor_ids):
+        existing_by_doctor.setdefault(av.doctor_id, []).append(av)
+
+    inserts, updates, delete_ids, results = [], [], [], []
+    for template in templates:
+        ins, upd, dels, result = _diff_template(template.doctor_id, existing_by_doctor.get(template.doctor_id, []), template.windows)
+        inserts.extend(ins)
+        updates.extend(upd)
+        delete_ids.extend(dels)
+        results.append(result)
+    changed = [r["doctor_id"] for r in results if r["created"] or r["updated"] or r["deleted"]]
+    on_schedules_replaced(db, changed)
+    repository.apply_availability_changes(db, inserts=inserts, updates=updates, delete_ids=delete_ids)
+    return results
+
+
+def replace_availability_template(db: Session, doctor_id: UUID, template: schemas.AvailabilityTemplate):
+    payload = schemas.DoctorAvailabilityTemplate(doctor_id=doctor_id, windows=template.windows)
+    return replace_availability_templates(db, [payload])[0]
+
+
+def _active_holds(doctor_ids, start_date: date, end_date: date):
+    return holds.get_hold_store().list_for_doctors(doctor_ids, _utc_midnight(start_date), _utc_midnight(end_date))
+
+
+def _without_holds(stream, doctor_holds):
+    if not doctor_holds:
+        return stream
+    return slots.without_busy(stream, slots.merge_busy((h.start_time, h.end_time) for h in doctor_holds))
 
 
 def list_available_slots(
@@ -176,44 +280,256 @@ def list_available_slots(
     days: int = 7,
     slot_minutes: int = 30,
     now: datetime | None = None,
-):
-    doctor = get_doctor(db, doctor_id)
+    doctor_holds: list | None = None,
+) -> List[slots.Slot]:
+    """Free slots of one doctor, minus slots under an active checkout hold."""
     now = now or datetime.now(timezone.utc)
     end_date = start_date + timedelta(days=days)
+    if doctor_holds is None:
+        doctor_holds = _active_holds([doctor_id], start_date, end_date).get(str(doctor_id), [])
 
-    # Preload availabilities by weekday
-    availabilities = repository.list_availability(db, doctor_id=doctor.id)
-    by_weekday = {}
-    for av in availabilities:
-        if not av.is_active:
-            continue
-        by_weekday.setdefault(av.weekday, []).append(av)
+    if settings.SLOT_STORE_ENABLED:
+        stored = repository.list_free_slot_windows(db, doctor_id, start_date, end_date)
+        if len(stored) == days:
+            return list(_without_holds(slots.iter_slots_from_free_windows(stored, slot_minutes, now), doctor_holds))
+
+    doctor = get_doctor(db, doctor_id)
+    windows = slots.windows_by_weekday(repository.list_availability(db, doctor_id=doctor.id))
 
     # Preload scheduled appointments in range
-    start_dt = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
-    end_dt = datetime.combine(end_date, datetime.min.time(), tzinfo=timezone.utc)
-    appts = appointments_repository.list_scheduled_for_doctor_between(db, doctor_id=doctor.id, start_time=start_dt, end_time=end_dt)
-
-    def _to_aware(dt: datetime) -> datetime:
-        if dt.tzinfo is None:
-            return dt.replace(tzinfo=timezone.utc)
-        return dt
-
-    busy_windows = [(_to_aware(a.start_time), _to_aware(a.end_time)) for a in appts]
-
-    slots: List[schemas.AvailabilitySlotRead] = []
-    for i in range(days):
-        day = start_date + timedelta(days=i)
-        weekday = day.strftime("%a")
-        day_avails = by_weekday.get(weekday, [])
-        for av in day_avails:
-            for slot_start, slot_end in _iter_slots_for_day(day, av.start_time, av.end_time, slot_minutes):
-                if slot_end <= now:
-                    continue
-                has_conflict = any(not (slot_end <= b_start or slot_start >= b_end) for b_start, b_end in busy_windows)
-                if not has_conflict:
-                    slots.append(schemas.AvailabilitySlotRead(start_time=slot_start, end_time=slot_end))
-    return slots
+    appts = appointments_repository.list_scheduled_for_doctor_between(
+        db, doctor_id=doctor.id, start_time=_utc_midnight(start_date), end_time=_utc_midnight(end_date)
+    )
+    busy = slots.merge_busy(
+        [(a.start_time, a.end_time) for a in appts] + [(h.start_time, h.end_time) for h in doctor_holds]
+    )
+
+    return slots.free_slots(start_date, days, windows, busy, slot_minutes, now)
+
+
+def available_slots_json(
+    db: Session,
+    doctor_id: UUID,
+    start_date: date,
+    days: int = 7,
+    slot_minutes: int = 30,
+) -> bytes:
+    """JSON body for the slots endpoint, served from `slot_cache` when possible."""
+    key = (doctor_id, start_date, days, slot_minutes)
+    body = slot_cache.get(key)
+    if body is not None:
+        return body
+    version = slot_cache.tag_version(doctor_id)
+    now = datetime.now(timezone.utc)
+    doctor_holds = _active_holds([doctor_id], start_date, start_date + timedelta(days=days)).get(str(doctor_id), [])
+    found = list_available_slots(
+        db, doctor_id=doctor_id, start_date=start_date, days=days, slot_minutes=slot_minutes, now=now, doctor_holds=doctor_holds
+    )
+    body = slots.dumps_slots(found)
+    ttl = float(settings.SLOT_CACHE_TTL_SECONDS)
+    if found:
+        # Once the earliest slot ends it must drop out of the response.
+        ttl = min(ttl, min(end for _, end in found) - now.timestamp())
+    if doctor_holds:
+        # An expiring hold frees its slot again.
+        ttl = min(ttl, min(slots.to_epoch(h.expires_at) for h in doctor_holds) - now.timestamp())
+    slot_cache.set(key, body, ttl, tag=doctor_id, version=version)
+    return body
+
+
+def find_earliest_available(
+    db: Session,
+    *,
+    specialty: str | None = None,
+    city: str | None = None,
+    start_date: date,
+    days: int = 7,
+    slot_minutes: int = 30,
+    limit: int = 20,
+    now: datetime | None = None,
+):
+    """Earliest free slots across all matching doctors, as (start, end, doctor_id) triples."""
+    now = now or datetime.now(timezone.utc)
+    end_date = start_date + timedelta(days=days)
+
+    availability_by_doctor = {}
+    for av in repository.list_active_availability_matching(db, specialty=specialty, city=city):
+        availability_by_doctor.setdefault(av.doctor_id, []).append(av)
+    if not availability_by_doctor:
+        return []
+
+    busy_by_doctor = {}
+    for doctor_id, start_time, end_time in appointments_repository.list_scheduled_windows_for_doctors_between(
+        db, list(availability_by_doctor), start_time=_utc_midnight(start_date), end_time=_utc_midnight(end_date)
+    ):
+        busy_by_doctor.setdefault(doctor_id, []).append((start_time, end_time))
+
+    for doctor_id, doctor_holds in _active_holds(list(availability_by_doctor), start_date, end_date).items():
+        busy_by_doctor.setdefault(UUID(doctor_id), []).extend((h.start_time, h.end_time) for h in doctor_holds)
+
+    streams = {
+        str(doctor_id): slots.iter_free_slots(
+            start_date,
+            days,
+            slots.windows_by_weekday(avs),
+            slots.merge_busy(busy_by_doctor.get(doctor_id, [])),
+            slot_minutes,
+            now,
+        )
+        for doctor_id, avs in availability_by_doctor.items()
+    }
+    return slots.earliest_across(streams, limit)
+
+
+def refresh_free_slot_store(
+    db: Session, doctor_id: UUID, days: Iterable[date] | None = None, today: date | None = None, commit: bool = True
+):
+    """Recompute materialized free windows for `days` (default: the whole horizon)."""
+    if not settings.SLOT_STORE_ENABLED:
+        return
+    today = today or datetime.now(timezone.utc).date()
+    horizon = [today + timedelta(days=i) for i in range(settings.SLOT_STORE_HORIZON_DAYS)]
+    if days is None:
+        targets = horizon
+    else:
+        wanted = set(days)
+        targets = [d for d in horizon if d in wanted]
+    if not targets:
+        return
+
+    windows = slots.windows_by_weekday(repository.list_availability(db, doctor_id=doctor_id))
+    appts = appointments_repository.list_scheduled_for_doctor_between(
+        db,
+        doctor_id=doctor_id,
+        start_time=_utc_midnight(targets[0]),
+        end_time=_utc_midnight(targets[-1] + timedelta(days=1)),
+    )
+    busy = slots.merge_busy((a.start_time, a.end_time) for a in appts)
+    rows = [
+        {
+            "doctor_id": doctor_id,
+            "day": day,
+            "windows": slots.free_windows_for_day(day, windows.get(day.strftime("%a"), []), busy),
+        }
+        for day in targets
+    ]
+    repository.upsert_free_slot_days(db, rows, commit=commit)
+
+
+def refresh_next_available(db: Session, doctor_ids: List[UUID], now: datetime | None = None, commit: bool = True):
+    """Recompute Doctor.next_available_at and free_slots_7d with two set-based queries."""
+    if not doctor_ids:
+        return
+    now = now or datetime.now(timezone.utc)
+    today = now.date()
+    lookahead = settings.NEXT_AVAILABLE_LOOKAHEAD_DAYS
+
+    availability_by_doctor = {}
+    for av in repository.list_active_availability_matching(db, doctor_ids=doctor_ids):
+        availability_by_doctor.setdefault(av.doctor_id, []).append(av)
+    busy_by_doctor = {}
+    for doctor_id, start_time, end_time in appointments_repository.list_scheduled_windows_for_doctors_between(
+        db,
+        list(availability_by_doctor),
+        start_time=_utc_midnight(today),
+        end_time=_utc_midnight(today + timedelta(days=lookahead)),
+    ):
+        busy_by_doctor.setdefault(doctor_id, []).append((start_time, end_time))
+
+    summaries = []
+    for doctor_id in doctor_ids:
+        first_ts, free_count = None, 0
+        avs = availability_by_doctor.get(doctor_id)
+        if avs:
+            stream = slots.iter_free_slots(
+                today,
+                lookahead,
+                slots.windows_by_weekday(avs),
+                slots.merge_busy(busy_by_doctor.get(doctor_id, [])),
+                settings.NEXT_AVAILABLE_SLOT_MINUTES,
+                now,
+            )
+            first_ts, free_count = slots.summarize(stream, now + timedelta(days=7))
+        summaries.append(
+            {
+                "doctor_id": doctor_id,
+                "next_available_at": datetime.fromtimestamp(first_ts, timezone.utc) if first_ts is not None else None,
+                "free_slots_7d": free_count,
+            }
+        )
+    repository.update_availability_summaries(db, summaries, commit=commit)
+
+
+def sweep_next_available(db: Session, batch_size: int = 500) -> int:
+    """Periodic backup for the event-driven refresh; keeps counts current as time passes."""
+    doctor_ids = repository.list_doctor_ids(db)
+    for i in range(0, len(doctor_ids), batch_size):
+        refresh_next_available(db, doctor_ids[i : i + batch_size])
+    return len(doctor_ids)
+
+
+def on_schedule_changed(db: Session, doctor_id: UUID, days: Iterable[date] | None = None):
+    """Stage the refresh of derived availability state in the caller's transaction; call before it commits.
+
+    `days` limits the refresh to the affected UTC days; None means every day. The
+    slot cache is invalidated in every worker once the change commits; the outbox
+    dispatcher refreshes the free-slot store and next_available afterwards.
+    """
+    _stage_schedule_changed(db, [doctor_id], days)
+
+
+def on_schedules_replaced(db: Session, doctor_ids: List[UUID]):
+    """Bulk variant of `on_schedule_changed` for whole weekly schedules replaced in one transaction."""
+    if doctor_ids:
+        _stage_schedule_changed(db, doctor_ids, None)
+
+
+def _stage_schedule_changed(db: Session, doctor_ids: List[UUID], days: Iterable[date] | None):
+    outbox_repository.add_event(db, doctor_events.SCHEDULE_CHANGED, doctor_events.payload(doctor_ids, days))
+    for doctor_id in doctor_ids:
+        slot_cache.invalidate_tag_after_commit(db, doctor_id)
+
+
+def apply_schedule_changes(db: Session, payloads: List[dict]):
+    """Outbox effect for the SCHEDULE_CHANGED events of one dispatch batch; the dispatcher commits it.
+
+    Affected days are merged per doctor, so a burst of bookings for one doctor refreshes
+    its free-slot store once and next_available is recomputed once for all doctors.
+    """
+    days_by_doctor: Dict[UUID, set | None] = {}
+    for payload in payloads:
+        doctor_ids, days = doctor_events.parse(payload)
+        for doctor_id in doctor_ids:
+            merged = days_by_doctor.get(doctor_id, set())
+            days_by_doctor[doctor_id] = None if merged is None or days is None else merged | set(days)
+    for doctor_id, days in days_by_doctor.items():
+        refresh_free_slot_store(db, doctor_id, days=days, commit=False)
+    refresh_next_available(db, list(days_by_doctor), commit=False)
+    # Reads during the refresh may have re-cached the stale store.
+    for doctor_id in days_by_doctor:
+        slot_cache.invalidate_tag_after_commit(db, doctor_id)
+
+
+# event_type -> handler(db, payloads) run by the outbox dispatcher
+EVENT_HANDLERS = {doctor_events.SCHEDULE_CHANGED: apply_schedule_changes}
+
+
+def extend_free_slot_horizon(db: Session, today: date | None = None) -> int:
+    """Nightly job: drop past days and materialize days newly inside the horizon."""
+    if not settings.SLOT_STORE_ENABLED:
+        return 0
+    today = today or datetime.now(timezone.utc).date()
+    horizon_end = today + timedelta(days=settings.SLOT_STORE_HORIZON_DAYS)
+    repository.delete_free_slot_days_before(db, today)
+    refreshed = 0
+    for doctor_id in repository.list_doctor_ids(db):
+        existing = repository.list_free_slot_days(db, doctor_id, today, horizon_end)
+        missing = [today + timedelta(days=i) for i in range(settings.SLOT_STORE_HORIZON_DAYS)]
+        missing = [d for d in missing if d not in existing]
+        if missing:
+            refresh_free_slot_store(db, doctor_id, days=missing, today=today)
+            refreshed += len(missing)
+    return refreshed
 
 
 def _get_patient_for_user(db: Session, user_id: UUID):
@@ -0,0 +1,264 @@
+"""Slot generation engine for doctor availability.
+
+Busy windows are sorted and merged once, then every availability window is
+swept against them with a single moving pointer, so generating a horizon costs
+O(slots + busy) instead of O(slots x busy). Slots are plain ``(start, end)``
+tuples of UTC epoch seconds and are serialized straight to JSON bytes without
+building a Pydantic model per slot.
+"""
+import bisect
+import heapq
+import itertools
+import math
+import time as _time
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+Slot = Tuple[int, int]
+
+
+class BusyWindows:
+    """Sorted, non-overlapping busy intervals in epoch seconds."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, starts: List[int], ends: List[int]):
+        self.starts = starts
+        self.ends = ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+def to_epoch(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def days_spanned(start: datetime, end: datetime) -> List[date]:
+    """UTC calendar days touched by the half-open interval [start, end)."""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    first = start.astimezone(timezone.utc).date()
+    last = (end.astimezone(timezone.utc) - timedelta(microseconds=1)).date()
+    return [first + timedelta(days=i) for i in range(max((last - first).days, 0) + 1)]
+
+
+def merge_busy(windows: Iterable[Tuple[datetime, datetime]]) -> BusyWindows:
+    # Round outwards so a partially-covered second never looks free.
+    intervals = sorted((math.floor(to_epoch(s)), math.ceil(to_epoch(e))) for s, e in windows)
+    starts: List[int] = []
+    ends: List[int] = []
+    for start, end in intervals:
+        if end <= start:
+            continue
+        if ends and start <= ends[-1]:
+            if end > ends[-1]:
+                ends[-1] = end
+            continue
+        starts.append(start)
+        ends.append(end)
+    return BusyWindows(starts, ends)
+
+
+def windows_by_weekday(availabilities) -> Dict[str, List[Tuple[time, time]]]:
+    by_weekday: Dict[str, List[Tuple[time, time]]] = {}
+    for av in availabilities:
+        if not av.is_active:
+            continue
+        by_weekday.setdefault(av.weekday, []).append((av.start_time, av.end_time))
+    for windows in by_weekday.values():
+        windows.sort()
+    return by_weekday
+
+
+def _sweep_window(win_start: int, win_end: int, step: int, busy: BusyWindows, now_ts: float) -> Iterator[Slot]:
+    start = win_start
+    if now_ts > win_start:
+        # Skip every slot that already ended (slot_end <= now) in one jump.
+        start = win_start + int((now_ts - win_start) // step) * step
+    starts, ends = busy.starts, busy.ends
+    n = len(ends)
+    i = bisect.bisect_right(ends, start)
+    while start + step <= win_end:
+        end = start + step
+        while i < n and ends[i] <= start:
+            i += 1
+        if i < n and starts[i] < end:
+            # Every grid slot starting before this busy window ends conflicts with it.
+            start += -(-(ends[i] - start) // step) * step
+            continue
+        yield start, end
+        start = end
+
+
+def iter_free_slots(
+    start_date: date,
+    days: int,
+    windows: Dict[str, Sequence[Tuple[time, time]]],
+    busy: BusyWindows,
+    slot_minutes: int,
+    now: datetime,
+) -> Iterator[Slot]:
+    """Yield free slots in chronological order."""
+    step = slot_minutes * 60
+    now_ts = to_epoch(now)
+    for i in range(days):
+        day = start_date + timedelta(days=i)
+        day_windows = windows.get(day.strftime("%a"))
+        if not day_windows:
+            continue
+        sweeps = [
+            _sweep_window(
+                int(datetime.combine(day, w_start, tzinfo=timezone.utc).timestamp()),
+                int(datetime.combine(day, w_end, tzinfo=timezone.utc).timestamp()),
+                step,
+                busy,
+                now_ts,
+            )
+            for w_start, w_end in day_windows
+        ]
+        if len(sweeps) == 1:
+            yield from sweeps[0]
+            continue
+        last = None
+        for slot in heapq.merge(*sweeps):
+            # Overlapping availability windows can produce the same slot twice.
+            if slot != last:
+                yield slot
+                last = slot
+
+
+def free_slots(
+    start_date: date,
+    days: int,
+    windows: Dict[str, Sequence[Tuple[time, time]]],
+    busy: BusyWindows,
+    slot_minutes: int,
+    now: datetime,
+) -> List[Slot]:
+    return list(iter_free_slots(start_date, days, windows, busy, slot_minutes, now))
+
+
+def without_busy(stream: Iterable[Slot], busy: BusyWindows) -> Iterator[Slot]:
+    """Drop slots overlapping `busy` from a chronological stream."""
+    starts, ends = busy.starts, busy.ends
+    n = len(ends)
+    i = 0
+    for start, end in stream:
+        while i < n and ends[i] <= start:
+            i += 1
+        if i < n and starts[i] < end:
+            continue
+        yield start, end
+
+
+def _timestamp_formatter():
+    day_prefix: Dict[int, str] = {}
+    time_suffix: Dict[int, str] = {}
+
+    def fmt(ts: int) -> str:
+        day, secs = divmod(ts, 86400)
+        prefix = day_prefix.get(day)
+        if prefix is None:
+            prefix = day_prefix[day] = _time.strftime("%Y-%m-%dT", _time.gmtime(day * 86400))
+        suffix = time_suffix.get(secs)
+        if suffix is None:
+            suffix = time_suffix[secs] = _time.strftime("%H:%M:%SZ", _time.gmtime(secs))
+        return prefix + suffix
+
+    return fmt
+
+
+def dumps_slots(slots: Iterable[Slot]) -> bytes:
+    """Serialize slots to the same JSON shape as ``List[AvailabilitySlotRead]``."""
+    fmt = _timestamp_formatter()
+    return ("[" + ",".join(['{"start_time":"%s","end_time":"%s"}' % (fmt(s), fmt(e)) for s, e in slots]) + "]").encode()
+
+
+def dumps_doctor_slots(slots: Iterable[Tuple[int, int, str]]) -> bytes:
+    """Serialize ``(start, end, doctor_id)`` triples to the shape of ``List[DoctorSlotRead]``."""
+    fmt = _timestamp_formatter()
+    return (
+        "["
+        + ",".join(
+            ['{"doctor_id":"%s","start_time":"%s","end_time":"%s"}' % (d, fmt(s), fmt(e)) for s, e, d in slots]
+        )
+        + "]"
+    ).encode()
+
+
+def summarize(stream: Iterator[Slot], cutoff: datetime) -> Tuple[Optional[int], int]:
+    """Return (first slot start, number of slots starting before `cutoff`) for a chronological stream."""
+    first = next(stream, None)
+    if first is None:
+        return None, 0
+    cutoff_ts = to_epoch(cutoff)
+    if first[0] >= cutoff_ts:
+        return first[0], 0
+    return first[0], 1 + sum(1 for _ in itertools.takewhile(lambda slot: slot[0] < cutoff_ts, stream))
+
+
+def _tagged(stream: Iterator[Slot], doctor_id: str) -> Iterator[Tuple[int, int, str]]:
+    for start, end in stream:
+        yield start, end, doctor_id
+
+
+def earliest_across(per_doctor: Dict[str, Iterator[Slot]], limit: int) -> List[Tuple[int, int, str]]:
+    """K-way merge of per-doctor chronological slot streams; stops after `limit` slots."""
+    streams = [_tagged(stream, doctor_id) for doctor_id, stream in per_doctor.items()]
+    return list(itertools.islice(heapq.merge(*streams), limit))
+
+
+def free_windows_for_day(day: date, day_windows: Sequence[Tuple[time, time]], busy: BusyWindows) -> List[int]:
+    """Return availability minus busy time for one day as flat ``[anchor, start, end, ...]`` triples.
+
+    ``anchor`` is the start of the availability window the piece came from, so
+    slots can later be laid on the same grid the live sweep would use.
+    """
+    starts, ends = busy.starts, busy.ends
+    n = len(ends)
+    out: List[int] = []
+    for w_start, w_end in day_windows:
+        anchor = int(datetime.combine(day, w_start, tzinfo=timezone.utc).timestamp())
+        win_end = int(datetime.combine(day, w_end, tzinfo=timezone.utc).timestamp())
+        cursor = anchor
+        i = bisect.bisect_right(ends, cursor)
+        while cursor < win_end:
+            if i < n and starts[i] < win_end:
+                if starts[i] > cursor:
+                    out.extend((anchor, cursor, starts[i]))
+                cursor = max(cursor, ends[i])
+                i += 1
+                continue
+            out.extend((anchor, cursor, win_end))
+            break
+    return out
+
+
+def _piece_slots(anchor: int, piece_start: int, piece_end: int, step: int, now_ts: float) -> Iterator[Slot]:
+    start = anchor + -(-(piece_start - anchor) // step) * step
+    if now_ts > start:
+        start += int((now_ts - start) // step) * step
+    while start + step <= piece_end:
+        yield start, start + step
+        start += step
+
+
+def iter_slots_from_free_windows(days_windows: Iterable[Sequence[int]], slot_minutes: int, now: datetime) -> Iterator[Slot]:
+    """Yield slots from per-day ``free_windows_for_day`` results, given in day order."""
+    step = slot_minutes * 60
+    now_ts = to_epoch(now)
+    for flat in days_windows:
+        pieces = [_piece_slots(flat[j], flat[j + 1], flat[j + 2], step, now_ts) for j in range(0, len(flat), 3)]
+        if len(pieces) == 1:
+            yield from pieces[0]
+            continue
+        last = None
+        for slot in heapq.merge(*pieces):
+            if slot != last:
+                yield slot
+                last = slot
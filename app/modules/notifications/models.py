@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Index, Integer, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -16,6 +16,44 @@ class Notification(Base):
     title = Column(String(255), nullable=False)
     body = Column(String(1000), nullable=True)
     is_read = Column(Boolean, nullable=False, default=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Coalesced rows fold repeated events of one group (e.g. a chat thread) into one notification.
+    group_key = Column(String(100), nullable=True)
+    count = Column(Integer, nullable=False, default=1, server_default="1")
+    last_at = Column(DateTime(timezone=True), nullable=True)
+    # Part of the primary key because the table is range-partitioned by month on it.
+    created_at = Column(DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_notifications_user_id_unread", user_id, postgresql_where=text("NOT is_read")),
+        # Lists and stream resume order by last activity (repository.ACTIVITY_AT), so a
+        # coalesced update moves its notification to the newest position.
+        Index("ix_notifications_user_id_activity_at_id", user_id, func.coalesce(last_at, created_at), id),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     user = relationship("User")
+
+
+class NotificationUnreadCounter(Base):
+    """Unread notifications per (user, type), kept in step by the repository writes."""
+
+    __tablename__ = "notification_unread_counters"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    type = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class NotificationCoalesceHead(Base):
+    """
+    The notification currently collecting events of one (user, type, group). Lives outside
+    the partitioned notifications table, which cannot carry a unique index on these columns.
+    """
+
+    __tablename__ = "notification_coalesce_heads"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    type = Column(String(50), primary_key=True)
+    group_key = Column(String(100), primary_key=True)
+    notification_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,19 +1,170 @@
-from typing import List, Optional
+import uuid
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from uuid import UUID
-from datetime import datetime
+from datetime import date, datetime, timezone
+from sqlalchemy import String, delete, false, func, insert, literal, select, text, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
+from app.core import pubsub
 from app.modules.notifications import models
+from app.modules.users import models as user_models
+
+
+# When a notification last changed: its creation, or its latest coalesced event.
+ACTIVITY_AT = func.coalesce(models.Notification.last_at, models.Notification.created_at)
+
+
+def user_channel(user_id) -> str:
+    return f"notifications:{user_id}"
+
+
+def push_payload(notif) -> dict:
+    """Realtime representation pushed to sockets and streams."""
+    return {
+        "id": str(notif.id),
+        "type": notif.type,
+        "title": notif.title,
+        "body": notif.body,
+        "is_read": notif.is_read,
+        "count": notif.count or 1,
+        "created_at": notif.created_at.isoformat() if notif.created_at else None,
+        "last_at": notif.last_at.isoformat() if notif.last_at else None,
+    }
+
+
+def _publish_on_commit(db: Session, notifs):
+    for notif in notifs:
+        pubsub.publish_after_commit(db, user_channel(notif.user_id), push_payload(notif))
+
+
+def _bump_unread(db: Session, deltas: Iterable[Tuple[UUID, str, int]]):
+    """Apply unread-counter deltas with one upsert; runs inside the caller's transaction."""
+    totals: Dict[Tuple[UUID, str], int] = Counter()
+    for user_id, type_, delta in deltas:
+        totals[(user_id, type_)] += delta
+    # Sorted so concurrent writers lock counter rows in the same order.
+    rows = [{"user_id": u, "type": t, "count": d} for (u, t), d in sorted(totals.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])) if d]
+    if not rows:
+        return
+    counter = models.NotificationUnreadCounter.__table__
+    stmt = pg_insert(counter).values(rows)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[counter.c.user_id, counter.c.type],
+            set_={"count": func.greatest(counter.c.count + stmt.excluded.count, 0)},
+        )
+    )
 
 
 def create_notification(db: Session, payload: dict) -> models.Notification:
-    notif = models.Notification(**payload)
-    db.add(notif)
-    db.commit()
-    db.refresh(notif)
+    return create_notifications(db, [payload])[0]
+
+
+def create_notifications(db: Session, payloads: Sequence[dict], *, commit: bool = True) -> List[models.Notification]:
+    """Insert all rows with one multi-row INSERT ... RETURNING; no per-row refresh."""
+    if not payloads:
+        return []
+    notifs = list(
+        db.scalars(
+            insert(models.Notification).returning(models.Notification),
+            [{"is_read": False, **p} for p in payloads],
+        )
+    )
+    _bump_unread(db, ((n.user_id, n.type, 1) for n in notifs))
+    _publish_on_commit(db, notifs)
+    if commit:
+        db.commit()
+    return notifs
+
+
+def coalesce_notification(db: Session, payload: dict, group_key: str, *, commit: bool = True) -> models.Notification:
+    """
+    Fold `payload` into the user's unread notification of the same (type, group_key)
+    (bumping count, last_at and the title/body preview), or insert a new one.
+    """
+    heads = models.NotificationCoalesceHead.__table__
+    notif_model = models.Notification
+    new_id, now = uuid.uuid4(), datetime.now(timezone.utc)
+    key = (heads.c.user_id == payload["user_id"], heads.c.type == payload["type"], heads.c.group_key == group_key)
+    claim = pg_insert(heads).values(
+        user_id=payload["user_id"], type=payload["type"], group_key=group_key, notification_id=new_id, created_at=now
+    )
+    # The no-op DO UPDATE locks an existing head until commit, serializing writers of one group.
+    head = db.execute(
+        claim.on_conflict_do_update(
+            index_elements=[heads.c.user_id, heads.c.type, heads.c.group_key],
+            set_={"group_key": claim.excluded.group_key},
+        ).returning(heads.c.notification_id, heads.c.created_at)
+    ).one()
+
+    notif = None
+    if head.notification_id != new_id:
+        notif = db.scalars(
+            update(notif_model)
+            .where(
+                notif_model.id == head.notification_id,
+                notif_model.created_at == head.created_at,
+                notif_model.is_read == False,  # noqa: E712
+            )
+            .values(count=notif_model.count + 1, last_at=now, title=payload["title"], body=payload.get("body"))
+            .returning(notif_model)
+        ).one_or_none()
+        if notif is None:
+            # The head was read or deleted since; start a new one.
+            db.execute(update(heads).where(*key).values(notification_id=new_id, created_at=now))
+    if notif is None:
+        row = {**payload, "id": new_id, "created_at": now, "last_at": now, "group_key": group_key}
+        notif = create_notifications(db, [row], commit=False)[0]
+    else:
+        _publish_on_commit(db, [notif])
+    if commit:
+        db.commit()
     return notif
 
 
+def broadcast(
+    db: Session,
+    *,
+    type: str,
+    title: str,
+    body: Optional[str] = None,
+    role_name: Optional[str] = None,
+    user_ids: Optional[Sequence[UUID]] = None,
+) -> int:
+    """INSERT ... SELECT one notification per matching active user, entirely in the database."""
+    users = select(
+        func.gen_random_uuid(),
+        user_models.User.id,
+        literal(type, String),
+        literal(title, String),
+        literal(body, String),
+        false(),
+        func.now(),
+    ).where(user_models.User.is_active.is_(True))
+    if role_name:
+        users = users.join(user_models.Role).where(func.upper(user_models.Role.name) == role_name.upper())
+    if user_ids is not None:
+        users = users.where(user_models.User.id.in_(user_ids))
+    stmt = (
+        insert(models.Notification)
+        .from_select(["id", "user_id", "type", "title", "body", "is_read", "created_at"], users)
+        .returning(models.Notification.id, models.Notification.user_id, models.Notification.created_at)
+    )
+    rows = db.execute(stmt).all()
+    _bump_unread(db, ((row.user_id, type, 1) for row in rows))
+    _publish_on_commit(
+        db,
+        (
+            models.Notification(id=row.id, user_id=row.user_id, type=type, title=title, body=body, is_read=False, created_at=row.created_at)
+            for row in rows
+        ),
+    )
+    db.commit()
+    return len(rows)
+
+
 def list_notifications(
     db: Session,
     user_id: UUID,
@@ -25,10 +176,11 @@ def list_notifications(
 ) -> List[models.Notification]:
     query = db.query(models.Notification).filter(models.Notification.user_id == user_id)
     if is_read is not None:
-        query = query.filter(models.Notification.is_read.is_(is_read))
+        # `= false` (not `IS false`) so the planner can match the partial unread index.
+        query = query.filter(models.Notification.is_read == is_read)
     if type:
         query = query.filter(models.Notification.type == type)
-    return query.order_by(models.Notification.created_at.desc()).offset(skip).limit(limit).all()
+    return query.order_by(ACTIVITY_AT.desc(), models.Notification.id.desc()).offset(skip).limit(limit).all()
 
 
 def list_notifications_since(
@@ -38,48 +190,223 @@ def list_notifications_since(
     *,
     limit: int = 50,
 ) -> List[models.Notification]:
+    """Notifications created or coalesced after `since`, oldest activity first."""
     return (
         db.query(models.Notification)
-        .filter(models.Notification.user_id == user_id, models.Notification.created_at > since)
-        .order_by(models.Notification.created_at.asc())
+        .filter(models.Notification.user_id == user_id, ACTIVITY_AT > since)
+        .order_by(ACTIVITY_AT.asc(), models.Notification.id.asc())
+        .limit(limit)
+        .all()
+    )
+
+
+def list_notifications_after(
+    db: Session,
+    user_id: UUID,
+    activity_at: datetime,
+    notification_id: UUID,
+    *,
+    limit: int = 200,
+) -> List[models.Notification]:
+    """Keyset page strictly after (ACTIVITY_AT, id); served by ix_notifications_user_id_activity_at_id."""
+    return (
+        db.query(models.Notification)
+        .filter(
+            models.Notification.user_id == user_id,
+            tuple_(ACTIVITY_AT, models.Notification.id) > tuple_(activity_at, notification_id),
+        )
+        .order_by(ACTIVITY_AT.asc(), models.Notification.id.asc())
         .limit(limit)
         .all()
     )
 
 
 def mark_read(db: Session, notification_id: UUID, user_id: UUID) -> models.Notification | None:
-    notif = (
+    # Conditional UPDATE so concurrent calls decrement the counter at most once.
+    marked = db.execute(
+        update(models.Notification)
+        .where(
+            models.Notification.id == notification_id,
+            models.Notification.user_id == user_id,
+            models.Notification.is_read == False,  # noqa: E712
+        )
+        .values(is_read=True)
+        .returning(models.Notification.type)
+    ).scalar_one_or_none()
+    if marked is not None:
+        _bump_unread(db, [(user_id, marked, -1)])
+        db.commit()
+    return (
         db.query(models.Notification)
         .filter(models.Notification.id == notification_id, models.Notification.user_id == user_id)
         .first()
     )
-    if not notif:
-        return None
-    notif.is_read = True
-    db.add(notif)
-    db.commit()
-    db.refresh(notif)
-    return notif
 
 
 def mark_all_read(db: Session, user_id: UUID) -> int:
-    updated = (
-        db.query(models.Notification)
-        .filter(models.Notification.user_id == user_id, models.Notification.is_read.is_(False))
-        .update({"is_read": True})
+    marked = (
+        update(models.Notification)
+        .where(models.Notification.user_id == user_id, models.Notification.is_read == False)  # noqa: E712
+        .values(is_read=True)
+        .returning(models.Notification.type)
+        .cte("marked")
     )
+    per_type = db.execute(select(marked.c.type, func.count()).group_by(marked.c.type)).all()
+    _bump_unread(db, ((user_id, type_, -n) for type_, n in per_type))
     db.commit()
-    return updated
+    return sum(n for _, n in per_type)
 
 
 def delete_notification(db: Session, notification_id: UUID, user_id: UUID) -> bool:
-    notif = (
-        db.query(models.Notification)
-        .filter(models.Notification.id == notification_id, models.Notification.user_id == user_id)
-        .first()
-    )
-    if not notif:
+    deleted = db.execute(
+        delete(models.Notification)
+        .where(models.Notification.id == notification_id, models.Notification.user_id == user_id)
+        .returning(models.Notification.type, models.Notification.is_read)
+    ).first()
+    if deleted is None:
         return False
-    db.delete(notif)
+    if not deleted.is_read:
+        _bump_unread(db, [(user_id, deleted.type, -1)])
     db.commit()
     return True
+
+
+def unread_counts(db: Session, user_id: UUID) -> Dict[str, int]:
+    """Unread notifications by type, read from the counter rows (primary-key lookup)."""
+    counter = models.NotificationUnreadCounter
+    rows = db.execute(select(counter.type, counter.count).where(counter.user_id == user_id, counter.count > 0))
+    return {type_: count for type_, count in rows}
+
+
+def reconcile_unread_counters(db: Session) -> int:
+    """Rewrite counters that drifted from the notifications table; returns rows fixed."""
+    counter = models.NotificationUnreadCounter.__table__
+    notif = models.Notification.__table__
+    actual = (
+        select(notif.c.user_id, notif.c.type, func.count().label("count"))
+        .where(notif.c.is_read == False)  # noqa: E712
+        .group_by(notif.c.user_id, notif.c.type)
+    )
+    upsert = pg_insert(counter).from_select(["user_id", "type", "count"], actual)
+    fixed = db.execute(
+        upsert.on_conflict_do_update(
+            index_elements=[counter.c.user_id, counter.c.type],
+            set_={"count": upsert.excluded.count},
+            where=counter.c.count != upsert.excluded.count,
+        )
+    ).rowcount
+    has_unread = (
+        select(notif.c.id)
+        .where(notif.c.user_id == counter.c.user_id, notif.c.type == counter.c.type, notif.c.is_read == False)  # noqa: E712
+        .exists()
+    )
+    fixed += db.execute(update(counter).where(counter.c.count != 0, ~has_unread).values(count=0)).rowcount
+    db.commit()
+    return fixed
+
+
+# Monthly partitions of `notifications` are named notifications_pYYYYMM and cover
+# [first of month, first of next month) in UTC; `notifications_default` catches the rest.
+PARTITION_PREFIX = "notifications_p"
+
+
+def _partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def list_month_partitions(db: Session) -> List[Tuple[str, date, date]]:
+    """(name, first day, first day of next month) of every monthly partition, oldest first."""
+    names = db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'notifications' AND c.relname LIKE :pattern"
+        ),
+        {"pattern": PARTITION_PREFIX + "%"},
+    ).scalars()
+    out = []
+    for name in names:
+        suffix = name[len(PARTITION_PREFIX):]
+        if len(suffix) == 6 and suffix.isdigit():
+            month = date(int(suffix[:4]), int(suffix[4:]), 1)
+            out.append((name, month, _next_month(month)))
+    return sorted(out, key=lambda item: item[1])
+
+
+def create_month_partitions(db: Session, first_month: date, months: int) -> List[str]:
+    """Create the missing monthly partitions from `first_month` on; returns the new names."""
+    existing = {name for name, _, _ in list_month_partitions(db)}
+    created = []
+    month = first_month.replace(day=1)
+    for _ in range(months):
+        name = _partition_name(month)
+        if name not in existing:
+            db.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF notifications "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d} 00:00:00+00') TO ('{_next_month(month):%Y-%m-%d} 00:00:00+00')"
+                )
+            )
+            created.append(name)
+        month = _next_month(month)
+    db.commit()
+    return created
+
+
+def drop_month_partition(db: Session, name: str):
+    """Detach and drop a whole monthly partition, releasing its unread counts first."""
+    if not name.startswith(PARTITION_PREFIX) or not name[len(PARTITION_PREFIX):].isdigit():
+        raise ValueError(f"Not a notifications partition: {name}")
+    unread = db.execute(text(f"SELECT user_id, type, count(*) FROM {name} WHERE NOT is_read GROUP BY user_id, type")).all()
+    _bump_unread(db, ((user_id, type_, -n) for user_id, type_, n in unread))
+    db.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
+
+
+def delete_expired_batch(
+    db: Session,
+    cutoff: datetime,
+    *,
+    types: Optional[Sequence[str]] = None,
+    exclude_types: Optional[Sequence[str]] = None,
+    batch_size: int = 5000,
+) -> int:
+    """Delete up to `batch_size` notifications created before `cutoff`; commits per batch."""
+    notif = models.Notification
+    victims = select(notif.id, notif.created_at).where(notif.created_at < cutoff)
+    if types is not None:
+        victims = victims.where(notif.type.in_(types))
+    if exclude_types:
+        victims = victims.where(notif.type.not_in(exclude_types))
+    deleted = (
+        delete(notif)
+        .where(tuple_(notif.id, notif.created_at).in_(victims.limit(batch_size)))
+        .returning(notif.user_id, notif.type, notif.is_read)
+        .cte("deleted")
+    )
+    per_user = db.execute(
+        select(deleted.c.user_id, deleted.c.type, func.count(), func.count().filter(deleted.c.is_read == False))  # noqa: E712
+        .group_by(deleted.c.user_id, deleted.c.type)
+    ).all()
+    _bump_unread(db, ((user_id, type_, -unread) for user_id, type_, _, unread in per_user))
+    db.commit()
+    return sum(n for _, _, n, _ in per_user)
+
+
+def delete_stale_coalesce_heads(db: Session) -> int:
+    """Drop heads whose notification was read, deleted or purged."""
+    heads = models.NotificationCoalesceHead.__table__
+    notif = models.Notification
+    live = (
+        select(notif.id)
+        .where(notif.id == heads.c.notification_id, notif.created_at == heads.c.created_at, notif.is_read == False)  # noqa: E712
+        .exists()
+    )
+    deleted = db.execute(delete(heads).where(~live)).rowcount
+    db.commit()
+    return deleted
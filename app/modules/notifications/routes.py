@@ -1,12 +1,17 @@
 from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, Depends, HTTPException, Request, status, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timezone
+from datetime import datetime
 import asyncio
+import json
 
+from app.core.config import settings
 from app.core.dependencies import get_db, get_current_active_user
+from app.core.pubsub import SlowConsumer, get_broker, pump
+from app.db.session import run_with_session
 from app.modules.notifications import service, schemas
 from app.modules.users.models import User
 from app.modules.users import repository as users_repository
@@ -35,6 +40,14 @@ def list_notifications(
     )
 
 
+@router.get("/unread-count", response_model=schemas.UnreadCount)
+def unread_count(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+):
+    return service.unread_count(db, user_id=current_user.id)
+
+
 @router.post("/", response_model=schemas.NotificationRead, status_code=status.HTTP_201_CREATED)
 def create_notification(
     payload: schemas.NotificationCreate,
@@ -79,45 +92,123 @@ def delete_notification(
     return None
 
 
-@router.websocket("/ws")
-async def notifications_ws(websocket: WebSocket, db: Session = Depends(get_db)):
-    # Expect access token in query params: ?token=...
-    token = websocket.query_params.get("token")
+def _load_user(db: Session, user_id):
+    return users_repository.get_by_id(db, user_id)
+
+
+async def _authenticate(token: str | None):
+    """Resolve the socket user with a short-lived session; nothing is held for the connection."""
     if not token:
-        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
-        return
+        return None
     try:
-        payload = security.decode_token(token)
-        user_id = payload.get("sub")
+        user_id = security.decode_token(token).get("sub")
     except Exception:
+        return None
+    return await run_with_session(_load_user, user_id)
+
+
+def _catch_up(db: Session, user_id: UUID, since: datetime):
+    return [service.push_payload(n) for n in service.list_since(db, user_id=user_id, since=since, limit=200)]
+
+
+def _stream_backlog(db: Session, user_id: UUID, position):
+    return [service.push_payload(n) for n in service.list_after_event(db, user_id=user_id, position=position)]
+
+
+def _sse(item: dict, frame: Optional[str] = None) -> str:
+    return f"id: {service.event_id(item)}\nevent: notification\ndata: {frame or json.dumps(item)}\n\n"
+
+
+@router.get("/stream")
+async def notification_stream(request: Request):
+    """
+    Server-Sent Events stream of new notifications (for clients that cannot use websockets).
+    Authenticate with `Authorization: Bearer` or `?token=`; reconnects resume from `Last-Event-ID`.
+    """
+    token = request.query_params.get("token")
+    auth_header = request.headers.get("authorization", "")
+    if auth_header.lower().startswith("bearer "):
+        token = auth_header[7:]
+    user = await _authenticate(token)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    last_event_id = request.headers.get("last-event-id") or request.query_params.get("last_event_id")
+    try:
+        position = service.parse_event_id(last_event_id) if last_event_id else None
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def events():
+        async with get_broker().subscribe(service.user_channel(user.id)) as sub:
+            yield "retry: 3000\n\n"
+            seen = set()
+            if position is not None:
+                for item in await run_with_session(_stream_backlog, user.id, position):
+                    seen.add(service.delivery_key(item))
+                    yield _sse(item)
+            while True:
+                try:
+                    item, frame = await asyncio.wait_for(sub.next(), timeout=settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                except SlowConsumer:
+                    # End the stream; the client reconnects and resumes from Last-Event-ID.
+                    return
+                if service.delivery_key(item) not in seen:
+                    yield _sse(item, frame)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _wait_disconnect(websocket: WebSocket):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws")
+async def notifications_ws(websocket: WebSocket):
+    # Expect access token in query params: ?token=...; pass ?since=<ISO timestamp> to resume.
+    user = await _authenticate(websocket.query_params.get("token"))
+    if not user:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
-    user = users_repository.get_by_id(db, user_id)
-    if not user:
+    since = websocket.query_params.get("since")
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
     await websocket.accept()
-    last_seen = datetime.now(timezone.utc)
-    try:
-        while True:
-            # poll for new notifications every 5 seconds
-            new_items = service.list_since(db, user_id=user.id, since=last_seen, limit=50)
-            if new_items:
-                last_seen = max(n.created_at for n in new_items if n.created_at)
-                await websocket.send_json(
-                    [
-                        {
-                            "id": str(n.id),
-                            "type": n.type,
-                            "title": n.title,
-                            "body": n.body,
-                            "is_read": n.is_read,
-                            "created_at": n.created_at.isoformat() if n.created_at else None,
-                        }
-                        for n in new_items
-                    ]
-                )
-            await asyncio.sleep(5)
-    except WebSocketDisconnect:
-        return
+    # Subscribe before the catch-up query so nothing committed in between is missed.
+    async with get_broker().subscribe(service.user_channel(user.id)) as sub:
+        seen = set()
+        if since is not None:
+            backlog = await run_with_session(_catch_up, user.id, since)
+            if backlog:
+                seen = {service.delivery_key(item) for item in backlog}
+                await websocket.send_json(backlog)
+
+        async def send(item, frame):
+            if service.delivery_key(item) not in seen:
+                await websocket.send_text(f"[{frame}]")
+
+        disconnected = asyncio.ensure_future(_wait_disconnect(websocket))
+        writer = asyncio.ensure_future(pump(sub, send))
+        try:
+            await asyncio.wait({writer, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if writer.done() and isinstance(writer.exception(), SlowConsumer):
+                # Dropped for falling behind; the client reconnects with ?since= to catch up.
+                await asyncio.wait_for(websocket.close(code=status.WS_1013_TRY_AGAIN_LATER), 1.0)
+        except (WebSocketDisconnect, asyncio.TimeoutError, RuntimeError):
+            return
+        finally:
+            disconnected.cancel()
+            writer.cancel()
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -12,6 +12,25 @@ class NotificationCreate(BaseModel):
     body: Optional[str] = None
 
 
+class NotificationBroadcast(BaseModel):
+    """Notify every active user, optionally narrowed to one role and/or explicit user ids."""
+
+    type: str = "SYSTEM"
+    title: str
+    body: Optional[str] = None
+    role: Optional[str] = None
+    user_ids: Optional[List[UUID]] = None
+
+
+class BroadcastResult(BaseModel):
+    notified: int
+
+
+class UnreadCount(BaseModel):
+    total: int
+    by_type: Dict[str, int]
+
+
 class NotificationRead(BaseModel):
     id: UUID
     user_id: UUID
@@ -19,6 +38,8 @@ class NotificationRead(BaseModel):
     title: str
     body: Optional[str] = None
     is_read: bool
+    count: int = 1
     created_at: datetime
+    last_at: Optional[datetime] = None
 
     model_config = {"from_attributes": True}
@@ -1,14 +1,53 @@
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from uuid import UUID
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.modules.notifications import repository, schemas
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from app.modules.chat import repository as chat_repo
 
 
+user_channel = repository.user_channel
+push_payload = repository.push_payload
+
+
 def notify(db: Session, payload: schemas.NotificationCreate):
-    return repository.create_notification(db, payload=payload.model_dump())
+    return notify_many(db, [payload])[0]
+
+
+def notify_many(db: Session, payloads: Iterable[schemas.NotificationCreate | dict], *, commit: bool = True):
+    """Create any number of notifications with a single INSERT ... RETURNING."""
+    rows = [p if isinstance(p, dict) else p.model_dump() for p in payloads]
+    return repository.create_notifications(db, rows, commit=commit)
+
+
+def notify_coalesced(db: Session, payload: schemas.NotificationCreate, group_key: str, *, commit: bool = True):
+    """
+    Update the recipient's unread notification of the same (type, group) in place
+    instead of adding another row; falls back to a plain insert when coalescing is off.
+    """
+    if not settings.NOTIFICATION_COALESCE_CHAT:
+        return notify_many(db, [payload], commit=commit)[0]
+    return repository.coalesce_notification(db, payload.model_dump(), group_key, commit=commit)
+
+
+def delivery_key(item: dict) -> tuple:
+    """Identifies one pushed version of a notification; coalesced updates reuse the id."""
+    return item["id"], item.get("count", 1)
+
+
+def broadcast(db: Session, payload: schemas.NotificationBroadcast) -> int:
+    if payload.user_ids is not None and not payload.user_ids:
+        return 0
+    return repository.broadcast(
+        db,
+        type=payload.type,
+        title=payload.title,
+        body=payload.body,
+        role_name=payload.role,
+        user_ids=payload.user_ids,
+    )
 
 
 def list_my_notifications(
@@ -29,6 +68,28 @@ def list_since(db: Session, user_id: UUID, since: datetime, limit: int = 50):
     return repository.list_notifications_since(db, user_id=user_id, since=since, limit=limit)
 
 
+def event_id(item: dict) -> str:
+    """
+    SSE event id of a pushed notification: `<last activity ISO>/<id>`. A coalesced
+    update gets a later id than the original row, so resume replays it.
+    """
+    return f"{item.get('last_at') or item['created_at']}/{item['id']}"
+
+
+def parse_event_id(last_event_id: str) -> tuple[datetime, UUID]:
+    try:
+        activity_at, notification_id = last_event_id.rsplit("/", 1)
+        return datetime.fromisoformat(activity_at), UUID(notification_id)
+    except ValueError:
+        raise ValueError("Invalid Last-Event-ID")
+
+
+def list_after_event(db: Session, user_id: UUID, position: tuple[datetime, UUID], limit: int = 200):
+    """Notifications created or coalesced after a parsed SSE `Last-Event-ID`, oldest activity first."""
+    activity_at, notification_id = position
+    return repository.list_notifications_after(db, user_id, activity_at, notification_id, limit=limit)
+
+
 def mark_notification_read(db: Session, notification_id: UUID, user_id: UUID):
     notif = repository.mark_read(db, notification_id=notification_id, user_id=user_id)
     if not notif:
@@ -40,6 +101,15 @@ def mark_all_notifications_read(db: Session, user_id: UUID) -> int:
     return repository.mark_all_read(db, user_id=user_id)
 
 
+def unread_count(db: Session, user_id: UUID) -> schemas.UnreadCount:
+    by_type = repository.unread_counts(db, user_id=user_id)
+    return schemas.UnreadCount(total=sum(by_type.values()), by_type=by_type)
+
+
+def reconcile_unread_counters(db: Session) -> int:
+    return repository.reconcile_unread_counters(db)
+
+
 def delete_notification(db: Session, notification_id: UUID, user_id: UUID):
     ok = repository.delete_notification(db, notification_id=notification_id, user_id=user_id)
     if not ok:
@@ -47,47 +117,94 @@ def delete_notification(db: Session, notification_id: UUID, user_id: UUID):
     return True
 
 
+def ensure_partitions(db: Session, months_ahead: Optional[int] = None) -> List[str]:
+    """Make sure the current month and the next `months_ahead` months have partitions."""
+    months = settings.NOTIFICATION_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    return repository.create_month_partitions(db, datetime.now(timezone.utc).date().replace(day=1), months + 1)
+
+
+def purge_expired(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Apply per-type retention. Monthly partitions older than the longest retention are
+    dropped whole; younger expired rows are deleted in batches so locks stay short.
+    Returns the number of rows deleted per type (`*` for types without their own setting)
+    plus the number of partitions dropped.
+    """
+    now = now or datetime.now(timezone.utc)
+    retention = settings.NOTIFICATION_RETENTION_DAYS
+    default_days = settings.NOTIFICATION_DEFAULT_RETENTION_DAYS
+    keep_all_after = now - timedelta(days=max([default_days, *retention.values()]))
+
+    dropped = 0
+    for name, _, upper in repository.list_month_partitions(db):
+        if datetime.combine(upper, datetime.min.time(), tzinfo=timezone.utc) <= keep_all_after:
+            repository.drop_month_partition(db, name)
+            dropped += 1
+
+    batch = settings.NOTIFICATION_PURGE_BATCH_SIZE
+    policies = [(type_, days, {"types": [type_]}) for type_, days in retention.items()]
+    policies.append(("*", default_days, {"exclude_types": list(retention)}))
+    deleted = {"partitions_dropped": dropped}
+    for label, days, scope in policies:
+        cutoff = now - timedelta(days=days)
+        total = 0
+        while True:
+            n = repository.delete_expired_batch(db, cutoff, batch_size=batch, **scope)
+            total += n
+            if n < batch:
+                break
+        deleted[label] = total
+    deleted["coalesce_heads"] = repository.delete_stale_coalesce_heads(db)
+    return deleted
+
+
 # Chat-specific helpers
-def notify_message_sent(db: Session, *, thread_id: UUID, recipient_id: UUID, message_id: UUID):
-    return notify(
+PREVIEW_LENGTH = 140
+
+
+def notify_message_sent(db: Session, *, thread_id: UUID, recipient_id: UUID, message_id: UUID, preview: Optional[str] = None):
+    if preview and len(preview) > PREVIEW_LENGTH:
+        preview = preview[: PREVIEW_LENGTH - 1] + "…"
+    return notify_coalesced(
         db,
         schemas.NotificationCreate(
             user_id=recipient_id,
             type="CHAT",
             title="New message",
-            body=f"New message in thread {thread_id}",
+            body=preview or f"New message in thread {thread_id}",
         ),
+        group_key=str(thread_id),
     )
 
 
 def notify_message_read(db: Session, *, thread_id: UUID, sender_id: UUID, message_id: UUID):
-    return notify(
+    return notify_coalesced(
         db,
         schemas.NotificationCreate(
             user_id=sender_id,
-            type="CHAT",
+            type="CHAT_READ",
             title="Message read",
             body=f"Your message in thread {thread_id} was read",
         ),
+        group_key=str(thread_id),
     )
 
 
 def notify_thread_created(db: Session, *, doctor_id: UUID, patient_id: UUID, thread_id: UUID, doctor_user_id: UUID, patient_user_id: UUID):
-    notify(
+    return notify_many(
         db,
-        schemas.NotificationCreate(
-            user_id=doctor_user_id,
-            type="CHAT",
-            title="New chat thread",
-            body=f"Thread started with patient {patient_id}",
-        ),
-    )
-    notify(
-        db,
-        schemas.NotificationCreate(
-            user_id=patient_user_id,
-            type="CHAT",
-            title="New chat thread",
-            body=f"Thread started with doctor {doctor_id}",
-        ),
+        [
+            schemas.NotificationCreate(
+                user_id=doctor_user_id,
+                type="CHAT",
+                title="New chat thread",
+                body=f"Thread started with patient {patient_id}",
+            ),
+            schemas.NotificationCreate(
+                user_id=patient_user_id,
+                type="CHAT",
+                title="New chat thread",
+                body=f"Thread started with doctor {doctor_id}",
+            ),
+        ],
     )
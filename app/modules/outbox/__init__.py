@@ -0,0 +1 @@
+# Transactional outbox: domain events recorded with the state change, dispatched in the background
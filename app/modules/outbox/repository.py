@@ -0,0 +1,52 @@
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from app.modules.outbox import models
+
+
+def add_event(db: Session, event_type: str, payload: dict) -> models.OutboxEvent:
+    """Stage an event in the caller's transaction; it is written by the caller's commit."""
+    event = models.OutboxEvent(event_type=event_type, payload=payload, attempts=0)
+    db.add(event)
+    return event
+
+
+def claim_pending(db: Session, limit: int, max_attempts: int) -> List[models.OutboxEvent]:
+    """Lock the oldest pending events; concurrent dispatchers skip rows locked here."""
+    return (
+        db.query(models.OutboxEvent)
+        .filter(models.OutboxEvent.processed_at.is_(None), models.OutboxEvent.attempts < max_attempts)
+        .order_by(models.OutboxEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def mark_processed(db: Session, event_ids: List[int]):
+    if event_ids:
+        db.execute(
+            update(models.OutboxEvent)
+            .where(models.OutboxEvent.id.in_(event_ids))
+            .values(processed_at=func.now(), attempts=models.OutboxEvent.attempts + 1)
+        )
+
+
+def mark_failed(db: Session, event_id: int, error: str):
+    db.execute(
+        update(models.OutboxEvent)
+        .where(models.OutboxEvent.id == event_id)
+        .values(attempts=models.OutboxEvent.attempts + 1, last_error=error[:1000])
+    )
+
+
+def delete_processed_before(db: Session, cutoff: datetime) -> int:
+    result = db.execute(
+        delete(models.OutboxEvent).where(models.OutboxEvent.processed_at.is_not(None), models.OutboxEvent.processed_at < cutoff)
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.modules.appointments import events as appointment_events
+from app.modules.doctors import service as doctors_service
+from app.modules.notifications import service as notifications_service
+from app.modules.outbox import models, repository
+
+logger = logging.getLogger("app.outbox")
+
+# event_type -> handler(payload) returning notification rows
+HANDLERS = {**appointment_events.NOTIFICATION_HANDLERS}
+# event_type -> handler(db, payloads) updating derived state in the dispatch transaction,
+# called once with the payloads of all events of that type in a batch
+EFFECTS = {**doctors_service.EVENT_HANDLERS}
+
+
+def _fan_out(event: models.OutboxEvent) -> List[dict]:
+    handler = HANDLERS.get(event.event_type)
+    if handler is None:
+        raise LookupError(f"No handler for event type {event.event_type}")
+    return handler(event.payload)
+
+
+def _write_notifications(db: Session, rows: List[dict]):
+    notifications_service.notify_many(db, rows, commit=False)
+
+
+def _apply_effect(db: Session, event_type: str, events: List[models.OutboxEvent]):
+    # Its own savepoint, so a failing effect leaves nothing behind in the batch.
+    with db.begin_nested():
+        EFFECTS[event_type](db, [e.payload for e in events])
+
+
+def _run_effects(db: Session, events: List[models.OutboxEvent]) -> Dict[int, Exception]:
+    """Apply EFFECTS once per event type for the batch; returns failed event ids and their errors."""
+    by_type: Dict[str, List[models.OutboxEvent]] = {}
+    for event in events:
+        by_type.setdefault(event.event_type, []).append(event)
+    failed = {}
+    for event_type, group in by_type.items():
+        try:
+            _apply_effect(db, event_type, group)
+            continue
+        except Exception as exc:
+            if len(group) == 1:
+                logger.exception("Outbox event %s (%s) failed", group[0].id, event_type)
+                failed[group[0].id] = exc
+                continue
+            logger.warning("Outbox %s effect failed for %s events (%r), retrying one by one", event_type, len(group), exc)
+        for event in group:
+            try:
+                _apply_effect(db, event_type, [event])
+            except Exception as exc:
+                logger.exception("Outbox event %s (%s) failed", event.id, event_type)
+                failed[event.id] = exc
+    return failed
+
+
+def dispatch_batch(db: Session, batch_size: int | None = None) -> int:
+    """Claim up to `batch_size` events and fan them out in one transaction; returns events claimed."""
+    events = repository.claim_pending(db, batch_size or settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_MAX_ATTEMPTS)
+    if not events:
+        db.rollback()
+        return 0
+    event_ids = [e.id for e in events]
+    failed = _run_effects(db, [e for e in events if e.event_type in EFFECTS])
+    for event_id, exc in failed.items():
+        repository.mark_failed(db, event_id, repr(exc))
+    rows, done = [], [e.id for e in events if e.event_type in EFFECTS and e.id not in failed]
+    for event in events:
+        if event.event_type in EFFECTS:
+            continue
+        try:
+            rows.extend(_fan_out(event))
+        except Exception as exc:
+            logger.exception("Outbox event %s (%s) failed", event.id, event.event_type)
+            repository.mark_failed(db, event.id, repr(exc))
+            continue
+        done.append(event.id)
+    try:
+        _write_notifications(db, rows)
+        repository.mark_processed(db, done)
+        db.commit()
+    except SQLAlchemyError:
+        # One bad event (e.g. a deleted user) must not block the rest of the batch.
+        db.rollback()
+        logger.warning("Outbox batch write failed, retrying %s events one by one", len(event_ids))
+        for event_id in event_ids:
+            _dispatch_one(db, event_id)
+    return len(event_ids)
+
+
+def _dispatch_one(db: Session, event_id: int):
+    event = (
+        db.query(models.OutboxEvent)
+        .filter(models.OutboxEvent.id == event_id, models.OutboxEvent.processed_at.is_(None))
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if event is None:
+        db.rollback()
+        return
+    try:
+        if event.event_type in EFFECTS:
+            _apply_effect(db, event.event_type, [event])
+        else:
+            _write_notifications(db, _fan_out(event))
+        repository.mark_processed(db, [event_id])
+        db.commit()
+    except Exception as exc:
+        db.rollback()
+        logger.exception("Outbox event %s failed", event_id)
+        repository.mark_failed(db, event_id, repr(exc))
+        db.commit()
+
+
+def drain(db: Session) -> int:
+    total = 0
+    while True:
+        claimed = dispatch_batch(db)
+        total += claimed
+        if claimed == 0:
+            return total
+
+
+def purge_processed(db: Session, retention_days: int | None = None) -> int:
+    days = settings.OUTBOX_RETENTION_DAYS if retention_days is None else retention_days
+    return repository.delete_processed_before(db, datetime.now(timezone.utc) - timedelta(days=days))
+
+
+def _dispatch_once() -> int:
+    db = SessionLocal()
+    try:
+        return dispatch_batch(db)
+    finally:
+        db.close()
+
+
+async def run_dispatcher(stop: asyncio.Event):
+    """Background loop started with the app; safe to run in every worker thanks to SKIP LOCKED."""
+    logger.info("Outbox dispatcher started")
+    while not stop.is_set():
+        try:
+            claimed = await asyncio.to_thread(_dispatch_once)
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+            claimed = 0
+        if claimed < settings.OUTBOX_BATCH_SIZE:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=settings.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    logger.info("Outbox dispatcher stopped")
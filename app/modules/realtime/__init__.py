@@ -0,0 +1 @@
+# One multiplexed websocket per user: chat threads on demand plus the user's notifications
@@ -0,0 +1,199 @@
+"""Multiplexed realtime websocket.
+
+One authenticated socket per user replaces a chat socket per open thread plus the
+notifications socket. Client frames:
+
+    {"op": "subscribe", "thread_id": "..."}
+    {"op": "unsubscribe", "thread_id": "..."}
+    {"op": "send", "thread_id": "...", "content": "..."}
+    {"op": "ping"}
+
+Server frames:
+
+    {"type": "notification", "data": {...}}
+    {"type": "chat.message", "thread_id": "...", "data": {...}}
+    {"type": "subscribed" | "unsubscribed", "thread_id": "..."}
+    {"type": "notifications.backlog", "data": [...]}      (with ?since=)
+    {"type": "error", "detail": "...", "thread_id": "..."}
+    {"type": "pong"}
+
+The token is checked once per connection and the participant check once per
+thread subscription; its result is reused for every `send` to that thread. All
+of a connection's subscriptions feed one bounded queue drained by one writer task.
+"""
+import asyncio
+import json
+import logging
+from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Dict, Tuple
+from uuid import UUID
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from sqlalchemy.orm import Session
+
+from app.core import security
+from app.core.config import settings
+from app.core.pubsub import SlowConsumer, get_broker, pump
+from app.db.session import run_with_session
+from app.modules.chat import service as chat_service
+from app.modules.chat.writer import content_error, write_socket_message
+from app.modules.notifications import service as notifications_service
+from app.modules.users import repository as users_repository
+
+router = APIRouter()
+logger = logging.getLogger("app.realtime")
+
+CHAT_PREFIX = chat_service.thread_channel("")
+
+
+def _extract_token(websocket: WebSocket) -> str | None:
+    auth_header = websocket.headers.get("authorization")
+    if auth_header and auth_header.lower().startswith("bearer "):
+        return auth_header.split(" ", 1)[1].strip()
+    return websocket.query_params.get("token")
+
+
+def _load_active_user(db: Session, user_id):
+    user = users_repository.get_by_id(db, user_id)
+    return user if user and user.is_active else None
+
+
+def _catch_up(db: Session, user_id: UUID, since: datetime):
+    return [notifications_service.push_payload(n) for n in notifications_service.list_since(db, user_id=user_id, since=since, limit=200)]
+
+
+def _envelope(channel: str | None, frame: str) -> str:
+    """Wrap a pre-encoded broker frame without decoding it again."""
+    if channel is None:
+        return frame
+    if channel.startswith(CHAT_PREFIX):
+        return f'{{"type":"chat.message","thread_id":"{channel[len(CHAT_PREFIX):]}","data":{frame}}}'
+    return f'{{"type":"notification","data":{frame}}}'
+
+
+def _reply(inbox: asyncio.Queue, **payload):
+    """Queue a control frame behind pending pushes so only the writer task sends."""
+    try:
+        inbox.put_nowait((None, None, json.dumps(payload)))
+    except asyncio.QueueFull:
+        pass
+
+
+async def _write(sub, websocket: WebSocket, seen: set):
+    """Drain the connection's queue; notifications already sent in the backlog (`seen`) are skipped."""
+
+    async def send(channel, message, frame):
+        if channel is None or channel.startswith(CHAT_PREFIX) or notifications_service.delivery_key(message) not in seen:
+            await websocket.send_text(_envelope(channel, frame))
+
+    try:
+        await pump(sub, send, with_channel=True)
+    except SlowConsumer:
+        try:
+            await asyncio.wait_for(websocket.close(code=status.WS_1013_TRY_AGAIN_LATER), 1.0)
+        except Exception:
+            pass
+
+
+@router.websocket("/ws")
+async def realtime_ws(websocket: WebSocket):
+    token = _extract_token(websocket)
+    try:
+        user_id = UUID(str(security.decode_token(token).get("sub"))) if token else None
+    except Exception:
+        user_id = None
+    user = await run_with_session(_load_active_user, user_id) if user_id else None
+    if not user:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    since = websocket.query_params.get("since")
+    try:
+        since = datetime.fromisoformat(since) if since else None
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    broker = get_broker()
+    inbox: asyncio.Queue = asyncio.Queue(settings.REALTIME_SEND_QUEUE_SIZE)
+    # thread id -> (sender role from the one-time participant check, its subscription)
+    threads: Dict[UUID, Tuple[str, AsyncExitStack]] = {}
+    async with AsyncExitStack() as stack:
+        notifications = await stack.enter_async_context(
+            broker.subscribe(notifications_service.user_channel(user.id), queue=inbox)
+        )
+        # Subscribed before the catch-up query so nothing committed in between is missed; the
+        # backlog is sent before the writer starts, so it precedes pushes queued meanwhile.
+        seen = set()
+        if since is not None:
+            backlog = await run_with_session(_catch_up, user.id, since)
+            seen = {notifications_service.delivery_key(item) for item in backlog}
+            await websocket.send_text(json.dumps({"type": "notifications.backlog", "data": backlog}))
+        writer = asyncio.create_task(_write(notifications, websocket, seen))
+        try:
+            while True:
+                try:
+                    frame = await websocket.receive_json()
+                except (ValueError, KeyError):
+                    _reply(inbox, type="error", detail="Invalid frame")
+                    continue
+                op = frame.get("op") if isinstance(frame, dict) else None
+                if op == "ping":
+                    _reply(inbox, type="pong")
+                    continue
+                try:
+                    thread_id = UUID(str(frame.get("thread_id")))
+                except (ValueError, AttributeError):
+                    _reply(inbox, type="error", detail="Invalid thread_id")
+                    continue
+
+                if op == "subscribe":
+                    if thread_id not in threads:
+                        if len(threads) >= settings.REALTIME_MAX_THREAD_SUBSCRIPTIONS:
+                            _reply(inbox, type="error", thread_id=str(thread_id), detail="Too many subscriptions")
+                            continue
+                        sub_stack = AsyncExitStack()
+                        try:
+                            role = await run_with_session(chat_service.open_socket_thread, thread_id, user.id)
+                            await sub_stack.enter_async_context(broker.subscribe(chat_service.thread_channel(thread_id), queue=inbox))
+                        except PermissionError as e:
+                            _reply(inbox, type="error", thread_id=str(thread_id), detail=str(e))
+                            continue
+                        except Exception:
+                            # Only this subscription fails; the socket and its other threads stay up.
+                            logger.exception("Subscribing to thread %s failed", thread_id)
+                            await sub_stack.aclose()
+                            _reply(inbox, type="error", thread_id=str(thread_id), detail="Subscription failed")
+                            continue
+                        threads[thread_id] = (role, sub_stack)
+                    _reply(inbox, type="subscribed", thread_id=str(thread_id))
+                elif op == "unsubscribe":
+                    entry = threads.pop(thread_id, None)
+                    if entry:
+                        await entry[1].aclose()
+                    _reply(inbox, type="unsubscribed", thread_id=str(thread_id))
+                elif op == "send":
+                    error = content_error(frame.get("content"))
+                    if thread_id not in threads:
+                        _reply(inbox, type="error", thread_id=str(thread_id), detail="Not subscribed")
+                    elif error:
+                        _reply(inbox, type="error", thread_id=str(thread_id), detail=error)
+                    else:
+                        try:
+                            stored = await write_socket_message(thread_id, user.id, threads[thread_id][0], frame["content"])
+                        except Exception:
+                            # Already logged by the writer; only this message is lost.
+                            _reply(inbox, type="error", thread_id=str(thread_id), detail="Message not stored")
+                            continue
+                        if not stored:
+                            await threads.pop(thread_id)[1].aclose()
+                            _reply(inbox, type="error", thread_id=str(thread_id), detail="Thread closed")
+                else:
+                    _reply(inbox, type="error", detail="Unknown op")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            writer.cancel()
+            for _, sub_stack in threads.values():
+                await sub_stack.aclose()
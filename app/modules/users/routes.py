@@ -10,7 +10,7 @@ from . import service, repository
 router = APIRouter()
 
 @router.get("/me", response_model=UserRead)
-async def read_users_me(current_user: User = Depends(get_current_active_user)):
+def read_users_me(current_user: User = Depends(get_current_active_user)):
     """
     Get current user.
     """
@@ -0,0 +1,79 @@
+"""Benchmark websocket chat message persistence: per-message commits vs. the write buffer.
+
+Needs a migrated database with the same `.env` as the API and an open chat thread
+(`--thread-id`). `--senders` coroutines stand in for sockets and send
+`--messages` messages in total, as the patient of that thread. Each mode runs in
+one process, so the numbers are messages per second per worker:
+
+- per-message: what the socket handler used to do for every frame (re-read the
+  thread, INSERT, commit, refresh, publish).
+- buffered: `chat.writer.write_socket_message` (cached thread status, multi-row
+  INSERTs flushed every `CHAT_WRITE_FLUSH_SECONDS`).
+
+The messages are stored in the thread; use a throwaway thread.
+
+Usage: python bench_chat_writes.py --thread-id UUID [--messages 5000] [--senders 200]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from uuid import UUID
+
+from app.db.session import SessionLocal, run_with_session
+from app.modules.chat import repository, service
+from app.modules.chat.writer import get_message_writer, write_socket_message
+
+
+def _store_one(db, thread_id: UUID, sender_id: UUID, content: str) -> bool:
+    thread = repository.get_thread(db, thread_id)
+    if not thread or thread.status.lower() == "closed":
+        return False
+    msg = repository.add_message(db, thread_id=thread_id, sender_id=sender_id, sender_role="PATIENT", content=content)
+    service.publish_message(msg)
+    return True
+
+
+async def _run(mode: str, thread_id: UUID, sender_id: UUID, messages: int, senders: int) -> float:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(messages):
+        queue.put_nowait(f"bench_chat_writes.py {mode} {i}")
+
+    async def sender():
+        while not queue.empty():
+            content = queue.get_nowait()
+            if mode == "buffered":
+                ok = await write_socket_message(thread_id, sender_id, "PATIENT", content)
+            else:
+                ok = await run_with_session(_store_one, thread_id, sender_id, content)
+            if not ok:
+                raise SystemExit("Thread is closed")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(senders)))
+    elapsed = time.perf_counter() - start
+    await get_message_writer().close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--thread-id", type=UUID, required=True)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--senders", type=int, default=200)
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        thread = repository.get_thread(db, args.thread_id)
+        if not thread:
+            raise SystemExit("Thread not found")
+        sender_id = thread.patient.user_id
+
+    for mode in ("per-message", "buffered"):
+        elapsed = asyncio.run(_run(mode, args.thread_id, sender_id, args.messages, args.senders))
+        print(f"{mode:>12}: {args.messages} messages in {elapsed:.2f}s = {args.messages / elapsed:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Measure end-to-end realtime fan-out latency through the pub/sub broker.
+
+Starts `--workers` subscriber processes (stand-ins for uvicorn workers). Each one
+holds `--sockets` subscriptions spread over `--threads` chat thread channels, so
+a worker only subscribes to the threads it has sockets for. The parent then
+publishes `--messages` chat-message payloads round-robin over the threads from
+a worker thread, as a sync route handler does. Latency is the time from
+`publish` to the subscriber task receiving the message; it is reported per
+delivery.
+
+The memory backend only fans out inside one process, so it always runs its
+subscribers in the publishing process. Redis and Postgres use the same
+`REDIS_URL` / `DATABASE_URL` as the API.
+
+Usage: python bench_fanout.py [--backend memory|redis|postgres] [--workers 2] [--threads 200]
+                              [--sockets 400] [--messages 5000] [--rate 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import multiprocessing as mp
+import statistics
+import threading
+import time
+import uuid
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+
+from app.core import pubsub
+from app.core.config import settings
+
+
+def _channel(thread_no: int) -> str:
+    return f"bench:chat:{thread_no}"
+
+
+def _assignments(worker: int, workers: int, sockets: int, threads: int):
+    """Thread numbers of the sockets held by one worker (a thread may appear more than once)."""
+    return [s % threads for s in range(sockets) if s % workers == worker]
+
+
+def _expected(channels, messages: int, threads: int) -> int:
+    per_thread = [messages // threads + (1 if t < messages % threads else 0) for t in range(threads)]
+    return sum(per_thread[t] for t in channels)
+
+
+async def _subscribe_and_collect(backend, channels, expected, ready, timeout):
+    settings.PUBSUB_BACKEND = backend
+    broker = pubsub.get_broker()
+    latencies = []
+    done = asyncio.Event()
+
+    async def drain(sub):
+        while True:
+            message = await sub.get()
+            latencies.append(time.time() - message["_published"])
+            if len(latencies) >= expected:
+                done.set()
+
+    async with AsyncExitStack() as stack:
+        subs = [await stack.enter_async_context(broker.subscribe(_channel(t))) for t in channels]
+        tasks = [asyncio.create_task(drain(sub)) for sub in subs]
+        ready()
+        try:
+            await asyncio.wait_for(done.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        for task in tasks:
+            task.cancel()
+    return latencies
+
+
+def _worker_main(backend, channels, expected, ready_event, results, timeout):
+    latencies = asyncio.run(_subscribe_and_collect(backend, channels, expected, ready_event.set, timeout))
+    results.put((expected, latencies))
+
+
+def _publish(messages: int, threads: int, rate: float, payload_bytes: int):
+    broker = pubsub.get_broker()
+    content = "x" * payload_bytes
+    interval = 1.0 / rate if rate else 0.0
+    start = time.perf_counter()
+    for i in range(messages):
+        if interval:
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        thread_no = i % threads
+        broker.publish(
+            _channel(thread_no),
+            {
+                "id": str(uuid.uuid4()),
+                "thread_id": str(thread_no),
+                "sender_id": str(uuid.uuid4()),
+                "sender_role": "PATIENT",
+                "content": content,
+                "sent_at": datetime.now(timezone.utc).isoformat(),
+                "read_at": None,
+                "is_system_message": False,
+                "_published": time.time(),
+            },
+        )
+    return time.perf_counter() - start
+
+
+def _report(label, expected, latencies, elapsed):
+    print(f"{label}: {len(latencies)}/{expected} deliveries in {elapsed:.2f}s publish time")
+    if not latencies:
+        return
+    ordered = sorted(latencies)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    print(
+        f"  latency ms: mean {statistics.fmean(ordered) * 1000:.2f}  p50 {pct(50):.2f}  "
+        f"p95 {pct(95):.2f}  p99 {pct(99):.2f}  max {ordered[-1] * 1000:.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["memory", "redis", "postgres"], default=settings.PUBSUB_BACKEND or ("redis" if settings.REDIS_URL else "memory"))
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=200)
+    parser.add_argument("--sockets", type=int, default=400)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000, help="messages per second, 0 = as fast as possible")
+    parser.add_argument("--payload-bytes", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    settings.PUBSUB_BACKEND = args.backend
+
+    if args.backend == "memory":
+        channels = _assignments(0, 1, args.sockets, args.threads)
+        expected = _expected(channels, args.messages, args.threads)
+
+        async def run():
+            ready = asyncio.Event()
+            collector = asyncio.create_task(_subscribe_and_collect(args.backend, channels, expected, ready.set, args.timeout))
+            await ready.wait()
+            elapsed = await asyncio.to_thread(_publish, args.messages, args.threads, args.rate, args.payload_bytes)
+            return elapsed, await collector
+
+        elapsed, latencies = asyncio.run(run())
+        _report("in-process", expected, latencies, elapsed)
+        return
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Queue()
+    procs, readies = [], []
+    for worker in range(args.workers):
+        channels = _assignments(worker, args.workers, args.sockets, args.threads)
+        ready = ctx.Event()
+        proc = ctx.Process(
+            target=_worker_main,
+            args=(args.backend, channels, _expected(channels, args.messages, args.threads), ready, results, args.timeout),
+        )
+        proc.start()
+        procs.append(proc)
+        readies.append(ready)
+    for ready in readies:
+        if not ready.wait(30):
+            raise SystemExit("A subscriber worker did not become ready")
+
+    # The parent publishes from a plain thread, like a sync route handler in the threadpool.
+    box = {}
+    publisher = threading.Thread(target=lambda: box.setdefault("elapsed", _publish(args.messages, args.threads, args.rate, args.payload_bytes)))
+    publisher.start()
+    publisher.join()
+
+    expected_total, all_latencies = 0, []
+    for worker in range(args.workers):
+        expected, latencies = results.get(timeout=args.timeout + 30)
+        expected_total += expected
+        all_latencies.extend(latencies)
+    for proc in procs:
+        proc.join()
+    _report(f"{args.backend}, {args.workers} workers", expected_total, all_latencies, box["elapsed"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Benchmark slot generation: legacy quadratic scan vs. the sweep-line engine.
+
+Runs without a database. For every (horizon, appointments/day) combination it
+builds a synthetic doctor schedule, checks both implementations agree, and
+prints the time to generate and serialize the free slots.
+
+Usage: python bench_slots.py [--slot-minutes 5] [--repeat 3]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from datetime import date, datetime, time, timedelta, timezone
+from types import SimpleNamespace
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.modules.doctors import slots as slot_engine
+from app.modules.doctors.schemas import AvailabilitySlotRead
+
+HORIZONS = [7, 30, 60]
+DENSITIES = [0, 8, 32]  # booked appointments per working day
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Sun"]
+
+
+def _availabilities():
+    rows = []
+    for weekday in WEEKDAYS:
+        rows.append(SimpleNamespace(weekday=weekday, start_time=time(8, 0), end_time=time(12, 0), is_active=True))
+        rows.append(SimpleNamespace(weekday=weekday, start_time=time(13, 0), end_time=time(17, 30), is_active=True))
+    return rows
+
+
+def _appointments(start_date: date, days: int, per_day: int, rng: random.Random):
+    appts = []
+    for i in range(days):
+        day = start_date + timedelta(days=i)
+        if day.strftime("%a") not in WEEKDAYS:
+            continue
+        for _ in range(per_day):
+            minute = rng.randrange(8 * 60, 17 * 60, 5)
+            start = datetime.combine(day, time(minute // 60, minute % 60), tzinfo=timezone.utc)
+            appts.append((start, start + timedelta(minutes=rng.choice([15, 30, 45]))))
+    return appts
+
+
+def legacy(start_date, days, availabilities, busy_windows, slot_minutes, now) -> bytes:
+    by_weekday = {}
+    for av in availabilities:
+        if av.is_active:
+            by_weekday.setdefault(av.weekday, []).append(av)
+    delta = timedelta(minutes=slot_minutes)
+    out: List[AvailabilitySlotRead] = []
+    for i in range(days):
+        day = start_date + timedelta(days=i)
+        for av in by_weekday.get(day.strftime("%a"), []):
+            current = datetime.combine(day, av.start_time, tzinfo=timezone.utc)
+            dt_end = datetime.combine(day, av.end_time, tzinfo=timezone.utc)
+            while current + delta <= dt_end:
+                slot_start, slot_end = current, current + delta
+                current += delta
+                if slot_end <= now:
+                    continue
+                if not any(not (slot_end <= b_start or slot_start >= b_end) for b_start, b_end in busy_windows):
+                    out.append(AvailabilitySlotRead(start_time=slot_start, end_time=slot_end))
+    return TypeAdapter(List[AvailabilitySlotRead]).dump_json(out)
+
+
+def engine(start_date, days, availabilities, busy_windows, slot_minutes, now) -> bytes:
+    windows = slot_engine.windows_by_weekday(availabilities)
+    busy = slot_engine.merge_busy(busy_windows)
+    return slot_engine.dumps_slots(slot_engine.free_slots(start_date, days, windows, busy, slot_minutes, now))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slot-minutes", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start_date = date(2025, 1, 5)
+    now = datetime.combine(start_date, time(10, 0), tzinfo=timezone.utc)
+    availabilities = _availabilities()
+
+    print(f"slot_minutes={args.slot_minutes}")
+    print(f"{'days':>5} {'appts/day':>9} {'slots':>7} {'legacy ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for days in HORIZONS:
+        for per_day in DENSITIES:
+            busy = _appointments(start_date, days, per_day, rng)
+            call_args = (start_date, days, availabilities, busy, args.slot_minutes, now)
+            expected = legacy(*call_args)
+            got = engine(*call_args)
+            if expected != got:
+                raise SystemExit(f"mismatch for days={days} appts/day={per_day}")
+            legacy_s = min(timeit.repeat(lambda: legacy(*call_args), number=1, repeat=args.repeat))
+            engine_s = min(timeit.repeat(lambda: engine(*call_args), number=1, repeat=args.repeat))
+            n_slots = got.count(b"start_time")
+            print(
+                f"{days:>5} {per_day:>9} {n_slots:>7} {legacy_s * 1000:>10.2f} {engine_s * 1000:>10.2f} "
+                f"{legacy_s / engine_s:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
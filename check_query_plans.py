@@ -0,0 +1,221 @@
+"""Check that hot repository queries are served by indexes.
+
+Loads a synthetic dataset inside one transaction, ANALYZEs it, runs each
+repository query once to capture the exact SQL it emits, and EXPLAINs that SQL.
+A check passes when the plan contains an index scan on one of the expected
+indexes. The transaction is rolled back at the end, so nothing is kept.
+
+Needs a migrated database (`alembic upgrade head`) with the same `.env` as the API.
+
+Usage: python check_query_plans.py [--doctors 200] [--patients 2000] [--per-doctor 500]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.modules.appointments import repository as appointments_repository
+from app.modules.chat import repository as chat_repository
+from app.modules.notifications import repository as notifications_repository
+
+INDEX_SCANS = {"Index Scan", "Index Only Scan", "Bitmap Index Scan"}
+BASE = datetime(2030, 1, 7, tzinfo=timezone.utc)
+
+SEED_SQL = [
+    "INSERT INTO roles (name) VALUES ('PLANCHECK')",
+    """
+    INSERT INTO users (id, email, password_hash, role_id, locale, theme_preference, is_active, is_superuser, token_version)
+    SELECT gen_random_uuid(), 'plancheck-' || g || '@example.invalid', '-',
+           (SELECT id FROM roles WHERE name = 'PLANCHECK'), 'en', 'light', true, false, 0
+      FROM generate_series(1, :patients + :doctors) g
+    """,
+    """
+    INSERT INTO patients (id, user_id)
+    SELECT gen_random_uuid(), id FROM users
+     WHERE role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK') ORDER BY email LIMIT :patients
+    """,
+    """
+    INSERT INTO doctors (id, user_id, free_slots_7d)
+    SELECT gen_random_uuid(), u.id, 0 FROM users u
+     WHERE u.role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK')
+       AND NOT EXISTS (SELECT 1 FROM patients p WHERE p.user_id = u.id)
+    """,
+    # Back-to-back 30 minute appointments per doctor, so SCHEDULED rows never overlap.
+    """
+    WITH pats AS (
+        SELECT array_agg(p.id) AS ids FROM patients p JOIN users u ON u.id = p.user_id
+         WHERE u.role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK')
+    ), docs AS (
+        SELECT d.id, row_number() OVER (ORDER BY d.id) AS rn FROM doctors d JOIN users u ON u.id = d.user_id
+         WHERE u.role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK')
+    )
+    INSERT INTO appointments (id, patient_id, doctor_id, start_time, end_time, status)
+    SELECT gen_random_uuid(), pats.ids[1 + (g * 7 + docs.rn) % :patients], docs.id,
+           :base + g * interval '30 minutes', :base + (g + 1) * interval '30 minutes',
+           (ARRAY['SCHEDULED', 'COMPLETED', 'CANCELLED'])[1 + g % 3]
+      FROM docs, pats, generate_series(1, :per_doctor) g
+    """,
+    """
+    INSERT INTO chat_threads (id, patient_id, doctor_id, status)
+    SELECT DISTINCT ON (patient_id, doctor_id) gen_random_uuid(), patient_id, doctor_id, 'open'
+      FROM appointments WHERE start_time >= :base
+    """,
+    """
+    INSERT INTO chat_messages (id, thread_id, sender_id, sender_role, content, sent_at, is_system_message, seq)
+    SELECT gen_random_uuid(), t.id, p.user_id, 'PATIENT', 'message ' || g, :base + g * interval '1 minute', false, g
+      FROM chat_threads t JOIN patients p ON p.id = t.patient_id JOIN users u ON u.id = p.user_id,
+           generate_series(1, 20) g
+     WHERE u.role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK')
+    """,
+    """
+    INSERT INTO chat_thread_summaries (thread_id, patient_id, doctor_id, last_sent_at, patient_unread, doctor_unread)
+    SELECT t.id, t.patient_id, t.doctor_id, :base + interval '20 minutes', 0, 1
+      FROM chat_threads t JOIN patients p ON p.id = t.patient_id JOIN users u ON u.id = p.user_id
+     WHERE u.role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK')
+    """,
+    """
+    INSERT INTO notifications (id, user_id, type, title, is_read, created_at)
+    SELECT gen_random_uuid(), u.id, 'APPOINTMENT', 'notification ' || g, g % 10 <> 0, :base + g * interval '1 hour'
+      FROM users u, generate_series(1, 50) g
+     WHERE u.role_id = (SELECT id FROM roles WHERE name = 'PLANCHECK')
+    """,
+]
+
+PICK_SQL = {
+    "doctor_id": "SELECT d.id FROM doctors d JOIN users u ON u.id = d.user_id "
+    "WHERE u.email LIKE 'plancheck-%' LIMIT 1",
+    "patient_id": "SELECT p.id FROM patients p JOIN users u ON u.id = p.user_id "
+    "WHERE u.email LIKE 'plancheck-%' LIMIT 1",
+    "thread_id": "SELECT t.id FROM chat_threads t JOIN patients p ON p.id = t.patient_id "
+    "JOIN users u ON u.id = p.user_id WHERE u.email LIKE 'plancheck-%' LIMIT 1",
+    "user_id": "SELECT id FROM users WHERE email LIKE 'plancheck-%' LIMIT 1",
+}
+
+
+def _checks(ids):
+    window_start = BASE + timedelta(days=2)
+    window_end = window_start + timedelta(days=1)
+    return [
+        (
+            "appointments.list_scheduled_for_doctor_between",
+            lambda db: appointments_repository.list_scheduled_for_doctor_between(db, ids["doctor_id"], window_start, window_end),
+            {"ix_appointments_doctor_id_status_start_time"},
+        ),
+        (
+            "appointments.has_conflict",
+            lambda db: appointments_repository.has_conflict(db, ids["doctor_id"], window_start, window_start + timedelta(minutes=30)),
+            {"ix_appointments_doctor_id_status_start_time"},
+        ),
+        (
+            "appointments.list_appointments_for_patient",
+            lambda db: appointments_repository.list_appointments_for_patient(db, ids["patient_id"], limit=20),
+            {"ix_appointments_patient_id_start_time"},
+        ),
+        (
+            "chat.list_messages",
+            lambda db: chat_repository.list_messages(db, ids["thread_id"], limit=50),
+            {"ix_chat_messages_thread_id_sent_at"},
+        ),
+        (
+            "chat.list_messages_after_seq",
+            lambda db: chat_repository.list_messages_after_seq(db, ids["thread_id"], after_seq=15, limit=50),
+            {"ix_chat_messages_thread_id_seq"},
+        ),
+        (
+            "chat.search_threads(sort_recent)",
+            lambda db: chat_repository.search_threads(db, user_role="DOCTOR", user_profile_id=ids["doctor_id"], sort_recent=True),
+            {"ix_chat_thread_summaries_doctor_id_last_sent_at"},
+        ),
+        (
+            "chat.unread_count_for_user",
+            lambda db: chat_repository.unread_count_for_user(db, user_role="PATIENT", user_profile_id=ids["patient_id"]),
+            {"ix_chat_thread_summaries_patient_id_last_sent_at"},
+        ),
+        (
+            "notifications.list_notifications",
+            lambda db: notifications_repository.list_notifications(db, ids["user_id"], limit=50),
+            {"ix_notifications_user_id_activity_at_id"},
+        ),
+        (
+            "notifications.list_notifications(is_read=False)",
+            lambda db: notifications_repository.list_notifications(db, ids["user_id"], is_read=False, limit=50),
+            {"ix_notifications_user_id_unread", "ix_notifications_user_id_activity_at_id"},
+        ),
+    ]
+
+
+# Scans on a partition use the partition's own copy of the index; report the parent index.
+PARENT_INDEX_SQL = """
+SELECT c.relname, p.relname FROM pg_inherits i
+  JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent
+ WHERE c.relkind = 'i'
+"""
+
+
+def _index_scans(plan: dict):
+    if plan.get("Node Type") in INDEX_SCANS:
+        yield plan["Node Type"], plan.get("Index Name")
+    for child in plan.get("Plans", ()):
+        yield from _index_scans(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctors", type=int, default=200)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--per-doctor", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = create_engine(settings.DATABASE_URL)
+    failures = 0
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            params = {"patients": args.patients, "doctors": args.doctors, "per_doctor": args.per_doctor, "base": BASE}
+            for sql in SEED_SQL:
+                conn.execute(text(sql), params)
+            conn.exec_driver_sql(
+                "ANALYZE users, patients, doctors, appointments, chat_threads, chat_messages, chat_thread_summaries, notifications"
+            )
+            ids = {name: conn.execute(text(sql)).scalar_one() for name, sql in PICK_SQL.items()}
+
+            parent_index = dict(conn.execute(text(PARENT_INDEX_SQL)).all())
+            captured = []
+
+            def capture(_conn, _cursor, statement, parameters, _context, _executemany):
+                captured.append((statement, parameters))
+
+            # Repository functions that commit only release this savepoint.
+            db = Session(bind=conn, join_transaction_mode="create_savepoint")
+            for name, run, expected in _checks(ids):
+                captured.clear()
+                event.listen(conn, "before_cursor_execute", capture)
+                try:
+                    run(db)
+                finally:
+                    event.remove(conn, "before_cursor_execute", capture)
+                statement, parameters = captured[-1]
+                plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar_one()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                scans = [(node, parent_index.get(index, index)) for node, index in _index_scans(plan[0]["Plan"])]
+                used = {index for _, index in scans}
+                ok = bool(used & expected)
+                failures += not ok
+                detail = ", ".join(f"{node} using {index}" for node, index in scans) or "no index scan"
+                print(f"{'PASS' if ok else 'FAIL'}  {name}: {detail}")
+            db.close()
+        finally:
+            trans.rollback()
+    engine.dispose()
+    if failures:
+        raise SystemExit(f"{failures} quer{'y' if failures == 1 else 'ies'} not using the expected index")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Load test: HTTP latency while more and more websockets stay open.
+
+Runs against a live API. For every step in `--steps` the script opens websockets
+until that many are connected and keeps all of them open. It then fires
+`--requests` authenticated HTTP requests at a DB-backed endpoint with
+`--concurrency` in flight and reports p50/p95/p99. Websocket handlers check out
+a DB session only per unit of work, so idle sockets should not hold pooled
+connections and HTTP p99 should stay flat as the socket count grows. The run
+fails if the last step's p99 exceeds `--max-p99-ratio` times the first step's.
+
+Sockets go to /notifications/ws, or to /chat/ws/chat/{id} with `--thread-id`. The
+token's user must take part in that thread. With `--chat-rate`, the sockets also
+send that many chat messages per second during the HTTP phase, so per-message DB
+work competes with HTTP. Those messages are stored in the thread.
+
+Usage: python load_test_ws.py --token ACCESS_TOKEN [--base-url http://localhost:8000]
+                              [--steps 0,100,250,500,1000] [--requests 500] [--concurrency 20]
+                              [--thread-id UUID] [--chat-rate 0]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+import websockets
+
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class SocketFleet:
+    def __init__(self, url: str):
+        self.url = url
+        self.sockets = []
+        self.tasks = []
+        self.failed = 0
+
+    async def _hold(self, ready: asyncio.Future):
+        try:
+            ws = await websockets.connect(self.url, open_timeout=30)
+        except Exception as exc:
+            ready.set_exception(exc)
+            return
+        self.sockets.append(ws)
+        ready.set_result(True)
+        try:
+            async for _ in ws:
+                pass
+        except Exception:
+            pass
+        finally:
+            self.sockets.remove(ws)
+            await ws.close()
+
+    async def grow_to(self, count: int, batch: int = 50):
+        while len(self.sockets) < count:
+            pending = []
+            for _ in range(min(batch, count - len(self.sockets))):
+                ready = asyncio.get_running_loop().create_future()
+                self.tasks.append(asyncio.create_task(self._hold(ready)))
+                pending.append(ready)
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, Exception):
+                    self.failed += 1
+                    if self.failed > max(10, count // 10):
+                        raise SystemExit(f"Too many websocket connect failures, last: {result!r}")
+
+    async def chat(self, rate: float, stop: asyncio.Event):
+        i = 0
+        while not stop.is_set() and self.sockets:
+            ws = self.sockets[i % len(self.sockets)]
+            try:
+                await ws.send(json.dumps({"content": f"load_test_ws.py message {i}"}))
+            except Exception:
+                pass
+            i += 1
+            await asyncio.sleep(1 / rate)
+
+    async def close(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+async def _http_phase(client: httpx.AsyncClient, path: str, requests: int, concurrency: int):
+    latencies, errors = [], 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return sorted(latencies), errors
+
+
+async def run(args):
+    ws_base = args.base_url.replace("http", "ws", 1) + "/api/v1"
+    if args.thread_id:
+        url = f"{ws_base}/chat/ws/chat/{args.thread_id}?token={args.token}"
+    else:
+        url = f"{ws_base}/notifications/ws?token={args.token}"
+    fleet = SocketFleet(url)
+    steps = [int(s) for s in args.steps.split(",")]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    p99s = []
+    print(f"{'sockets':>8} {'requests':>9} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    async with httpx.AsyncClient(
+        base_url=args.base_url,
+        headers={"Authorization": f"Bearer {args.token}"},
+        limits=limits,
+        timeout=30,
+    ) as client:
+        try:
+            await _http_phase(client, args.path, args.concurrency, args.concurrency)  # warm up
+            for step in steps:
+                await fleet.grow_to(step)
+                stop = asyncio.Event()
+                chatter = asyncio.create_task(fleet.chat(args.chat_rate, stop)) if args.chat_rate and step else None
+                latencies, errors = await _http_phase(client, args.path, args.requests, args.concurrency)
+                stop.set()
+                if chatter:
+                    await chatter
+                p99 = _percentile(latencies, 99) * 1000
+                p99s.append(p99)
+                print(
+                    f"{len(fleet.sockets):>8} {len(latencies):>9} {errors:>7} "
+                    f"{_percentile(latencies, 50) * 1000:>8.1f} {_percentile(latencies, 95) * 1000:>8.1f} "
+                    f"{p99:>8.1f} {statistics.fmean(latencies) * 1000:>8.1f}"
+                )
+        finally:
+            await fleet.close()
+    if len(p99s) > 1 and p99s[-1] > args.max_p99_ratio * p99s[0]:
+        raise SystemExit(f"FAIL: p99 grew from {p99s[0]:.1f} ms to {p99s[-1]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="access token of a patient or doctor")
+    parser.add_argument("--path", default="/api/v1/notifications/unread-count", help="DB-backed endpoint to time")
+    parser.add_argument("--steps", default="0,100,250,500,1000")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--thread-id")
+    parser.add_argument("--chat-rate", type=float, default=0, help="chat messages per second sent over the sockets")
+    parser.add_argument("--max-p99-ratio", type=float, default=2.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
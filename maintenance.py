@@ -0,0 +1,83 @@
+"""Periodic maintenance jobs.
+
+Run from cron (or any scheduler) with the same `.env` as the API, e.g. nightly:
+    python maintenance.py extend-slot-horizon
+and every few minutes:
+    python maintenance.py refresh-next-available
+The API dispatches the outbox itself; `dispatch-outbox` drains it when the
+in-app dispatcher is disabled (OUTBOX_DISPATCHER_ENABLED=false) and purges old
+processed events. `reconcile-unread-counters` (nightly) repairs drift in the
+denormalized unread-notification counters. `notifications-retention` (nightly)
+creates upcoming monthly notification partitions and purges expired notifications.
+`rebuild-chat-summaries` (nightly) repairs drift in the per-thread chat summaries.
+"""
+import argparse
+import logging
+
+from app.core.logging import setup_logging
+from app.db.session import SessionLocal
+from app.modules.chat import service as chat_service
+from app.modules.doctors import service as doctors_service
+from app.modules.notifications import service as notifications_service
+from app.modules.outbox import service as outbox_service
+
+logger = logging.getLogger("app.maintenance")
+
+
+def extend_slot_horizon(db):
+    refreshed = doctors_service.extend_free_slot_horizon(db)
+    logger.info("Materialized %s doctor-days of free slots", refreshed)
+
+
+def refresh_next_available(db):
+    count = doctors_service.sweep_next_available(db)
+    logger.info("Refreshed next availability for %s doctors", count)
+
+
+def dispatch_outbox(db):
+    dispatched = outbox_service.drain(db)
+    purged = outbox_service.purge_processed(db)
+    logger.info("Dispatched %s outbox events, purged %s processed ones", dispatched, purged)
+
+
+def notifications_retention(db):
+    created = notifications_service.ensure_partitions(db)
+    purged = notifications_service.purge_expired(db)
+    logger.info("Created notification partitions %s; purged %s", created or "none", purged)
+
+
+def reconcile_unread_counters(db):
+    fixed = notifications_service.reconcile_unread_counters(db)
+    logger.info("Reconciled %s unread notification counters", fixed)
+
+
+def rebuild_chat_summaries(db):
+    fixed = chat_service.rebuild_thread_summaries(db)
+    logger.info("Rebuilt %s chat thread summaries", fixed)
+
+
+JOBS = {
+    "dispatch-outbox": dispatch_outbox,
+    "extend-slot-horizon": extend_slot_horizon,
+    "notifications-retention": notifications_retention,
+    "rebuild-chat-summaries": rebuild_chat_summaries,
+    "reconcile-unread-counters": reconcile_unread_counters,
+    "refresh-next-available": refresh_next_available,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a maintenance job.")
+    parser.add_argument("job", choices=sorted(JOBS))
+    args = parser.parse_args()
+
+    setup_logging()
+    db = SessionLocal()
+    try:
+        JOBS[args.job](db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ from app.modules.doctors.models import Doctor, DoctorAvailability, Specialty, Fa
 from app.modules.patients.models import Patient
 from app.modules.users.models import Role, User
 from app.modules.chat.models import ChatThread, ChatMessage
+from app.modules.chat import repository as chat_repository
 
 DEFAULT_PASSWORD = "Algeria123!"
 _fallback_bcrypt_used = False
@@ -470,10 +471,7 @@ def ensure_thread(db: Session, patient_email: str, doctor_email: str) -> ChatThr
     ).scalar_one_or_none()
     if existing:
         return existing
-    thread = ChatThread(patient_id=patient.id, doctor_id=doctor.id)
-    db.add(thread)
-    db.commit()
-    db.refresh(thread)
+    thread = chat_repository.create_thread(db, patient_id=patient.id, doctor_id=doctor.id)
     print(f"Chat thread created: {patient_email} <-> {doctor_email}")
     return thread
 
@@ -509,15 +507,13 @@ def ensure_message(db: Session, sender_email: str, receiver_email: str, content:
     ).scalar_one_or_none()
     if exists:
         return
-    msg = ChatMessage(
+    chat_repository.add_message(
+        db,
         thread_id=thread.id,
         sender_id=sender_user.id,
         sender_role=sender_role or "",
         content=content,
     )
-    db.add(msg)
-    db.commit()
-    db.refresh(msg)
     print(f"Chat message added: {sender_email} -> {receiver_email}")
 
 
@@ -0,0 +1,138 @@
+"""Concurrency stress test for appointment booking.
+
+Needs a migrated database and an existing doctor and patient (for example from
+seed_algeria_data.py). Slots are placed far in the future and tagged, and every
+appointment the script creates is deleted at the end.
+
+1. Race: `--threads` workers try to book the *same* slot at once; exactly one
+   must win and the rest must be rejected as unavailable.
+2. Throughput: `--bookings` distinct slots are booked in parallel, once with the
+   constraint-backed single INSERT and once with the old check-then-insert flow.
+
+Both phases finish by asserting that the doctor has no overlapping scheduled
+appointments.
+
+Usage: python stress_booking.py --doctor-id UUID --patient-id UUID [--threads 8] [--bookings 400]
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from sqlalchemy import create_engine, delete, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.modules.appointments import models, repository
+
+MARKER = "stress_booking.py"
+BASE = datetime(2099, 1, 5, 8, 0, tzinfo=timezone.utc)
+
+OVERLAPS_SQL = text(
+    """
+    SELECT count(*) FROM appointments a JOIN appointments b
+      ON a.doctor_id = b.doctor_id AND a.id < b.id
+     AND a.start_time < b.end_time AND b.start_time < a.end_time
+     WHERE a.doctor_id = :doctor_id AND a.status = 'SCHEDULED' AND b.status = 'SCHEDULED'
+    """
+)
+
+
+def _payload(doctor_id: UUID, patient_id: UUID, start: datetime) -> dict:
+    return {
+        "doctor_id": doctor_id,
+        "patient_id": patient_id,
+        "start_time": start,
+        "end_time": start + timedelta(minutes=30),
+        "status": "SCHEDULED",
+        "reason": MARKER,
+    }
+
+
+def book_single_insert(db, payload: dict) -> bool:
+    try:
+        repository.create_appointment(db, payload)
+    except ValueError:
+        return False
+    return True
+
+
+def book_check_then_insert(db, payload: dict) -> bool:
+    if repository.has_conflict(db, payload["doctor_id"], payload["start_time"], payload["end_time"]):
+        return False
+    return book_single_insert(db, payload)
+
+
+def _run(Session, book, payloads, threads: int, barrier: threading.Barrier | None = None):
+    def task(payload):
+        db = Session()
+        try:
+            if barrier is not None:
+                barrier.wait()
+            return book(db, payload)
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(task, payloads))
+    return results, time.perf_counter() - started
+
+
+def _assert_no_overlaps(Session, doctor_id: UUID):
+    with Session() as db:
+        overlaps = db.execute(OVERLAPS_SQL, {"doctor_id": doctor_id}).scalar_one()
+    if overlaps:
+        raise SystemExit(f"FAIL: {overlaps} overlapping scheduled appointments")
+
+
+def _cleanup(Session, doctor_id: UUID):
+    with Session() as db:
+        db.execute(
+            delete(models.Appointment).where(
+                models.Appointment.doctor_id == doctor_id, models.Appointment.reason == MARKER
+            )
+        )
+        db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--doctor-id", type=UUID, required=True)
+    parser.add_argument("--patient-id", type=UUID, required=True)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--bookings", type=int, default=400)
+    args = parser.parse_args()
+
+    engine = create_engine(settings.DATABASE_URL, pool_size=args.threads, max_overflow=0, pool_pre_ping=True)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    _cleanup(Session, args.doctor_id)
+    try:
+        same_slot = [_payload(args.doctor_id, args.patient_id, BASE)] * args.threads
+        results, _ = _run(Session, book_single_insert, same_slot, args.threads, threading.Barrier(args.threads))
+        _assert_no_overlaps(Session, args.doctor_id)
+        if sum(results) != 1:
+            raise SystemExit(f"FAIL: {sum(results)} of {args.threads} concurrent bookings of one slot succeeded")
+        print(f"race: 1 of {args.threads} concurrent bookings won, {args.threads - 1} rejected")
+        _cleanup(Session, args.doctor_id)
+
+        print(f"{'mode':>18} {'booked':>7} {'seconds':>8} {'bookings/s':>11}")
+        for name, book in (("check-then-insert", book_check_then_insert), ("single insert", book_single_insert)):
+            payloads = [
+                _payload(args.doctor_id, args.patient_id, BASE + timedelta(minutes=30 * i)) for i in range(args.bookings)
+            ]
+            results, elapsed = _run(Session, book, payloads, args.threads)
+            _assert_no_overlaps(Session, args.doctor_id)
+            print(f"{name:>18} {sum(results):>7} {elapsed:>8.2f} {sum(results) / elapsed:>11.1f}")
+            _cleanup(Session, args.doctor_id)
+    finally:
+        _cleanup(Session, args.doctor_id)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.core.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_entries_expire(clock):
+    c = TTLCache()
+    assert c.set("k", 1, ttl=10)
+    assert c.get("k") == 1
+    clock[0] += 10
+    assert c.get("k") is None
+    assert c.stats()["hits"] == 1 and c.stats()["misses"] == 1
+
+
+def test_non_positive_ttl_is_not_stored():
+    c = TTLCache()
+    assert not c.set("k", 1, ttl=0)
+    assert c.get("k") is None
+
+
+def test_invalidate_tag_drops_only_that_tag():
+    c = TTLCache()
+    a, b = uuid.uuid4(), uuid.uuid4()
+    c.set(("a", 1), 1, 60, tag=a)
+    c.set(("a", 2), 2, 60, tag=a)
+    c.set(("b", 1), 3, 60, tag=b)
+    c.invalidate_tag(a)
+    assert c.get(("a", 1)) is None and c.get(("a", 2)) is None
+    assert c.get(("b", 1)) == 3
+
+
+def test_value_computed_before_an_invalidation_is_not_stored():
+    c = TTLCache()
+    tag = uuid.uuid4()
+    version = c.tag_version(tag)
+    c.invalidate_tag(tag)  # the data changed while the value was being computed
+    assert not c.set("k", "stale", 60, tag=tag, version=version)
+    assert c.set("k", "fresh", 60, tag=tag, version=c.tag_version(tag))
+
+
+def test_tags_match_by_str():
+    c = TTLCache()
+    tag = uuid.uuid4()
+    c.set("k", 1, 60, tag=tag)
+    c._invalidate_local(str(tag))
+    assert c.get("k") is None
+    assert c.tag_version(tag) == 1
+
+
+def test_maxsize_evicts_oldest_insertion():
+    c = TTLCache(maxsize=2)
+    for key in "abc":
+        c.set(key, key, 60, tag="t")
+    assert c.get("a") is None and c.get("c") == "c"
+    c.invalidate_tag("t")
+    assert c.stats()["entries"] == 0
+
+
+def _run_listener(body):
+    async def main():
+        listener = asyncio.create_task(cache.listen_for_invalidations())
+        await asyncio.sleep(0.01)  # let it subscribe
+        try:
+            await body()
+        finally:
+            listener.cancel()
+
+    asyncio.run(main())
+
+
+def test_named_cache_applies_invalidations_from_other_workers():
+    c = TTLCache(name=f"test-{uuid.uuid4()}")
+    tag = uuid.uuid4()
+
+    async def body():
+        c.set("k", 1, 60, tag=tag)
+        cache.get_broker().publish(cache.INVALIDATION_CHANNEL, {"cache": c.name, "tag": str(tag), "origin": "other-worker"})
+        await asyncio.sleep(0.01)
+        assert c.get("k") is None
+        # Its own broadcasts come back too but are applied only once.
+        c.invalidate_tag(tag)
+        await asyncio.sleep(0.01)
+        assert c.tag_version(tag) == 2
+
+    _run_listener(body)
+
+
+def test_invalidate_after_commit_waits_for_the_commit():
+    c = TTLCache(name=f"test-{uuid.uuid4()}")
+    tag = uuid.uuid4()
+
+    async def body():
+        c.set("k", 1, 60, tag=tag)
+        db = Session()
+        c.invalidate_tag_after_commit(db, tag)
+        await asyncio.sleep(0.01)
+        assert c.get("k") == 1
+        db.commit()
+        await asyncio.sleep(0.01)
+        assert c.get("k") is None
+
+        c.set("k", 1, 60, tag=tag, version=c.tag_version(tag))
+        db.begin()
+        c.invalidate_tag_after_commit(db, tag)
+        db.rollback()
+        db.commit()
+        await asyncio.sleep(0.01)
+        assert c.get("k") == 1
+
+    _run_listener(body)
+
+
+def test_unnamed_cache_cannot_invalidate_after_commit():
+    with pytest.raises(ValueError):
+        TTLCache().invalidate_tag_after_commit(Session(), "t")
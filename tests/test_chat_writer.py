@@ -0,0 +1,83 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app.modules.chat import writer
+from app.modules.chat.writer import MessageWriter, content_error
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """Records each batch handed to store_socket_messages; rows with content 'poison' fail their batch."""
+    batches = []
+    closed_threads = set()
+
+    def store_socket_messages(db, rows):
+        batches.append([row["content"] for row in rows])
+        if any(row["content"] == "poison" for row in rows):
+            raise RuntimeError("bad row")
+        return {row["id"] for row in rows if row["thread_id"] not in closed_threads}
+
+    async def run_with_session(fn, *args):
+        return fn(None, *args)
+
+    monkeypatch.setattr(writer.service, "store_socket_messages", store_socket_messages)
+    monkeypatch.setattr(writer, "run_with_session", run_with_session)
+    return batches, closed_threads
+
+
+def _submit_all(w, contents, thread_id=None):
+    thread_id = thread_id or uuid.uuid4()
+
+    async def main():
+        return await asyncio.gather(
+            *(w.submit(thread_id, uuid.uuid4(), "PATIENT", c) for c in contents), return_exceptions=True
+        )
+
+    return asyncio.run(main())
+
+
+def test_concurrent_messages_share_batches(store):
+    batches, _ = store
+    results = _submit_all(MessageWriter(batch_size=4, flush_seconds=0.01), [f"m{i}" for i in range(10)])
+    assert results == [True] * 10
+    assert [len(b) for b in batches] == [4, 4, 2]
+    assert [c for b in batches for c in b] == [f"m{i}" for i in range(10)]
+
+
+def test_failed_batch_is_retried_row_by_row(store):
+    batches, _ = store
+    results = _submit_all(MessageWriter(batch_size=10, flush_seconds=0.01), ["a", "poison", "b"])
+    assert results[0] is True and results[2] is True
+    assert isinstance(results[1], RuntimeError)
+    assert batches == [["a", "poison", "b"], ["a"], ["poison"], ["b"]]
+
+
+def test_message_to_closed_thread_is_not_acked(store):
+    _, closed_threads = store
+    thread_id = uuid.uuid4()
+    closed_threads.add(thread_id)
+    assert _submit_all(MessageWriter(batch_size=10, flush_seconds=0.01), ["late"], thread_id) == [False]
+
+
+def test_close_flushes_queued_messages(store):
+    batches, _ = store
+    w = MessageWriter(batch_size=10, flush_seconds=60)
+
+    async def main():
+        pending = asyncio.ensure_future(w.submit(uuid.uuid4(), uuid.uuid4(), "PATIENT", "queued"))
+        await asyncio.sleep(0.01)
+        await w.close()
+        return await pending
+
+    assert asyncio.run(main()) is True
+    assert batches == [["queued"]]
+
+
+@pytest.mark.parametrize(
+    "content, ok",
+    [("hi", True), ("x" * writer.MAX_CONTENT_LENGTH, True), ("", False), (None, False), (42, False), ("x" * (writer.MAX_CONTENT_LENGTH + 1), False)],
+)
+def test_content_error(content, ok):
+    assert (content_error(content) is None) == ok
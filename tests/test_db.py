@@ -0,0 +1,80 @@
+"""Checks that need a migrated Postgres database at DATABASE_URL; run with `pytest -m db`."""
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import check_query_plans
+import stress_booking
+from app.core.config import settings
+from app.modules.appointments import repository as appointments_repository
+
+pytestmark = pytest.mark.db
+
+BASE = datetime(2098, 3, 2, 8, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine(settings.DATABASE_URL)
+    try:
+        engine.connect().close()
+    except OperationalError as exc:
+        pytest.skip(f"database unavailable: {exc}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def doctor_and_patient(engine):
+    with engine.connect() as conn:
+        doctor_id = conn.execute(text("SELECT id FROM doctors LIMIT 1")).scalar()
+        patient_id = conn.execute(text("SELECT id FROM patients LIMIT 1")).scalar()
+    if doctor_id is None or patient_id is None:
+        pytest.skip("needs at least one doctor and one patient (see seed_algeria_data.py)")
+    return doctor_id, patient_id
+
+
+@pytest.fixture
+def db(engine):
+    """A session whose commits only release savepoints; everything is rolled back afterwards."""
+    with engine.connect() as conn:
+        trans = conn.begin()
+        session = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            yield session
+        finally:
+            session.close()
+            trans.rollback()
+
+
+def test_hot_queries_use_their_indexes(engine, monkeypatch):
+    monkeypatch.setattr(sys, "argv", ["check_query_plans.py", "--doctors", "50", "--patients", "200", "--per-doctor", "100"])
+    check_query_plans.main()
+
+
+def test_concurrent_bookings_of_one_slot(doctor_and_patient, monkeypatch):
+    doctor_id, patient_id = doctor_and_patient
+    monkeypatch.setattr(
+        sys, "argv", ["stress_booking.py", "--doctor-id", str(doctor_id), "--patient-id", str(patient_id), "--bookings", "40"]
+    )
+    stress_booking.main()
+
+
+def test_partial_series_skips_clashing_occurrences(db, doctor_and_patient):
+    doctor_id, patient_id = doctor_and_patient
+    base = {"doctor_id": doctor_id, "patient_id": patient_id, "status": "SCHEDULED", "reason": "tests/test_db.py"}
+
+    def row(day):
+        start = BASE + timedelta(days=day)
+        return {**base, "start_time": start, "end_time": start + timedelta(minutes=30)}
+
+    taken = appointments_repository.create_appointments(db, [row(1)])
+    ids = appointments_repository.create_appointments(db, [row(0), row(1), row(2)], skip_conflicts=True)
+    assert ids[0] is not None and ids[2] is not None
+    assert ids[1] is None and taken[0] is not None
+    with pytest.raises(ValueError):
+        appointments_repository.create_appointments(db, [row(3), row(2)])
@@ -0,0 +1,98 @@
+import asyncio
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from app.core import pubsub
+from app.core.pubsub import InProcessBroker, SlowConsumer, pump
+
+
+def test_subscriber_gets_message_and_shared_frame():
+    broker = InProcessBroker()
+
+    async def main():
+        async with broker.subscribe("c") as a, broker.subscribe("c") as b:
+            broker.publish("c", {"n": 1})
+            (ma, fa), (mb, fb) = await a.next(), await b.next()
+            assert ma == mb == {"n": 1}
+            assert fa is fb and json.loads(fa) == {"n": 1}
+        assert broker.stats()["subscriptions"] == 0
+
+    asyncio.run(main())
+
+
+def test_overflowing_subscriber_is_evicted():
+    broker = InProcessBroker()
+
+    async def main():
+        async with broker.subscribe("c", maxsize=2) as slow, broker.subscribe("c", maxsize=10) as fast:
+            for n in range(3):
+                broker.publish("c", n)
+            await asyncio.sleep(0)  # deliveries are scheduled on the loop
+            with pytest.raises(SlowConsumer):
+                await slow.next()
+            assert slow.evicted and slow.queue.empty()
+            assert [await fast.get() for _ in range(3)] == [0, 1, 2]
+            broker.publish("c", 3)  # an evicted subscriber gets nothing more
+            await asyncio.sleep(0)
+            assert slow.queue.empty()
+        assert broker.stats()["evicted_slow_consumers"] == 1
+
+    asyncio.run(main())
+
+
+def test_pump_evicts_a_stuck_sender():
+    broker = InProcessBroker()
+
+    async def main():
+        async with broker.subscribe("c") as sub:
+            broker.publish("c", 1)
+            broker.publish("c", 2)
+
+            async def stuck(_message, _frame):
+                await asyncio.sleep(1)
+
+            with pytest.raises(SlowConsumer):
+                await pump(sub, stuck, timeout=0.01)
+            assert sub.evicted
+
+    asyncio.run(main())
+
+
+def test_connection_queue_is_shared_across_channels():
+    broker = InProcessBroker()
+
+    async def main():
+        inbox = asyncio.Queue(10)
+        async with broker.subscribe("a", queue=inbox), broker.subscribe("b", queue=inbox) as b:
+            broker.publish("a", 1)
+            broker.publish("b", 2)
+            await asyncio.sleep(0)
+            assert [(await b.next_item())[:2] for _ in range(2)] == [("a", 1), ("b", 2)]
+            assert broker.stats()["queued_total"] == 0
+
+    asyncio.run(main())
+
+
+def _postgres_broker():
+    with patch.object(pubsub.threading.Thread, "start"):
+        broker = pubsub.PostgresBroker("dsn")
+    broker._publish_conn = MagicMock(closed=False)
+    return broker, broker._publish_conn.cursor.return_value.__enter__.return_value
+
+
+def test_postgres_broker_notifies_small_payloads_directly():
+    broker, cur = _postgres_broker()
+    broker.publish("c", {"x": "a"})
+    cur.execute.assert_called_once_with("SELECT pg_notify(%s, %s)", ("app:c", '{"x": "a"}'))
+
+
+def test_postgres_broker_spills_oversized_payloads():
+    broker, cur = _postgres_broker()
+    message = {"x": "a" * pubsub.NOTIFY_PAYLOAD_LIMIT}
+    broker.publish("c", message)
+    (spill_sql, spill_args), _ = cur.execute.call_args_list[0]
+    assert spill_sql == pubsub.SPILL_SQL
+    assert json.loads(spill_args[0]) == message and spill_args[1:] == ("app:c", pubsub.SPILLED_PREFIX)
+    assert cur.execute.call_args_list[1].args == (pubsub.PURGE_SPILLED_SQL,)
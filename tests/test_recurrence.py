@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.modules.appointments import schemas
+from app.modules.appointments.service import MAX_OCCURRENCES, expand_occurrences
+
+
+def _at(year, month, day, hour=9):
+    return datetime(year, month, day, hour, tzinfo=timezone.utc)
+
+
+def _starts(start, rule, minutes=30):
+    return [s for s, _ in expand_occurrences(start, start + timedelta(minutes=minutes), rule)]
+
+
+def test_weekly_count():
+    start = _at(2030, 1, 7)
+    assert _starts(start, schemas.RecurrenceRule(freq="WEEKLY", interval=2, count=3)) == [
+        start,
+        start + timedelta(weeks=2),
+        start + timedelta(weeks=4),
+    ]
+
+
+def test_until_is_inclusive():
+    start = _at(2030, 1, 7)
+    rule = schemas.RecurrenceRule(freq="DAILY", until=start + timedelta(days=2))
+    assert len(_starts(start, rule)) == 3
+
+
+def test_monthly_skips_missing_month_ends():
+    rule = schemas.RecurrenceRule(freq="MONTHLY", count=4)
+    assert _starts(_at(2030, 1, 31), rule) == [_at(2030, 1, 31), _at(2030, 3, 31), _at(2030, 5, 31), _at(2030, 7, 31)]
+
+
+def test_monthly_leap_day_only_in_leap_years():
+    rule = schemas.RecurrenceRule(freq="MONTHLY", interval=12, count=2)
+    assert _starts(_at(2028, 2, 29), rule) == [_at(2028, 2, 29), _at(2032, 2, 29)]
+
+
+def test_monthly_until_counts_skipped_months_against_the_window():
+    rule = schemas.RecurrenceRule(freq="MONTHLY", until=_at(2030, 4, 1))
+    assert _starts(_at(2030, 1, 31), rule) == [_at(2030, 1, 31), _at(2030, 3, 31)]
+
+
+def test_rule_without_count_or_until_is_rejected():
+    with pytest.raises(ValueError, match="count or until"):
+        expand_occurrences(_at(2030, 1, 7), _at(2030, 1, 7, 10), schemas.RecurrenceRule(freq="DAILY"))
+
+
+def test_until_before_first_start_yields_nothing():
+    rule = schemas.RecurrenceRule(freq="WEEKLY", until=_at(2029, 12, 31))
+    with pytest.raises(ValueError, match="no occurrences"):
+        expand_occurrences(_at(2030, 1, 7), _at(2030, 1, 7, 10), rule)
+
+
+def test_occurrence_cap():
+    start = _at(2030, 1, 7)
+    assert len(_starts(start, schemas.RecurrenceRule(freq="DAILY", count=MAX_OCCURRENCES))) == MAX_OCCURRENCES
+    with pytest.raises(ValueError, match=f"at most {MAX_OCCURRENCES}"):
+        expand_occurrences(start, start + timedelta(minutes=30), schemas.RecurrenceRule(freq="DAILY", count=MAX_OCCURRENCES + 1))
+    with pytest.raises(ValueError, match=f"at most {MAX_OCCURRENCES}"):
+        expand_occurrences(start, start + timedelta(minutes=30), schemas.RecurrenceRule(freq="DAILY", until=start + timedelta(days=365)))
+
+
+def test_overlapping_occurrences_are_rejected():
+    start = _at(2030, 1, 7)
+    with pytest.raises(ValueError, match="overlap"):
+        expand_occurrences(start, start + timedelta(days=2), schemas.RecurrenceRule(freq="DAILY", count=2))
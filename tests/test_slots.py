@@ -0,0 +1,59 @@
+import random
+from datetime import date, datetime, time, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+import bench_slots
+from app.modules.doctors import slots
+
+START = date(2025, 1, 5)
+NOW = datetime.combine(START, time(10, 0), tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("days", [1, 7, 30])
+@pytest.mark.parametrize("per_day", [0, 8, 32])
+@pytest.mark.parametrize("slot_minutes", [5, 30])
+def test_sweep_line_matches_quadratic_scan(days, per_day, slot_minutes):
+    availabilities = bench_slots._availabilities()
+    busy = bench_slots._appointments(START, days, per_day, random.Random(days * 100 + per_day))
+    args = (START, days, availabilities, busy, slot_minutes, NOW)
+    assert bench_slots.engine(*args) == bench_slots.legacy(*args)
+
+
+def test_overlapping_availability_windows_yield_each_slot_once():
+    availabilities = [
+        SimpleNamespace(weekday="Mon", start_time=time(8, 0), end_time=time(10, 0), is_active=True),
+        SimpleNamespace(weekday="Mon", start_time=time(9, 0), end_time=time(11, 0), is_active=True),
+    ]
+    # The quadratic scan listed 9:00 and 9:30 twice here.
+    found = slots.free_slots(date(2025, 1, 6), 1, slots.windows_by_weekday(availabilities), slots.merge_busy([]), 30, NOW)
+    assert len(found) == len(set(found)) == 6
+    assert found == sorted(found)
+
+
+@pytest.mark.parametrize("per_day", [0, 8, 32])
+def test_free_slot_store_matches_live_sweep(per_day):
+    days, slot_minutes = 14, 15
+    windows = slots.windows_by_weekday(bench_slots._availabilities())
+    busy = slots.merge_busy(bench_slots._appointments(START, days, per_day, random.Random(per_day)))
+    stored = [
+        slots.free_windows_for_day(START + timedelta(days=i), windows.get((START + timedelta(days=i)).strftime("%a"), []), busy)
+        for i in range(days)
+    ]
+    live = slots.free_slots(START, days, windows, busy, slot_minutes, NOW)
+    assert list(slots.iter_slots_from_free_windows(stored, slot_minutes, NOW)) == live
+
+
+def test_merge_busy_merges_touching_and_drops_empty_windows():
+    t = datetime(2025, 1, 6, 9, tzinfo=timezone.utc)
+    merged = slots.merge_busy(
+        [(t, t + timedelta(minutes=30)), (t + timedelta(minutes=30), t + timedelta(hours=1)), (t + timedelta(hours=2), t + timedelta(hours=2))]
+    )
+    assert list(zip(merged.starts, merged.ends)) == [(int(t.timestamp()), int((t + timedelta(hours=1)).timestamp()))]
+
+
+def test_days_spanned_treats_end_as_exclusive():
+    start = datetime(2025, 1, 6, 23, 0, tzinfo=timezone.utc)
+    assert slots.days_spanned(start, start + timedelta(hours=1)) == [date(2025, 1, 6)]
+    assert slots.days_spanned(start, start + timedelta(hours=2)) == [date(2025, 1, 6), date(2025, 1, 7)]